@@ -17,6 +17,7 @@ from stanza.models.classifiers.utils import ExtraVectors, ModelType, build_outpu
 from stanza.models.common.bert_embedding import extract_bert_embeddings
 from stanza.models.common.data import get_long_tensor, sort_all
 from stanza.models.common.foundation_cache import load_bert
+from stanza.models.common.pretrain import build_pretrained_embedding
 from stanza.models.common.vocab import PAD_ID, UNK_ID
 
 """
@@ -96,7 +97,7 @@ class CNNClassifier(BaseClassifier):
         self.unsaved_modules = []
 
         emb_matrix = pretrain.emb
-        self.add_unsaved_module('embedding', nn.Embedding.from_pretrained(torch.from_numpy(emb_matrix), freeze=True))
+        self.add_unsaved_module('embedding', build_pretrained_embedding(emb_matrix))
         self.add_unsaved_module('elmo_model', elmo_model)
         self.vocab_size = emb_matrix.shape[0]
         self.embedding_dim = emb_matrix.shape[1]
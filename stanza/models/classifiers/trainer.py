@@ -13,6 +13,7 @@ import stanza.models.classifiers.data as data
 import stanza.models.classifiers.cnn_classifier as cnn_classifier
 import stanza.models.classifiers.constituency_classifier as constituency_classifier
 from stanza.models.classifiers.utils import ModelType
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.foundation_cache import load_bert, load_charlm, load_pretrain
 from stanza.models.common.pretrain import Pretrain
 from stanza.models.constituency.tree_embedding import TreeEmbedding
@@ -67,7 +68,7 @@ class Trainer:
             else:
                 raise FileNotFoundError("Cannot find model in {} or in {}".format(filename, os.path.join(args.save_dir, filename)))
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.exception("Cannot load model from {}".format(filename))
             raise
@@ -118,7 +119,7 @@ class Trainer:
                                                                    args=model_params['config'])
         else:
             raise ValueError("Unknown model type {}".format(model_type))
-        model.load_state_dict(model_params['model'], strict=False)
+        load_model_state(model, model_params['model'], strict=False)
         model = model.to(args.device)
 
         logger.debug("-- MODEL CONFIG --")
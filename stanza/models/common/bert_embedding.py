@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+import contextvars
 import math
 import logging
 import numpy as np
@@ -342,12 +344,149 @@ def extract_xlnet_embeddings(model_name, tokenizer, model, data, device, keep_en
     return processed
 
 
+# the most words a BertEmbeddingCache keeps the features of
+DEFAULT_MAX_CACHED_TOKENS = 10000
+
+class BertEmbeddingCache:
+    """
+    Keeps the transformer features of each sentence for the length of one Pipeline call
+
+    POS, depparse, NER, constituency and sentiment models which share
+    the same transformer (through the FoundationCache) all run it on
+    the same sentences.  With a cache active, the first processor to
+    see a sentence stores its features, endpoints included, and the
+    later processors reuse them instead of running the transformer
+    again.
+
+    Entries are keyed by the transformer and the words of the sentence.
+    The stored features are the last N hidden layers, where N is the
+    most any caller has needed so far, so that each caller can select
+    the layers it wants.
+
+    So that memory does not grow with the size of the input, at most
+    max_tokens words are kept, and a Pipeline uses set_users to drop
+    the entries of a transformer once no later processor will read them.
+    """
+    def __init__(self, max_tokens=DEFAULT_MAX_CACHED_TOKENS):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.max_tokens = max_tokens
+        self.num_tokens = 0
+        # ids of the transformers whose entries are kept and stored
+        # None means every transformer
+        self._keep = None
+        self._store = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def layers_needed(num_layers):
+        # num_layers=None means the average of -2, -3, -4
+        return 4 if num_layers is None else num_layers
+
+    def lookup(self, model, model_name, data, num_layers):
+        """
+        Returns the stored features of each sentence, or None if missing or if not enough layers were kept
+        """
+        needed = self.layers_needed(num_layers)
+        features = []
+        for sentence in data:
+            feature = self._entries.get((model_name, id(model), tuple(sentence)))
+            if feature is not None and feature.shape[2] < needed:
+                feature = None
+            if feature is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            features.append(feature)
+        return features
+
+    def set_users(self, keep, store):
+        """
+        Drop the entries of transformers not in keep, and from now on only store results of transformers in store
+
+        keep and store are ids of transformers
+        """
+        self._keep = set(keep)
+        self._store = set(store)
+        for key in [key for key in self._entries if key[1] not in self._keep]:
+            del self._entries[key]
+            self.num_tokens -= len(key[2])
+
+    def store(self, model, model_name, data, features):
+        if self._store is not None and id(model) not in self._store:
+            return
+        for sentence, feature in zip(data, features):
+            key = (model_name, id(model), tuple(sentence))
+            if key in self._entries:
+                del self._entries[key]
+                self.num_tokens -= len(sentence)
+            if self.num_tokens + len(sentence) > self.max_tokens:
+                continue
+            self._entries[key] = feature
+            self.num_tokens += len(sentence)
+
+    @staticmethod
+    def select(feature, keep_endpoints, num_layers):
+        """
+        Turn a stored feature into what extract_bert_embeddings would have returned
+        """
+        if num_layers is None:
+            feature = feature[:, :, -4:-1].sum(axis=2) / 4
+        else:
+            feature = feature[:, :, -num_layers:]
+        if not keep_endpoints:
+            feature = feature[1:-1]
+        return feature
+
+_active_cache = contextvars.ContextVar("bert_embedding_cache", default=None)
+
+@contextmanager
+def bert_embedding_cache(cache=None):
+    """
+    Use cache for all extract_bert_embeddings calls in this block
+
+    If cache is None, a new BertEmbeddingCache is created.  Yields the cache
+    """
+    if cache is None:
+        cache = BertEmbeddingCache()
+    token = _active_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _active_cache.reset(token)
+
 def extract_bert_embeddings(model_name, tokenizer, model, data, device, keep_endpoints, num_layers=None, detach=True):
     """
     Extract transformer embeddings using a generic roberta extraction
 
     data: list of list of string (the text tokens)
     num_layers: how many to return.  If None, the average of -2, -3, -4 is returned
+
+    If a BertEmbeddingCache is active (see bert_embedding_cache) and
+    the features are detached, sentences which were already run
+    through this transformer are not run again
+    """
+    cache = _active_cache.get()
+    if cache is None or not detach or len(data) == 0:
+        return extract_uncached_embeddings(model_name, tokenizer, model, data, device, keep_endpoints, num_layers, detach)
+
+    features = cache.lookup(model, model_name, data, num_layers)
+    missing = [idx for idx, feature in enumerate(features) if feature is None]
+    if missing:
+        missing_data = [data[idx] for idx in missing]
+        layers = cache.layers_needed(num_layers)
+        new_features = extract_uncached_embeddings(model_name, tokenizer, model, missing_data, device, keep_endpoints=True, num_layers=layers, detach=True)
+        cache.store(model, model_name, missing_data, new_features)
+        for idx, feature in zip(missing, new_features):
+            features[idx] = feature
+    return [cache.select(feature, keep_endpoints, num_layers) for feature in features]
+
+def extract_uncached_embeddings(model_name, tokenizer, model, data, device, keep_endpoints, num_layers=None, detach=True):
+    """
+    Run the transformer on data.  Same arguments as extract_bert_embeddings
     """
     if model_name.startswith("vinai/phobert"):
         return extract_phobert_embeddings(model_name, tokenizer, model, data, device, keep_endpoints, num_layers, detach)
@@ -32,6 +32,30 @@ class PairwiseBilinear(nn.Module):
 
         return output
 
+    def forward_pairs(self, input1, input2, chunk_size=256):
+        """
+        Score only the aligned pairs: (N x L x D1) and (N x L x D2) -> (N x L x O)
+
+        Equivalent to taking the diagonal of forward(input1, input2),
+        without building the N x L1 x L2 x O tensor.  Rows are scored
+        chunk_size at a time, which bounds the size of the
+        intermediate rows x O x D2 tensor
+        """
+        input1_size = list(input1.size())
+        input1 = input1.reshape(-1, input1_size[-1])
+        input2 = input2.reshape(-1, self.input2_size)
+        weight = self.weight.view(-1, self.input2_size * self.output_size)
+        outputs = []
+        for start in range(0, input1.size(0), chunk_size):
+            # (rows x D1) * (D1 x (D2 x O)) -> rows x (D2 x O)
+            intermediate = torch.mm(input1[start:start+chunk_size], weight)
+            # forward reads the intermediate as O blocks of D2, so do the same here
+            intermediate = intermediate.view(-1, self.output_size, self.input2_size)
+            # (rows x O x D2) * (rows x D2 x 1) -> rows x O
+            outputs.append(torch.bmm(intermediate, input2[start:start+chunk_size].unsqueeze(2)).squeeze(2))
+        output = torch.cat(outputs, dim=0)
+        return output.view(input1_size[0], input1_size[1], self.output_size)
+
 class BiaffineScorer(nn.Module):
     def __init__(self, input1_size, input2_size, output_size):
         super().__init__()
@@ -58,6 +82,11 @@ class PairwiseBiaffineScorer(nn.Module):
         input2 = torch.cat([input2, input2.new_ones(*input2.size()[:-1], 1)], len(input2.size())-1)
         return self.W_bilin(input1, input2)
 
+    def forward_pairs(self, input1, input2):
+        input1 = torch.cat([input1, input1.new_ones(*input1.size()[:-1], 1)], len(input1.size())-1)
+        input2 = torch.cat([input2, input2.new_ones(*input2.size()[:-1], 1)], len(input2.size())-1)
+        return self.W_bilin.forward_pairs(input1, input2)
+
 class DeepBiaffineScorer(nn.Module):
     def __init__(self, input1_size, input2_size, hidden_size, output_size, hidden_func=F.relu, dropout=0, pairwise=True):
         super().__init__()
@@ -73,6 +102,24 @@ class DeepBiaffineScorer(nn.Module):
     def forward(self, input1, input2):
         return self.scorer(self.dropout(self.hidden_func(self.W1(input1))), self.dropout(self.hidden_func(self.W2(input2))))
 
+    def score_pairs(self, input1, input2, index):
+        """
+        Score each row of input1 against only one row of input2
+
+        input1: N x L1 x D1
+        input2: N x L2 x D2
+        index: N x L1 LongTensor, which row of input2 to pair with each row of input1
+
+        Returns N x L1 x O, the same as forward(input1, input2)
+        gathered at index, using O(L1) memory instead of O(L1 x L2)
+        """
+        if not isinstance(self.scorer, PairwiseBiaffineScorer):
+            raise ValueError("score_pairs only works with a pairwise scorer")
+        hidden1 = self.dropout(self.hidden_func(self.W1(input1)))
+        hidden2 = self.dropout(self.hidden_func(self.W2(input2)))
+        hidden2 = torch.gather(hidden2, 1, index.unsqueeze(2).expand(-1, -1, hidden2.size(2)))
+        return self.scorer.forward_pairs(hidden1, hidden2)
+
 if __name__ == "__main__":
     x1 = torch.randn(3,4)
     x2 = torch.randn(3,5)
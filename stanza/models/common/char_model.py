@@ -16,7 +16,9 @@ Based on
 }
 """
 
-from collections import Counter
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import contextvars
 from operator import itemgetter
 import os
 
@@ -24,12 +26,16 @@ import torch
 import torch.nn as nn
 from torch.nn.utils.rnn import pack_sequence, pad_packed_sequence, pack_padded_sequence, PackedSequence
 
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.data import get_long_tensor
 from stanza.models.common.packed_lstm import PackedLSTM
 from stanza.models.common.utils import open_read_text, tensor_unsort, unsort
 from stanza.models.common.dropout import SequenceUnitDropout
 from stanza.models.common.vocab import UNK_ID, CharVocab
 
+# number of word types a CharacterModel remembers in eval mode
+DEFAULT_CHAR_CACHE_SIZE = 50000
+
 class CharacterModel(nn.Module):
     def __init__(self, args, vocab, pad=False, bidirectional=False, attention=True):
         super().__init__()
@@ -52,7 +58,63 @@ class CharacterModel(nn.Module):
 
         self.dropout = nn.Dropout(args['dropout'])
 
+        # in eval mode, the representation of a word only depends on its
+        # characters, so each word type is encoded once and kept here.
+        # cleared whenever the model goes back into training or new
+        # weights are loaded
+        self.word_cache_size = self.args.get('char_cache_size', DEFAULT_CHAR_CACHE_SIZE)
+        self.word_cache = OrderedDict()
+
+    def train(self, mode=True):
+        if mode:
+            self.word_cache.clear()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self.word_cache.clear()
+        return super()._load_from_state_dict(*args, **kwargs)
+
     def forward(self, chars, chars_mask, word_orig_idx, sentlens, wordlens):
+        if self.training or not self.word_cache_size:
+            res = self.encode_words(chars, wordlens)
+        else:
+            res = self.cached_encode_words(chars, wordlens)
+
+        # recover character order and word separation
+        res = tensor_unsort(res, word_orig_idx)
+        res = pack_sequence(res.split(sentlens))
+        if self.pad:
+            res = pad_packed_sequence(res, batch_first=True)[0]
+
+        return res
+
+    def cached_encode_words(self, chars, wordlens):
+        """
+        encode_words, but only for the word types which are not in the word cache
+        """
+        char_lists = chars.tolist()
+        keys = [tuple(word[:length]) for word, length in zip(char_lists, wordlens)]
+        missing = {}
+        for idx, key in enumerate(keys):
+            if key in self.word_cache:
+                self.word_cache.move_to_end(key)
+            elif key not in missing:
+                missing[key] = idx
+        if missing:
+            # the words are sorted longest first, so the subset still is
+            missing_idx = sorted(missing.values())
+            new_reps = self.encode_words(chars[missing_idx], [wordlens[idx] for idx in missing_idx])
+            for idx, rep in zip(missing_idx, new_reps):
+                self.word_cache[keys[idx]] = rep
+        res = torch.stack([self.word_cache[key] for key in keys])
+        while len(self.word_cache) > self.word_cache_size:
+            self.word_cache.popitem(last=False)
+        return res
+
+    def encode_words(self, chars, wordlens):
+        """
+        Returns one vector per word for a words x chars tensor of characters, sorted longest first
+        """
         embs = self.dropout(self.char_emb(chars))
         batch_size = embs.size(0)
         embs = pack_padded_sequence(embs, wordlens, batch_first=True)
@@ -70,13 +132,6 @@ class CharacterModel(nn.Module):
         else:
             h, c = output[1]
             res = h[-2:].transpose(0,1).contiguous().view(batch_size, -1)
-
-        # recover character order and word separation
-        res = tensor_unsort(res, word_orig_idx)
-        res = pack_sequence(res.split(sentlens))
-        if self.pad:
-            res = pad_packed_sequence(res, batch_first=True)[0]
-
         return res
 
 def build_charlm_vocab(path, cutoff=0):
@@ -118,6 +173,111 @@ def build_charlm_vocab(path, cutoff=0):
 CHARLM_START = "\n"
 CHARLM_END = " "
 
+# depparse prepends this "word" as a stand in for ROOT
+ROOT_WORD = "\n"
+
+# the most words a CharlmCache keeps the representations of
+DEFAULT_MAX_CACHED_TOKENS = 10000
+
+class CharlmCache:
+    """
+    Keeps the charlm word representations of each sentence for the length of one Pipeline call
+
+    POS, depparse, NER, sentiment and constituency models usually share
+    the same forward and backward charlms through the FoundationCache.
+    With a cache active, build_char_representation only runs a charlm
+    on sentences it has not seen before.
+
+    depparse prepends a ROOT_WORD to each sentence.  That changes every
+    output of the forward charlm, so the prefixed sentence is its own
+    entry.  The backward charlm reads the ROOT_WORD last, though, so the
+    outputs for the real words are the same with or without it.  The
+    backward charlm is therefore always run on the prefixed sentence,
+    and both versions are served from that one pass.
+
+    As with the BertEmbeddingCache, at most max_tokens words are kept,
+    and a Pipeline uses set_users to drop the entries of a charlm once
+    no later processor will read them.
+    """
+    def __init__(self, max_tokens=DEFAULT_MAX_CACHED_TOKENS):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        # number of sentences each charlm actually ran on
+        self.sentences_run = Counter()
+        self.max_tokens = max_tokens
+        self.num_tokens = 0
+        # ids of the charlms whose entries are kept and stored
+        # None means every charlm
+        self._keep = None
+        self._store = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, charlm, sentences):
+        results = []
+        for words in sentences:
+            rep = self._entries.get((id(charlm), tuple(words)))
+            if rep is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            results.append(rep)
+        return results
+
+    def set_users(self, keep, store):
+        """
+        Drop the entries of charlms not in keep, and from now on only store results of charlms in store
+
+        keep and store are ids of charlms
+        """
+        self._keep = set(keep)
+        self._store = set(store)
+        for key in [key for key in self._entries if key[0] not in self._keep]:
+            del self._entries[key]
+            self.num_tokens -= len(key[1])
+
+    def _add(self, key, rep):
+        if key in self._entries:
+            del self._entries[key]
+            self.num_tokens -= len(key[1])
+        if self.num_tokens + len(key[1]) > self.max_tokens:
+            return
+        self._entries[key] = rep
+        self.num_tokens += len(key[1])
+
+    def store(self, charlm, sentences, reps):
+        if self._store is not None and id(charlm) not in self._store:
+            return
+        for words, rep in zip(sentences, reps):
+            self._add((id(charlm), tuple(words)), rep)
+            if not charlm.is_forward_lm and len(words) > 0 and words[0] == ROOT_WORD:
+                self._add((id(charlm), tuple(words[1:])), rep[1:])
+
+_active_charlm_cache = contextvars.ContextVar("charlm_cache", default=None)
+
+def active_charlm_cache():
+    """
+    Returns the CharlmCache in use, or None
+    """
+    return _active_charlm_cache.get()
+
+@contextmanager
+def charlm_cache(cache=None):
+    """
+    Use cache for all build_char_representation calls in this block
+
+    If cache is None, a new CharlmCache is created.  Yields the cache
+    """
+    if cache is None:
+        cache = CharlmCache()
+    token = _active_charlm_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _active_charlm_cache.reset(token)
+
 class CharacterLanguageModel(nn.Module):
 
     def __init__(self, args, vocab, pad=False, is_forward_lm=True):
@@ -183,6 +343,32 @@ class CharacterLanguageModel(nn.Module):
     def build_char_representation(self, sentences):
         """
         Return values from this charlm for a list of list of words
+
+        If a CharlmCache is active (see charlm_cache), sentences this
+        charlm has already seen are not run again
+        """
+        cache = _active_charlm_cache.get()
+        if cache is None or len(sentences) == 0:
+            return self.uncached_char_representation(sentences)
+
+        results = cache.lookup(self, sentences)
+        missing = [idx for idx, rep in enumerate(results) if rep is None]
+        if missing:
+            to_run = [list(sentences[idx]) for idx in missing]
+            if not self.is_forward_lm:
+                to_run = [x if len(x) > 0 and x[0] == ROOT_WORD else [ROOT_WORD] + x for x in to_run]
+            reps = self.uncached_char_representation(to_run)
+            cache.sentences_run[id(self)] += len(to_run)
+            cache.store(self, to_run, reps)
+            for idx, words, rep in zip(missing, to_run, reps):
+                if len(words) > len(sentences[idx]):
+                    rep = rep[1:]
+                results[idx] = rep
+        return results
+
+    def uncached_char_representation(self, sentences):
+        """
+        Run this charlm on a list of list of words
         """
         forward = self.is_forward_lm
         vocab = self.char_vocab()
@@ -252,14 +438,14 @@ class CharacterLanguageModel(nn.Module):
     def from_full_state(cls, state, finetune=False):
         vocab = {'char': CharVocab.load_state_dict(state['vocab'])}
         model = cls(state['args'], vocab, state['pad'], state['is_forward_lm'])
-        model.load_state_dict(state['state_dict'])
+        load_model_state(model, state['state_dict'])
         model.eval()
         model.finetune = finetune # set finetune status
         return model
 
     @classmethod
     def load(cls, filename, finetune=False):
-        state = torch.load(filename, lambda storage, loc: storage)
+        state = load_checkpoint(filename)
         # allow saving just the Model object,
         # and allow for old charlms to still work
         if 'state_dict' in state:
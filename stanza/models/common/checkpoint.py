@@ -0,0 +1,137 @@
+"""
+Loading of model checkpoints, with optional prefetching
+
+The Trainers read their model files with load_checkpoint.  If a .pt
+file has an up to date tensor archive next to it, as written by
+convert_checkpoints, the archive is memory mapped instead.  While a
+Pipeline is being built, prefetch_checkpoints starts loading the files
+of all of its processors at once in a thread pool.  The processors are
+still built one at a time, but each one finds its checkpoint already
+loaded, or at least in progress.  torch.load releases the GIL while
+reading and copying tensor data, so the loads overlap well.
+
+load_model_state then makes the loaded tensors the parameters of the
+model rather than copying them, so the weights of a memory mapped
+archive stay in the page cache, shared by all processes using them.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import inspect
+import logging
+import os
+import threading
+
+import torch
+
+from stanza.models.common.tensor_archive import ARCHIVE_EXTENSION, is_up_to_date, load_tensor_archive, tensor_archive_filename
+
+logger = logging.getLogger('stanza')
+
+# abspath -> Future of a checkpoint loaded in the background
+_prefetched = {}
+_prefetched_lock = threading.Lock()
+
+# load_state_dict(..., assign=True) was added in torch 2.1
+ASSIGN_SUPPORTED = 'assign' in inspect.signature(torch.nn.Module.load_state_dict).parameters
+
+def read_checkpoint(filename):
+    """
+    Read a checkpoint from disk, preferring its tensor archive if there is an up to date one
+    """
+    if isinstance(filename, (str, os.PathLike)):
+        filename = os.fspath(filename)
+        if filename.endswith(ARCHIVE_EXTENSION):
+            return load_tensor_archive(filename)
+        archive = tensor_archive_filename(filename)
+        if is_up_to_date(archive, filename):
+            logger.debug("Loading tensor archive %s in place of %s", archive, filename)
+            return load_tensor_archive(archive)
+        if os.path.exists(archive):
+            logger.debug("Tensor archive %s is out of date.  Loading %s instead", archive, filename)
+    return torch.load(filename, lambda storage, loc: storage)
+
+def load_checkpoint(filename):
+    """
+    Load a checkpoint onto the CPU, using the prefetched copy if there is one
+
+    A prefetched checkpoint is only handed out once, so the caller is
+    free to modify what it gets back.
+    """
+    if isinstance(filename, (str, os.PathLike)):
+        with _prefetched_lock:
+            future = _prefetched.pop(os.path.abspath(filename), None)
+        if future is not None:
+            logger.debug("Using prefetched checkpoint %s", filename)
+            return future.result()
+    return read_checkpoint(filename)
+
+def can_assign(model, state_dict):
+    """
+    Whether the tensors of state_dict can become the parameters & buffers of model as they are
+
+    This requires each tensor to already have the device and dtype of
+    the one it replaces.  Models with tied weights are copied into
+    instead, since assigning to each name separately would untie them.
+    """
+    if not ASSIGN_SUPPORTED:
+        return False
+    seen = set()
+    for name, current in model.state_dict(keep_vars=True).items():
+        if not isinstance(current, torch.Tensor):
+            continue
+        if id(current) in seen:
+            return False
+        seen.add(id(current))
+        tensor = state_dict.get(name)
+        if tensor is None:
+            continue
+        if not isinstance(tensor, torch.Tensor) or tensor.device != current.device or tensor.dtype != current.dtype:
+            return False
+    return True
+
+def load_model_state(model, state_dict, strict=True):
+    """
+    model.load_state_dict(state_dict, strict), using the tensors of state_dict without copying them if possible
+
+    state_dict should be freshly loaded from a checkpoint, as the
+    model takes over its tensors.  For a tensor archive, those are
+    copy-on-write views of the mapped file, so the weights are only
+    read from disk when used, and are shared with any other process
+    which maps the same archive.  Changing a weight, such as in
+    training, makes a private copy of just the pages changed.
+    """
+    if can_assign(model, state_dict):
+        return model.load_state_dict(state_dict, strict=strict, assign=True)
+    return model.load_state_dict(state_dict, strict=strict)
+
+@contextmanager
+def prefetch_checkpoints(filenames, max_workers=4):
+    """
+    Load the given files in the background while the body of the with block runs
+
+    Files which do not exist are skipped, so that the usual error
+    comes from wherever the file is really needed.  Checkpoints which
+    were not used by the end of the block are dropped, without
+    waiting for any which are still loading.
+    """
+    filenames = list(dict.fromkeys(os.path.abspath(filename) for filename in filenames
+                                   if filename and os.path.isfile(filename)))
+    if max_workers is None or max_workers <= 1 or len(filenames) <= 1:
+        yield
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(filenames)), thread_name_prefix="stanza-prefetch")
+    futures = {filename: executor.submit(read_checkpoint, filename) for filename in filenames}
+    with _prefetched_lock:
+        _prefetched.update(futures)
+    try:
+        yield
+    finally:
+        with _prefetched_lock:
+            for filename, future in futures.items():
+                if _prefetched.get(filename) is future:
+                    del _prefetched[filename]
+        for future in futures.values():
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -1,7 +1,14 @@
 # Adapted from Tim's code here: https://github.com/tdozat/Parser-v3/blob/master/scripts/chuliu_edmonds.py
 
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
 import numpy as np
 
+# thread count -> ThreadPoolExecutor shared by every parser using that many threads
+_mst_executors = {}
+_mst_executors_lock = threading.Lock()
+
 def tarjan(tree):
     """Finds the cycles in a dependency graph
 
@@ -279,3 +286,75 @@ def chuliu_edmonds_one_root(scores):
             f.write('{}: {}, {}, {}\n'.format(_tree, _scores, tree_probs, tree_score))
         raise
     return best_tree
+
+#===============================================================
+def greedy_trees(scores, sentlens):
+    """
+    Pick the best head for each word of every sentence in the batch at once
+
+    scores: batch x max_len x max_len, where scores[b, i, j] is the
+      score of word j being the head of word i, and 0 is the root
+    sentlens: length of each sentence, including the root
+
+    Returns heads (batch x max_len) and a boolean array of which
+    sentences got a well formed tree: exactly one word attached to the
+    root and no cycles.  For those sentences, the heads are exactly
+    what chuliu_edmonds_one_root would return, since the MST algorithm
+    starts from the same argmax and stops when there are no cycles.
+    """
+    batch_size, max_len, _ = scores.shape
+    lens = np.asarray(sentlens)
+    positions = np.arange(max_len)
+    # same masking as prepare_scores, plus masking out the padding
+    scores = np.array(scores, dtype=np.float64)
+    scores[:, positions, positions] = -np.inf
+    scores[np.broadcast_to(positions[None, None, :] >= lens[:, None, None], scores.shape)] = -np.inf
+    heads = np.argmax(scores, axis=2)
+    heads[:, 0] = 0
+    # padding points at the root so it does not affect the checks below
+    heads[positions[None, :] >= lens[:, None]] = 0
+
+    num_roots = np.sum(heads[:, 1:] == 0, axis=1) - np.maximum(0, max_len - lens)
+    # following the heads from any word of a tree reaches the root in
+    # fewer than max_len steps.  squaring the head function doubles the
+    # number of steps each time, so log2(max_len) rounds are enough
+    ancestors = heads
+    for _ in range(max(1, int(np.ceil(np.log2(max(max_len, 2)))))):
+        ancestors = np.take_along_axis(ancestors, ancestors, axis=1)
+    acyclic = np.all(ancestors == 0, axis=1)
+    return heads, np.logical_and(num_roots == 1, acyclic)
+
+def mst_executor(num_threads):
+    """
+    A thread pool of num_threads threads for decode_trees, or None if num_threads is 0 or None
+
+    The pools are shared and live as long as the process, so that
+    creating many parsers does not start a new set of threads each time
+    """
+    if not num_threads:
+        return None
+    with _mst_executors_lock:
+        if num_threads not in _mst_executors:
+            _mst_executors[num_threads] = ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="stanza-mst")
+        return _mst_executors[num_threads]
+
+def decode_trees(scores, sentlens, executor=None):
+    """
+    Find the best single rooted tree for each sentence in the batch
+
+    Sentences where the greedy heads already form a tree skip the
+    Chu-Liu/Edmonds search.  The rest are solved with
+    chuliu_edmonds_one_root, using the executor if one is given.
+
+    Returns a list with one array of heads per sentence, including the root
+    """
+    heads, is_tree = greedy_trees(scores, sentlens)
+    trees = [heads[idx, :length] if is_tree[idx] else None for idx, length in enumerate(sentlens)]
+    remaining = [idx for idx, tree in enumerate(trees) if tree is None]
+    if executor is not None and len(remaining) > 1:
+        results = executor.map(lambda idx: chuliu_edmonds_one_root(scores[idx, :sentlens[idx], :sentlens[idx]]), remaining)
+    else:
+        results = [chuliu_edmonds_one_root(scores[idx, :sentlens[idx], :sentlens[idx]]) for idx in remaining]
+    for idx, tree in zip(remaining, results):
+        trees[idx] = tree
+    return trees
@@ -0,0 +1,105 @@
+"""
+Write tensor archives for the .pt models in a model directory
+
+Run it as follows:
+  python3 stanza/models/common/convert_checkpoints.py ~/stanza_resources
+  python3 stanza/models/common/convert_checkpoints.py ~/stanza_resources/en/pos/combined.pt --verify
+
+Each model foo.pt gets a foo.tensors next to it, which the models load
+in place of the .pt from then on.  See tensor_archive.py for the
+format.  The .pt files are left alone, so that downloads can still
+check their md5.  If a .pt is replaced later, for example by a newer
+download, its old archive is ignored until this is run again.
+
+Pretrains already have a memory mapped format of their own, so for
+those the .vocab.json & .emb.npy files are written instead.
+"""
+
+import argparse
+import logging
+import os
+
+import torch
+
+from stanza.models.common.pretrain import Pretrain, mmap_filenames
+from stanza.models.common.tensor_archive import is_up_to_date, load_tensor_archive, save_tensor_archive, tensor_archive_filename
+from stanza.utils.helper_func import make_table
+
+logger = logging.getLogger('stanza')
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='+', help='Model directories or .pt files to convert')
+    parser.add_argument('--force', default=False, action='store_true', help='Convert even if an up to date archive already exists')
+    parser.add_argument('--verify', default=False, action='store_true', help='Reload each archive and check that its tensors match the .pt')
+    parser.add_argument('--no_pretrain', dest='pretrain', default=True, action='store_false', help='Don\'t write memory mapped versions of the pretrains')
+    args = parser.parse_args(args=args)
+    return args
+
+def find_checkpoints(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename.endswith(".pt"):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+def is_pretrain(checkpoint):
+    return isinstance(checkpoint, dict) and set(checkpoint.keys()) == {'vocab', 'emb'}
+
+def same_tensors(left, right):
+    """
+    Recursively check that two checkpoints have equal tensors in the same places
+    """
+    if isinstance(left, torch.Tensor):
+        return isinstance(right, torch.Tensor) and left.dtype == right.dtype and torch.equal(left, right)
+    if isinstance(left, dict):
+        return isinstance(right, dict) and left.keys() == right.keys() and all(same_tensors(left[k], right[k]) for k in left)
+    if isinstance(left, (list, tuple)):
+        return isinstance(right, (list, tuple)) and len(left) == len(right) and all(same_tensors(x, y) for x, y in zip(left, right))
+    return True
+
+def convert_checkpoint(filename, force=False, verify=False, pretrain=True):
+    """
+    Convert one .pt file.  Returns a short description of what happened
+    """
+    archive = tensor_archive_filename(filename)
+    if not force and is_up_to_date(archive, filename):
+        return "up to date"
+    vocab_filename, emb_filename = mmap_filenames(filename)
+    if not force and os.path.exists(emb_filename) and os.path.getmtime(emb_filename) >= os.path.getmtime(filename):
+        return "up to date"
+
+    checkpoint = torch.load(filename, lambda storage, loc: storage)
+    if is_pretrain(checkpoint):
+        if not pretrain:
+            return "skipped pretrain"
+        Pretrain(filename, use_mmap=False).save_mmap(filename)
+        return "pretrain mmap"
+
+    save_tensor_archive(checkpoint, archive, source=filename)
+    if verify and not same_tensors(checkpoint, load_tensor_archive(archive)):
+        os.unlink(archive)
+        raise ValueError("Tensor archive %s does not match %s" % (archive, filename))
+    return "converted"
+
+def main(args=None):
+    args = parse_args(args)
+
+    rows = []
+    for filename in find_checkpoints(args.paths):
+        try:
+            result = convert_checkpoint(filename, args.force, args.verify, args.pretrain)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except Exception as e:
+            logger.warning("Could not convert %s: %s", filename, e)
+            result = "failed"
+        rows.append((filename, result))
+    print(make_table(['Model', 'Result'], rows))
+
+if __name__ == '__main__':
+    main()
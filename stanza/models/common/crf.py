@@ -121,6 +121,46 @@ def viterbi_decode(scores, transition_params):
     viterbi_score = np.max(trellis[-1])
     return viterbi, viterbi_score
 
+def viterbi_decode_batch(scores, transition_params, sentlens):
+    """
+    Decode the tag sequences of a whole batch at once with the viterbi algorithm.
+
+    Gives the same results as calling viterbi_decode on each sentence,
+    but the loop over time steps is done once for the batch in torch.
+    scores: batch_size x seq_len x num_tags (tensor)
+    transition_params: num_tags x num_tags (tensor)
+    sentlens: the length of each sentence.  positions past the end are ignored
+    @return:
+        viterbi: a list with the list of tag ids for each sentence
+        viterbi_score: batch_size tensor of the highest scores
+    """
+    batch_size, seq_len, _ = scores.size()
+    lens = torch.as_tensor(sentlens, device=scores.device)
+
+    trellis = scores[:, 0]
+    backpointers = []
+    for t in range(1, seq_len):
+        # bs x nt x nt: score of going from tag i to tag j
+        v = trellis.unsqueeze(2) + transition_params.unsqueeze(0)
+        best, bp = torch.max(v, dim=1)
+        active = (t < lens).unsqueeze(1)
+        # finished sentences keep their final trellis
+        trellis = torch.where(active, scores[:, t] + best, trellis)
+        backpointers.append(bp)
+
+    viterbi_score, current = torch.max(trellis, dim=1)
+    paths = torch.zeros(batch_size, seq_len, dtype=torch.long, device=scores.device)
+    for t in range(seq_len - 1, 0, -1):
+        paths[:, t] = current
+        previous = torch.gather(backpointers[t-1], 1, current.unsqueeze(1)).squeeze(1)
+        # until t reaches the end of a sentence, its last tag stays in place
+        current = torch.where(t < lens, previous, current)
+    paths[:, 0] = current
+
+    paths = paths.tolist()
+    viterbi = [path[:length] for path, length in zip(paths, sentlens)]
+    return viterbi, viterbi_score
+
 def log_sum_exp(value, dim=None, keepdim=False):
     """Numerically stable implementation of the operation
     value.exp().sum(dim, keepdim).log()
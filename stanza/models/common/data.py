@@ -48,6 +48,46 @@ def sort_all(batch, lens):
     sorted_all = [list(t) for t in zip(*sorted(zip(*unsorted_all), reverse=True))]
     return sorted_all[2:], sorted_all[1]
 
+def padded_cost_batches(data, token_budget, lens=None, max_batch_size=None):
+    """
+    Group data into batches where (longest item) * (number of items) stays within token_budget
+
+    This is the number of positions the padded tensors of the batch
+    will have, so one long item does not inflate the padding of a
+    large batch of short items.  The items are sorted longest first
+    so that similar lengths end up in the same batch.  An item which
+    is longer than token_budget by itself gets a batch of its own.
+
+    data: a list of items, such as the preprocessed sentences of a DataLoader
+    lens: the length of each item.  Defaults to len(x[0]), the sentence length in the UD DataLoaders
+    max_batch_size: optionally also limit the number of items per batch
+
+    Returns (batches, orig_idx).  orig_idx is the original location of
+    each item in the flattened batches, suitable for utils.unsort
+    """
+    if len(data) == 0:
+        return [], []
+    if lens is None:
+        lens = [len(x[0]) for x in data]
+    (data, ), orig_idx = sort_all([data], lens)
+
+    batches = []
+    current = []
+    current_len = 0
+    for x, x_len in zip(data, [lens[idx] for idx in orig_idx]):
+        if current and ((len(current) + 1) * current_len > token_budget or
+                        (max_batch_size is not None and len(current) >= max_batch_size)):
+            batches.append(current)
+            current = []
+        if not current:
+            # since the items are sorted, the first item of a batch is its longest
+            current_len = x_len
+        current.append(x)
+    if current:
+        batches.append(current)
+
+    return batches, orig_idx
+
 def get_augment_ratio(train_data, should_augment_predicate, can_augment_predicate, desired_ratio=0.1, max_ratio=0.5):
     """
     Returns X so that if you randomly select X * N sentences, you get 10%
@@ -358,6 +358,54 @@ class Document(StanzaObject):
         for sent_id, sentence in zip(range(start_index, start_index + len(self.sentences)), self.sentences):
             sentence.sent_id = str(sent_id)
 
+    def splice(self, start_char, end_char, text, new_doc):
+        """
+        Replace the sentences in a span of the text with the sentences of another document
+
+        Used for updating the annotations after the text was edited.
+        start_char, end_char: the span of the current text being replaced.
+          Sentences are replaced if they overlap the span, so it should
+          be aligned with sentence boundaries, such as paragraph breaks
+        text: the full edited text
+        new_doc: an annotated document for the new text of the span,
+          text[start_char:start_char + len(new_doc.text)], with
+          character offsets relative to the start of the span
+
+        The character offsets of the new sentences and the sentences
+        after the span are updated, as are the sentence indices.
+        Sentence ids which were the default enumeration are renumbered.
+        """
+        if self.text is None:
+            raise ValueError("Cannot splice a document with no text")
+        if any(sentence.tokens[0].start_char is None for sentence in self.sentences):
+            raise ValueError("Cannot splice a document without character offsets")
+        delta = len(text) - len(self.text)
+
+        first = 0
+        while first < len(self.sentences) and self.sentences[first].tokens[-1].end_char <= start_char:
+            first += 1
+        last = first
+        while last < len(self.sentences) and self.sentences[last].tokens[0].start_char < end_char:
+            last += 1
+
+        new_sentences = list(new_doc.sentences)
+        for sentence in new_sentences:
+            sentence.doc = self
+            sentence.shift_chars(start_char)
+        for sentence in self.sentences[last:]:
+            sentence.shift_chars(delta)
+
+        sentences = self.sentences[:first] + new_sentences + self.sentences[last:]
+        self._text = text
+        self.sentences = sentences
+        for sent_idx, sentence in enumerate(sentences):
+            renumber = sentence.sent_id == str(sentence.index)
+            sentence.index = sent_idx
+            if renumber and sentence.sent_id != str(sent_idx):
+                sentence.sent_id = str(sent_idx)
+        self._count_words()
+        self.build_ents()
+
     def to_dict(self):
         """ Dumps the whole document into a list of list of dictionary for each token in each sentence in the doc.
         """
@@ -456,6 +504,21 @@ class Sentence(StanzaObject):
 
         self.rebuild_dependencies()
 
+    def shift_chars(self, offset):
+        """
+        Move the character offsets of all the tokens and words of this sentence by offset
+        """
+        for token in self.tokens:
+            if token._start_char is not None:
+                token._start_char += offset
+            if token._end_char is not None:
+                token._end_char += offset
+        for word in self.words:
+            if word._start_char is not None:
+                word._start_char += offset
+            if word._end_char is not None:
+                word._end_char += offset
+
     @property
     def index(self):
         """
@@ -2,15 +2,60 @@
 Keeps BERT, charlm, word embedings in a cache to save memory
 """
 
+from collections import namedtuple
 import logging
 import threading
 
+# importing torch.multiprocessing registers the reductions which send
+# shared memory tensors to other processes as handles instead of copies
+import torch.multiprocessing
+
 from stanza.models.common import bert_embedding
 from stanza.models.common.char_model import CharacterLanguageModel
 from stanza.models.common.pretrain import Pretrain
 
 logger = logging.getLogger('stanza')
 
+CachedModelMemory = namedtuple('CachedModelMemory', ['kind', 'name', 'num_bytes', 'shared'])
+
+def tensor_storage(tensor):
+    """
+    Returns the data_ptr and size in bytes of the storage behind a tensor
+
+    untyped_storage only exists in torch 2.0 and later
+    """
+    if hasattr(tensor, 'untyped_storage'):
+        storage = tensor.untyped_storage()
+        return storage.data_ptr(), storage.nbytes()
+    storage = tensor.storage()
+    return storage.data_ptr(), storage.size() * storage.element_size()
+
+def module_memory(module):
+    """
+    Returns the number of bytes used by the parameters & buffers of a module, and whether they are all in shared memory
+    """
+    num_bytes = 0
+    shared = True
+    seen = set()
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        data_ptr, nbytes = tensor_storage(tensor)
+        if data_ptr in seen:
+            continue
+        seen.add(data_ptr)
+        num_bytes += nbytes
+        shared = shared and tensor.is_shared()
+    return num_bytes, shared and len(seen) > 0
+
+def pretrain_memory(pretrain):
+    """
+    Returns the number of bytes used by the vectors of a pretrain, and whether they are shared with other processes
+
+    Memory mapped vectors count as shared, since all processes use the same pages of the page cache
+    """
+    if not pretrain.loaded:
+        return 0, False
+    return pretrain.emb.nbytes, pretrain.is_shared
+
 class FoundationCache:
     def __init__(self, other=None):
         if other is None:
@@ -73,6 +118,86 @@ class FoundationCache:
 
             return self.pretrains[filename]
 
+    def memory_usage(self):
+        """
+        Returns a list of CachedModelMemory, one for each model in the cache
+        """
+        with self.lock:
+            usage = []
+            for name, (model, _) in self.bert.items():
+                if model is not None:
+                    usage.append(CachedModelMemory('bert', name, *module_memory(model)))
+            for name, charlm in self.charlms.items():
+                usage.append(CachedModelMemory('charlm', name, *module_memory(charlm)))
+            for name, pretrain in self.pretrains.items():
+                usage.append(CachedModelMemory('pretrain', name, *pretrain_memory(pretrain)))
+            return usage
+
+class SharedFoundationCache(FoundationCache):
+    """
+    A FoundationCache which keeps the models in shared memory
+
+    The parent process populates the cache, for example by building a
+    Pipeline with foundation_cache=cache, before starting its workers.
+    The workers then attach to the same tensors instead of each
+    loading its own copy:
+
+      - forked workers (such as gunicorn with preload) see the shared
+        memory directly
+      - spawned workers need to receive the cache through
+        torch.multiprocessing, such as a Process argument or Queue.
+        Only handles to the shared memory are pickled.
+
+    The cached models should be treated as read-only.  A model loaded
+    by a worker after it starts is only cached in that worker.
+
+    Models added to the cache through a wrapper such as
+    NoTransformerFoundationCache are not moved to shared memory when
+    loaded, so call share_memory() once the cache is populated.
+    """
+    def share_memory(self):
+        """
+        Move every model currently in the cache to shared memory
+        """
+        with self.lock:
+            for model, _ in self.bert.values():
+                if model is not None:
+                    model.share_memory()
+            for charlm in self.charlms.values():
+                charlm.share_memory()
+            for pretrain in self.pretrains.values():
+                pretrain.share_memory()
+
+    def load_bert(self, transformer_name):
+        model, tokenizer = super().load_bert(transformer_name)
+        if model is not None:
+            with self.lock:
+                model.share_memory()
+        return model, tokenizer
+
+    def load_charlm(self, filename):
+        charlm = super().load_charlm(filename)
+        if charlm is not None:
+            with self.lock:
+                charlm.share_memory()
+        return charlm
+
+    def load_pretrain(self, filename):
+        pretrain = super().load_pretrain(filename)
+        if pretrain is not None:
+            with self.lock:
+                pretrain.share_memory()
+        return pretrain
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('lock')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
 class NoTransformerFoundationCache(FoundationCache):
     """
     Uses the underlying FoundationCache, but hiding the transformer.
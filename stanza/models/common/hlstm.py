@@ -1,3 +1,6 @@
+import logging
+import warnings
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -5,6 +8,8 @@ from torch.nn.utils.rnn import pad_packed_sequence, pack_padded_sequence, pack_s
 
 from stanza.models.common.packed_lstm import PackedLSTM
 
+logger = logging.getLogger('stanza')
+
 class HLSTMCell(nn.modules.rnn.RNNCellBase):
     """
     A Highway LSTM Cell as proposed in Zhang et al. (2018) Highway Long Short-Term Memory RNNs for 
@@ -51,11 +56,46 @@ class HLSTMCell(nn.modules.rnn.RNNCellBase):
 
         return h, c
 
+def fused_highway(h, input, weight, bias, use_tanh: bool):
+    """
+    h + sigmoid(gate(input)) * highway_func(highway(input)) with a single matrix multiply
+
+    weight and bias are the gate and highway weights concatenated, in that order
+    """
+    gate, highway = F.linear(input, weight, bias).chunk(2, dim=1)
+    if use_tanh:
+        highway = torch.tanh(highway)
+    return h + torch.sigmoid(gate) * highway
+
+_scripted_fused_highway = None
+
+def get_fused_highway():
+    """
+    fused_highway compiled with TorchScript, or the plain function if it cannot be scripted
+    """
+    global _scripted_fused_highway
+    if _scripted_fused_highway is None:
+        try:
+            with warnings.catch_warnings():
+                # newer versions of torch warn that TorchScript is deprecated
+                warnings.simplefilter("ignore")
+                _scripted_fused_highway = torch.jit.script(fused_highway)
+        except Exception as e:
+            logger.debug("Could not script the highway layer, using it unscripted: %s", e)
+            _scripted_fused_highway = fused_highway
+    return _scripted_fused_highway
+
 # Highway LSTM network, does NOT use the HLSTMCell above
 class HighwayLSTM(nn.Module):
     """
     A Highway LSTM network, as used in the original Tensorflow version of the Dozat parser. Note that this
     is independent from the HLSTMCell above.
+
+    In eval() mode, the gate and highway projections of each layer are
+    done as one matrix multiply with their weights concatenated, followed
+    by a TorchScript function for the rest of the highway connection.
+    The concatenated weights are kept until the weights change.  Set
+    fused_inference to False to always use the separate layers.
     """
     def __init__(self, input_size, hidden_size,
                  num_layers=1, bias=True, batch_first=False,
@@ -88,9 +128,50 @@ class HighwayLSTM(nn.Module):
             self.gate[-1].bias.data.zero_()
             in_size = hidden_size * self.num_directions
 
-    def forward(self, input, seqlens, hx=None):
+        self.fused_inference = True
+        # layer -> (key of the weights they were built from, weight, bias)
+        self.fused_weights_cache = {}
+
+    def can_fuse(self, layer):
+        """
+        Whether the highway connection of this layer can use fused_highway
+
+        Only in eval mode, for the highway functions fused_highway knows,
+        and not if the layers have been replaced, such as by quantization
+        """
+        return (self.fused_inference and not self.training and
+                (self.highway_func is None or self.highway_func is torch.tanh) and
+                type(self.gate[layer]) is nn.Linear and type(self.highway[layer]) is nn.Linear)
+
+    def fused_weights(self, layer):
+        """
+        The gate & highway weights and biases of a layer, concatenated
+        """
+        parameters = (self.gate[layer].weight, self.highway[layer].weight, self.gate[layer].bias, self.highway[layer].bias)
+        if torch.is_grad_enabled():
+            # not cached, so that the gradients reach the separate weights
+            return torch.cat(parameters[:2]), torch.cat(parameters[2:])
+
+        # load_state_dict changes the version and .to() the data_ptr
+        key = tuple((x.data_ptr(), x._version) for x in parameters)
+        cached = self.fused_weights_cache.get(layer)
+        if cached is None or cached[0] != key:
+            cached = (key, torch.cat(parameters[:2]), torch.cat(parameters[2:]))
+            self.fused_weights_cache[layer] = cached
+        return cached[1], cached[2]
+
+    def highway_step(self, layer, h, input):
+        """
+        Add the highway connection of layer to its LSTM output h, returning the new packed data
+        """
+        if self.can_fuse(layer):
+            weight, bias = self.fused_weights(layer)
+            return get_fused_highway()(h.data, input.data, weight, bias, self.highway_func is not None)
+
         highway_func = (lambda x: x) if self.highway_func is None else self.highway_func
+        return h.data + torch.sigmoid(self.gate[layer](input.data)) * highway_func(self.highway[layer](input.data))
 
+    def forward(self, input, seqlens, hx=None):
         hs = []
         cs = []
 
@@ -106,7 +187,7 @@ class HighwayLSTM(nn.Module):
             hs.append(ht)
             cs.append(ct)
 
-            input = PackedSequence(h.data + torch.sigmoid(self.gate[l](input.data)) * highway_func(self.highway[l](input.data)), input.batch_sizes, input.sorted_indices, input.unsorted_indices)
+            input = PackedSequence(self.highway_step(l, h, input), input.batch_sizes, input.sorted_indices, input.unsorted_indices)
 
         if self.pad:
             input = pad_packed_sequence(input, batch_first=self.batch_first)[0]
@@ -2,6 +2,7 @@
 Supports for pretrained data.
 """
 import csv
+import json
 import os
 import re
 
@@ -9,9 +10,11 @@ import lzma
 import logging
 import numpy as np
 import torch
+import torch.nn as nn
 
 from .vocab import BaseVocab, VOCAB_PREFIX, UNK_ID
 
+from stanza.models.common.checkpoint import load_checkpoint
 from stanza.models.common.utils import open_read_binary, open_read_text
 from stanza.resources.common import DEFAULT_MODEL_DIR
 
@@ -28,11 +31,52 @@ class PretrainedWordVocab(BaseVocab):
             unit = unit.replace(" ","\xa0")
         return unit
 
+def mmap_filenames(filename):
+    """
+    Returns the vocab & embedding files which hold the memory mapped version of a pretrain
+
+    For en/pretrain/conll17.pt, these are en/pretrain/conll17.vocab.json and en/pretrain/conll17.emb.npy
+    """
+    base = os.path.splitext(filename)[0]
+    return base + ".vocab.json", base + ".emb.npy"
+
+class MmapEmbedding(nn.Module):
+    """
+    A frozen embedding which reads its rows from a memory mapped matrix
+
+    Only the pages of the matrix which are actually used get read from
+    disk, and multiple processes using the same pretrain file share
+    those pages through the OS page cache.  The rows are always
+    returned as float32, even if the matrix is stored as float16.
+    """
+    def __init__(self, matrix):
+        super().__init__()
+        self.matrix = matrix
+        self.num_embeddings, self.embedding_dim = matrix.shape
+
+    def forward(self, ids):
+        # fancy indexing a memmap copies just the requested rows
+        rows = self.matrix[ids.detach().cpu().numpy().reshape(-1)]
+        rows = torch.from_numpy(np.asarray(rows, dtype=np.float32))
+        return rows.view(*ids.shape, self.embedding_dim).to(ids.device)
+
+def build_pretrained_embedding(emb_matrix):
+    """
+    Build a frozen embedding for a pretrain matrix
+
+    Memory mapped matrices get an MmapEmbedding so the vectors are not
+    all copied into memory.  Anything else becomes an nn.Embedding as before.
+    """
+    if isinstance(emb_matrix, np.memmap):
+        return MmapEmbedding(emb_matrix)
+    return nn.Embedding.from_pretrained(torch.from_numpy(emb_matrix), freeze=True)
+
 class Pretrain:
     """ A loader and saver for pretrained embeddings. """
 
-    def __init__(self, filename=None, vec_filename=None, max_vocab=-1, save_to_file=True, csv_filename=None):
+    def __init__(self, filename=None, vec_filename=None, max_vocab=-1, save_to_file=True, csv_filename=None, use_mmap=True):
         self.filename = filename
+        self._use_mmap = use_mmap
         self._vec_filename = vec_filename
         self._csv_filename = csv_filename
         self._max_vocab = max_vocab
@@ -50,10 +94,51 @@ class Pretrain:
             self.load()
         return self._emb
 
+    @property
+    def loaded(self):
+        return hasattr(self, '_emb')
+
+    @property
+    def is_shared(self):
+        """
+        Whether the vectors are in shared memory or memory mapped from a file
+        """
+        return hasattr(self, '_shared_emb') or (self.loaded and isinstance(self._emb, np.memmap))
+
+    def share_memory(self):
+        """
+        Move the vectors into shared memory, so other processes can attach to them
+
+        The emb property becomes a numpy view of a torch tensor in shared
+        memory.  When the Pretrain is sent to another process with
+        torch.multiprocessing, only a handle to that memory is pickled.
+        Memory mapped vectors are already shared through the page cache
+        and are left alone.
+        """
+        if isinstance(self.emb, np.memmap) or hasattr(self, '_shared_emb'):
+            return
+        self._shared_emb = torch.from_numpy(np.ascontiguousarray(self.emb)).share_memory_()
+        self._emb = self._shared_emb.numpy()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if '_shared_emb' in state:
+            # the numpy view would be pickled as a full copy of the vectors
+            state.pop('_emb')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_shared_emb' in state:
+            self._emb = self._shared_emb.numpy()
+
     def load(self):
+        if self.filename is not None and self._use_mmap and self.load_mmap():
+            return
+
         if self.filename is not None and os.path.exists(self.filename):
             try:
-                data = torch.load(self.filename, lambda storage, loc: storage)
+                data = load_checkpoint(self.filename)
                 logger.debug("Loaded pretrain from {}".format(self.filename))
                 if 'emb' not in data or 'vocab' not in data:
                     raise RuntimeError("File {} exists but is not a stanza pretrain file".format(self.filename))
@@ -95,6 +180,48 @@ class Pretrain:
         except BaseException as e:
             logger.warning("Saving pretrained data failed due to the following exception... continuing anyway.\n\t{}".format(e))
 
+    def load_mmap(self):
+        """
+        Load the vocab and a memory mapped embedding from the files written by save_mmap
+
+        Returns False if those files do not exist or are older than the .pt file
+        """
+        vocab_filename, emb_filename = mmap_filenames(self.filename)
+        if not os.path.exists(vocab_filename) or not os.path.exists(emb_filename):
+            return False
+        if os.path.exists(self.filename) and os.path.getmtime(emb_filename) < os.path.getmtime(self.filename):
+            logger.warning("Memory mapped pretrain %s is older than %s.  Loading the .pt file instead", emb_filename, self.filename)
+            return False
+        with open(vocab_filename, encoding="utf-8") as fin:
+            state = json.load(fin)
+        state['_unit2id'] = {w:i for i, w in enumerate(state['_id2unit'])}
+        self._vocab = PretrainedWordVocab.load_state_dict(state)
+        self._emb = np.load(emb_filename, mmap_mode='r')
+        logger.debug("Loaded memory mapped pretrain from %s", emb_filename)
+        return True
+
+    def save_mmap(self, filename, dtype=np.float32):
+        """
+        Save the vocab as json and the embedding as a .npy file which can be memory mapped
+
+        The files are named after filename, as in mmap_filenames.  The
+        embedding is written last so that it is never older than the vocab.
+        """
+        vocab_filename, emb_filename = mmap_filenames(filename)
+        directory, _ = os.path.split(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        state = self.vocab.state_dict()
+        state.pop('_unit2id')
+        with open(vocab_filename, "w", encoding="utf-8") as fout:
+            json.dump(state, fout, ensure_ascii=False)
+        # write to a temp file and rename, so a process loading the
+        # pretrain never maps a partially written file
+        temp_filename = emb_filename + ".tmp.npy"
+        np.save(temp_filename, np.asarray(self.emb, dtype=dtype))
+        os.replace(temp_filename, emb_filename)
+        logger.info("Saved memory mapped pretrain to %s and %s", vocab_filename, emb_filename)
+        return vocab_filename, emb_filename
 
     def write_text(self, filename):
         """
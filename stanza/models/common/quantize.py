@@ -0,0 +1,84 @@
+"""
+Quantization of the models of a Pipeline after they are loaded
+
+quantize="int8" replaces the nn.Linear and LSTM layers of a model with
+dynamically quantized versions: the weights are stored as int8, and
+the activations are quantized on the fly for each matrix multiply.
+This is a CPU only feature of torch, so on the GPU nothing is changed.
+
+Pretrained embeddings, charlms, and transformers are unsaved modules,
+and when loaded by a Pipeline they are shared between processors via
+the FoundationCache.  Those are never quantized, since quantizing one
+in place would change it for every other model using it.
+"""
+
+import logging
+
+import torch
+import torch.nn as nn
+
+try:
+    from torch.ao import quantization
+except ImportError:
+    # older versions of torch
+    from torch import quantization
+
+logger = logging.getLogger('stanza')
+
+QUANTIZE_MODES = ('int8',)
+
+QUANTIZED_TYPES = (nn.Linear, nn.LSTM, nn.LSTMCell, nn.GRU, nn.GRUCell)
+
+def shared_modules(model):
+    """
+    All of the modules which are part of an unsaved module of model, or of any of its submodules
+    """
+    shared = set()
+    for module in model.modules():
+        for name in getattr(module, 'unsaved_modules', []):
+            unsaved = getattr(module, name, None)
+            if isinstance(unsaved, nn.Module):
+                shared.update(id(x) for x in unsaved.modules())
+    return shared
+
+def quantize_dynamic_int8(model, skip=()):
+    """
+    Quantize the Linear & LSTM layers of model in place, leaving alone any module whose id is in skip
+
+    Returns the number of layers quantized
+    """
+    mapping = quantization.quantization_mappings.get_default_dynamic_quant_module_mappings()
+    qconfig = quantization.default_dynamic_qconfig
+
+    count = 0
+    for parent in list(model.modules()):
+        if id(parent) in skip:
+            continue
+        for name, child in list(parent.named_children()):
+            if id(child) in skip or type(child) not in QUANTIZED_TYPES or type(child) not in mapping:
+                continue
+            child.qconfig = qconfig
+            setattr(parent, name, mapping[type(child)].from_float(child))
+            count += 1
+    return count
+
+def quantize_model(model, quantize, device=None):
+    """
+    Quantize model in place according to the quantize option of a Pipeline or processor
+
+    quantize can be None, in which case nothing happens, or one of QUANTIZE_MODES.
+    Returns the number of layers quantized
+    """
+    if not quantize:
+        return 0
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError("Unknown quantize option %s.  Known options are %s" % (quantize, ", ".join(QUANTIZE_MODES)))
+    if model is None:
+        return 0
+    if device is not None and torch.device(device).type != 'cpu':
+        logger.warning("Quantization is only supported on the CPU.  Not quantizing %s on %s", type(model).__name__, device)
+        return 0
+
+    count = quantize_dynamic_int8(model, skip=shared_modules(model))
+    logger.debug("Quantized %d layers of %s to %s", count, type(model).__name__, quantize)
+    return count
@@ -11,7 +11,7 @@ import numpy as np
 import stanza.models.common.seq2seq_constant as constant
 from stanza.models.common import utils
 from stanza.models.common.seq2seq_modules import LSTMAttention
-from stanza.models.common.beam import Beam
+from stanza.models.common.beam import trunc_division
 
 logger = logging.getLogger('stanza')
 
@@ -230,29 +230,33 @@ class Seq2SeqModel(nn.Module):
         dec_inputs = self.embedding(self.SOS_tensor)
         dec_inputs = dec_inputs.expand(batch_size, dec_inputs.size(0), dec_inputs.size(1))
 
-        done = [False for _ in range(batch_size)]
-        total_done = 0
-        max_len = 0
-        output_seqs = [[] for _ in range(batch_size)]
-
-        while total_done < batch_size and max_len < self.max_dec_len:
+        done = torch.zeros(batch_size, dtype=torch.bool, device=src.device)
+        all_preds = []
+        while len(all_preds) < self.max_dec_len:
             log_probs, (hn, cn) = self.decode(dec_inputs, hn, cn, h_in, src_mask, src=src)
             assert log_probs.size(1) == 1, "Output must have 1-step of output."
             _, preds = log_probs.squeeze(1).max(1, keepdim=True)
             dec_inputs = self.embedding(preds) # update decoder inputs
-            max_len += 1
-            for i in range(batch_size):
-                if not done[i]:
-                    token = preds.data[i][0].item()
-                    if token == constant.EOS_ID:
-                        done[i] = True
-                        total_done += 1
-                    else:
-                        output_seqs[i].append(token)
+            all_preds.append(preds)
+            done = done | preds.squeeze(1).eq(constant.EOS_ID)
+            if done.all():
+                break
+
+        # everything from the first EOS onward is dropped by prune_hyp
+        all_preds = torch.cat(all_preds, dim=1).tolist()
+        output_seqs = [utils.prune_hyp(hyp) for hyp in all_preds]
         return output_seqs, edit_logits
 
     def predict(self, src, src_mask, pos=None, beam_size=5, raw=None):
-        """ Predict with beam search. """
+        """
+        Predict with beam search.
+
+        All of the beams in the batch are advanced together: the
+        hypotheses live in a [batch * beam] dimension, and each step is
+        one topk over the [batch, beam * V] scores.  A sentence is
+        finished when its best hypothesis ends in EOS, at which point
+        it is removed from the tensors being decoded.
+        """
         if beam_size == 1:
             return self.predict_greedy(src, src_mask, pos, raw)
 
@@ -267,52 +271,75 @@ class Seq2SeqModel(nn.Module):
             edit_logits = None
 
         # (2) set up beam
+        # hypothesis k of sentence b is in row b * beam_size + k
         with torch.no_grad():
-            h_in = h_in.data.repeat(beam_size, 1, 1) # repeat data for beam search
-            src_mask = src_mask.repeat(beam_size, 1)
-            # repeat decoder hidden states
-            hn = hn.data.repeat(beam_size, 1)
-            cn = cn.data.repeat(beam_size, 1)
+            h_in = h_in.data.repeat_interleave(beam_size, dim=0)
+            src_mask = src_mask.repeat_interleave(beam_size, dim=0)
+            src = src.repeat_interleave(beam_size, dim=0)
+            hn = hn.data.repeat_interleave(beam_size, dim=0)
+            cn = cn.data.repeat_interleave(beam_size, dim=0)
         device = self.SOS_tensor.device
-        beam = [Beam(beam_size, device) for _ in range(batch_size)]
 
-        def update_state(states, idx, positions, beam_size):
-            """ Select the states according to back pointers. """
-            for e in states:
-                br, d = e.size()
-                s = e.contiguous().view(beam_size, br // beam_size, d)[:,idx]
-                s.data.copy_(s.data.index_select(0, positions))
+        # only the first hypothesis is live at the start, so the first
+        # topk expands a single hypothesis
+        scores = torch.full((batch_size, beam_size), -float('inf'), device=device)
+        scores[:, 0] = 0
+        dec_inputs = self.SOS_tensor.expand(batch_size * beam_size).contiguous()
+        # which sentences of the batch are still being decoded
+        active = torch.arange(batch_size, device=device)
+        # the word & backpointer chosen at each step, for every sentence
+        next_ys = torch.zeros(self.max_dec_len, batch_size, beam_size, dtype=torch.long, device=device)
+        prev_ks = torch.zeros(self.max_dec_len, batch_size, beam_size, dtype=torch.long, device=device)
+        num_steps = torch.zeros(batch_size, dtype=torch.long, device=device)
 
         # (3) main loop
         for i in range(self.max_dec_len):
-            dec_inputs = torch.stack([b.get_current_state() for b in beam]).t().contiguous().view(-1, 1)
-            dec_inputs = self.embedding(dec_inputs)
-            log_probs, (hn, cn) = self.decode(dec_inputs, hn, cn, h_in, src_mask, src=src)
-            log_probs = log_probs.view(beam_size, batch_size, -1).transpose(0,1)\
-                    .contiguous() # [batch, beam, V]
-
-            # advance each beam
-            done = []
-            for b in range(batch_size):
-                is_done = beam[b].advance(log_probs.data[b])
-                if is_done:
-                    done += [b]
-                # update beam state
-                update_state((hn, cn), b, beam[b].get_current_origin(), beam_size)
-
-            if len(done) == batch_size:
+            num_active = active.size(0)
+            log_probs, (hn, cn) = self.decode(self.embedding(dec_inputs.view(-1, 1)), hn, cn, h_in, src_mask, src=src)
+            log_probs = log_probs.view(num_active, beam_size, -1) # [batch, beam, V]
+            num_words = log_probs.size(2)
+
+            beam_lk = log_probs.data + scores.unsqueeze(2)
+            scores, best_ids = beam_lk.view(num_active, -1).topk(beam_size, 1, True, True)
+            prev_k = trunc_division(best_ids, num_words)
+            next_y = best_ids - prev_k * num_words
+            next_ys[i, active] = next_y
+            prev_ks[i, active] = prev_k
+            num_steps[active] = i + 1
+
+            # select the decoder states according to the back pointers
+            rows = (prev_k + torch.arange(num_active, device=device).unsqueeze(1) * beam_size).view(-1)
+            hn = hn.index_select(0, rows)
+            cn = cn.index_select(0, rows)
+            dec_inputs = next_y.view(-1)
+
+            # a sentence is done when the top of its beam is EOS
+            keep = next_y[:, 0].ne(constant.EOS_ID)
+            if not keep.any():
                 break
-
-        # back trace and find hypothesis
-        all_hyp, all_scores = [], []
-        for b in range(batch_size):
-            scores, ks = beam[b].sort_best()
-            all_scores += [scores[0]]
-            k = ks[0]
-            hyp = beam[b].get_hyp(k)
-            hyp = utils.prune_hyp(hyp)
-            hyp = [i.item() for i in hyp]
-            all_hyp += [hyp]
+            if not keep.all():
+                active = active[keep]
+                scores = scores[keep]
+                dec_inputs = next_y[keep].view(-1)
+                rows = keep.repeat_interleave(beam_size)
+                hn = hn[rows]
+                cn = cn[rows]
+                h_in = h_in[rows]
+                src_mask = src_mask[rows]
+                src = src[rows]
+
+        # back trace the best hypothesis of each sentence
+        # the topk results are sorted, so the best hypothesis is always at position 0
+        hyps = torch.zeros(batch_size, self.max_dec_len, dtype=torch.long, device=device)
+        k = torch.zeros(batch_size, dtype=torch.long, device=device)
+        batch_idx = torch.arange(batch_size, device=device)
+        for i in range(int(num_steps.max().item()) - 1, -1, -1):
+            in_range = num_steps > i
+            hyps[:, i] = next_ys[i, batch_idx, k]
+            k = torch.where(in_range, prev_ks[i, batch_idx, k], k)
+
+        all_hyp = []
+        for hyp, length in zip(hyps.tolist(), num_steps.tolist()):
+            all_hyp.append(utils.prune_hyp(hyp[:length]))
 
         return all_hyp, edit_logits
-
@@ -0,0 +1,249 @@
+"""
+A checkpoint format whose tensors can be memory mapped instead of unpickled
+
+A .pt checkpoint has to be unpickled in full, which reads and copies
+every weight in every process which loads it.  A tensor archive is
+laid out as
+  - an 8 byte magic string, a 4 byte version, an 8 byte header length,
+    and the size and mtime of the .pt file it was converted from
+  - a json header: the checkpoint with each tensor replaced by a
+    reference, plus the dtype, shape, and offset of each tensor
+  - the raw bytes of each tensor, each aligned to ALIGNMENT bytes
+
+The tensors come back as copy-on-write views of a memory map of the
+file, so nothing is read until it is used, and processes loading the
+same archive share those pages through the OS page cache.
+
+The vocab, config, and other non-tensor parts of a checkpoint are
+stored as json.  tuples, sets, dicts with non-string keys, enums, and
+SimpleNamespaces are tagged so they come back as the same type, and
+numpy arrays are stored alongside the tensors.  Anything else which
+json cannot represent is pickled into the header as a last resort.
+Tensors which shared storage when saved are stored separately.
+
+For en/pos/combined.pt, the archive is en/pos/combined.tensors
+"""
+
+import base64
+from collections import OrderedDict
+from enum import Enum
+import importlib
+import json
+import os
+import pickle
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+MAGIC = b"STZTENSR"
+VERSION = 1
+ALIGNMENT = 64
+ARCHIVE_EXTENSION = ".tensors"
+
+PREAMBLE = struct.Struct("<8sIQqq")
+NO_SOURCE = (-1, -1)
+
+# numpy has no bfloat16 and the like, so the bytes are mapped as an
+# integer type of the same size and then viewed as the torch dtype
+INT_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32, 8: np.int64}
+TORCH_INT_DTYPES = {1: torch.int8, 2: torch.int16, 4: torch.int32, 8: torch.int64}
+
+# numpy arrays which torch.from_numpy can turn into tensors
+NDARRAY_DTYPES = tuple(np.dtype(x) for x in (np.bool_, np.uint8, np.int8, np.int16, np.int32, np.int64, np.float16, np.float32, np.float64))
+
+TAGS = ("__tensor__", "__ndarray__", "__tuple__", "__set__", "__dict__", "__ordered_dict__", "__enum__", "__namespace__", "__pickle__")
+
+def tensor_archive_filename(filename):
+    """
+    The tensor archive which goes with a .pt checkpoint
+    """
+    return os.path.splitext(filename)[0] + ARCHIVE_EXTENSION
+
+def source_stat(filename):
+    stat = os.stat(filename)
+    return (stat.st_size, stat.st_mtime_ns)
+
+def read_preamble(filename):
+    with open(filename, "rb") as fin:
+        preamble = fin.read(PREAMBLE.size)
+    if len(preamble) < PREAMBLE.size:
+        raise ValueError("%s is not a tensor archive" % filename)
+    magic, version, header_length, source_size, source_mtime = PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise ValueError("%s is not a tensor archive" % filename)
+    if version > VERSION:
+        raise ValueError("Tensor archive %s is version %d, but this version of stanza only reads up to version %d" % (filename, version, VERSION))
+    return header_length, (source_size, source_mtime)
+
+def is_up_to_date(archive, source):
+    """
+    Whether archive exists and was converted from source as it is now
+
+    If source does not exist, any archive is used
+    """
+    if not os.path.exists(archive):
+        return False
+    if not os.path.exists(source):
+        return True
+    try:
+        _, archive_source = read_preamble(archive)
+    except (OSError, ValueError):
+        return False
+    return archive_source == source_stat(source)
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def encode(obj, tensors):
+    """
+    Turn obj into something json can write, moving the tensors to the tensors list
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)) and not isinstance(obj, Enum):
+        return obj
+    if isinstance(obj, torch.Tensor):
+        tensors.append(obj)
+        return {"__tensor__": len(tensors) - 1}
+    if type(obj) is np.ndarray and obj.dtype in NDARRAY_DTYPES:
+        tensors.append(torch.from_numpy(np.ascontiguousarray(obj)))
+        return {"__ndarray__": len(tensors) - 1}
+    if type(obj) is list:
+        return [encode(x, tensors) for x in obj]
+    if type(obj) is tuple:
+        return {"__tuple__": [encode(x, tensors) for x in obj]}
+    if type(obj) in (set, frozenset):
+        try:
+            items = sorted(obj)
+        except TypeError:
+            items = list(obj)
+        return {"__set__": [encode(x, tensors) for x in items]}
+    if type(obj) is OrderedDict:
+        # the _metadata of a state_dict has the version of each module
+        return {"__ordered_dict__": [[encode(k, tensors), encode(v, tensors)] for k, v in obj.items()],
+                "metadata": encode(getattr(obj, '_metadata', None), tensors)}
+    if type(obj) is dict:
+        if all(isinstance(k, str) and k not in TAGS for k in obj):
+            return {k: encode(v, tensors) for k, v in obj.items()}
+        return {"__dict__": [[encode(k, tensors), encode(v, tensors)] for k, v in obj.items()]}
+    if isinstance(obj, Enum):
+        cls = type(obj)
+        return {"__enum__": [cls.__module__, cls.__qualname__, obj.name]}
+    if type(obj) is SimpleNamespace:
+        return {"__namespace__": encode(vars(obj), tensors)}
+    return {"__pickle__": base64.b64encode(pickle.dumps(obj)).decode("ascii")}
+
+def decode(obj, tensors):
+    """
+    The inverse of encode, with the tensors already loaded
+    """
+    if isinstance(obj, list):
+        return [decode(x, tensors) for x in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if "__tensor__" in obj:
+        return tensors[obj["__tensor__"]]
+    if "__ndarray__" in obj:
+        return tensors[obj["__ndarray__"]].numpy()
+    if "__tuple__" in obj:
+        return tuple(decode(x, tensors) for x in obj["__tuple__"])
+    if "__set__" in obj:
+        return set(decode(x, tensors) for x in obj["__set__"])
+    if "__dict__" in obj:
+        return {decode(k, tensors): decode(v, tensors) for k, v in obj["__dict__"]}
+    if "__ordered_dict__" in obj:
+        result = OrderedDict((decode(k, tensors), decode(v, tensors)) for k, v in obj["__ordered_dict__"])
+        metadata = decode(obj["metadata"], tensors)
+        if metadata is not None:
+            result._metadata = metadata
+        return result
+    if "__enum__" in obj:
+        module, qualname, name = obj["__enum__"]
+        cls = importlib.import_module(module)
+        for piece in qualname.split("."):
+            cls = getattr(cls, piece)
+        return cls[name]
+    if "__namespace__" in obj:
+        return SimpleNamespace(**decode(obj["__namespace__"], tensors))
+    if "__pickle__" in obj:
+        return pickle.loads(base64.b64decode(obj["__pickle__"]))
+    return {k: decode(v, tensors) for k, v in obj.items()}
+
+def tensor_bytes(tensor):
+    """
+    The raw bytes of a tensor as a numpy array, whatever its dtype
+    """
+    tensor = tensor.detach().cpu().contiguous()
+    if tensor.dim() == 0:
+        tensor = tensor.reshape(1)
+    return tensor.view(TORCH_INT_DTYPES[tensor.element_size()]).numpy()
+
+def save_tensor_archive(checkpoint, filename, source=None):
+    """
+    Write checkpoint to filename as a tensor archive
+
+    source is the .pt file the checkpoint came from, if any.  Its size
+    and mtime are recorded so that is_up_to_date can tell when the .pt
+    has been replaced.
+
+    The file is written to a temporary name and then moved into place,
+    so a process mapping the old archive is not disturbed.
+    """
+    tensors = []
+    tree = encode(checkpoint, tensors)
+
+    descriptions = []
+    offset = 0
+    for tensor in tensors:
+        nbytes = tensor.numel() * tensor.element_size()
+        descriptions.append({"dtype": str(tensor.dtype).split(".")[-1],
+                             "shape": list(tensor.shape),
+                             "offset": offset,
+                             "nbytes": nbytes})
+        offset = aligned(offset + nbytes)
+    header = json.dumps({"checkpoint": tree, "tensors": descriptions}).encode("utf-8")
+    data_start = aligned(PREAMBLE.size + len(header))
+
+    directory = os.path.split(filename)[0]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as fout:
+        fout.write(PREAMBLE.pack(MAGIC, VERSION, len(header), *(source_stat(source) if source else NO_SOURCE)))
+        fout.write(header)
+        for tensor, description in zip(tensors, descriptions):
+            fout.write(b"\0" * (data_start + description["offset"] - fout.tell()))
+            if description["nbytes"] > 0:
+                fout.write(memoryview(tensor_bytes(tensor)).cast("B"))
+    os.replace(temp_filename, filename)
+
+def load_tensor_archive(filename):
+    """
+    Load a checkpoint written by save_tensor_archive
+
+    The tensors are copy-on-write views of a memory map of the file
+    """
+    header_length, _ = read_preamble(filename)
+    with open(filename, "rb") as fin:
+        fin.seek(PREAMBLE.size)
+        header = json.loads(fin.read(header_length).decode("utf-8"))
+    data_start = aligned(PREAMBLE.size + header_length)
+
+    data = None
+    tensors = []
+    for description in header["tensors"]:
+        dtype = getattr(torch, description["dtype"])
+        shape = description["shape"]
+        nbytes = description["nbytes"]
+        if nbytes == 0:
+            tensors.append(torch.empty(shape, dtype=dtype))
+            continue
+        if data is None:
+            # mode 'c' is copy-on-write, so a caller which changes a
+            # tensor in place gets a private page rather than an error
+            data = np.memmap(filename, dtype=np.uint8, mode='c')
+        start = data_start + description["offset"]
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        array = data[start:start+nbytes].view(INT_DTYPES[itemsize])
+        tensors.append(torch.from_numpy(array).view(dtype).reshape(shape))
+    return decode(header["checkpoint"], tensors)
@@ -24,6 +24,7 @@ import logging
 import torch
 
 from stanza.models.common import utils
+from stanza.models.common.data import padded_cost_batches
 from stanza.models.constituency import parse_transitions
 from stanza.models.constituency import transition_sequence
 from stanza.models.constituency.parse_transitions import State, TransitionScheme, CloseConstituent
@@ -168,6 +169,81 @@ class BaseModel(ABC):
         """
         return self._reverse_sentence
 
+    def legality_groups(self):
+        """
+        Group the transitions which are always legal or illegal together
+
+        Returns one representative transition per group and a tensor
+        with the group of each transition in self.transitions
+        """
+        if getattr(self, '_legality_groups', None) is None:
+            keys = {}
+            representatives = []
+            group_idx = []
+            for trans in self.transitions:
+                key = trans.legality_key(self)
+                if key not in keys:
+                    keys[key] = len(representatives)
+                    representatives.append(trans)
+                group_idx.append(keys[key])
+            self._legality_groups = (representatives, torch.tensor(group_idx, dtype=torch.long))
+        return self._legality_groups
+
+    def legal_mask(self, states):
+        """
+        Returns a num_states x num_transitions bool tensor of which transitions are legal in each state
+
+        Only one is_legal call per state is needed for each legality
+        group (Shift, Close, root or non-root Open, etc), not for each
+        transition
+        """
+        representatives, group_idx = self.legality_groups()
+        group_legal = torch.tensor([[trans.is_legal(state, self) for trans in representatives] for state in states], dtype=torch.bool)
+        return group_legal[:, group_idx]
+
+    def choose_transitions(self, states, predictions, is_legal=True):
+        """
+        Pick the highest scoring transition for each state, only from the legal transitions if is_legal is set
+
+        Returns the transitions and their scores.  If a state has no
+        legal transitions, its transition is None and its score is nan
+        """
+        pred_max = torch.argmax(predictions, dim=1)
+        pred_max_cpu = pred_max.detach().cpu()
+        pred_trans = [self.transitions[pred_max_cpu[idx]] for idx in range(len(states))]
+        no_legal = []
+        if is_legal:
+            illegal = [idx for idx, (state, trans) in enumerate(zip(states, pred_trans)) if not trans.is_legal(state, self)]
+            if illegal:
+                # the best prediction is usually legal, so only build the mask for the states where it is not
+                mask = self.legal_mask([states[idx] for idx in illegal]).to(predictions.device)
+                best = torch.argmax(predictions[illegal].detach().masked_fill(~mask, -float('inf')), dim=1)
+                illegal_idx = torch.tensor(illegal, device=pred_max.device)
+                pred_max[illegal_idx] = best
+                best = best.cpu()
+                has_legal = mask.any(dim=1).cpu()
+                for idx, best_idx, legal in zip(illegal, best, has_legal):
+                    if legal:
+                        pred_trans[idx] = self.transitions[best_idx]
+                    else:
+                        pred_trans[idx] = None
+                        no_legal.append(idx)
+        scores = torch.take_along_dim(predictions, pred_max.unsqueeze(1), dim=1).squeeze(1)
+        if no_legal:
+            scores = scores.clone()
+            scores[no_legal] = float('nan')
+        return pred_trans, scores
+
+    def build_state_arena(self, batch_size):
+        """
+        Return a StateArena for parsing batch_size states at a time, or None to use regular States
+
+        The arena updates states in place, so parse_sentences only uses
+        it when the states are not kept.  Models which cannot use an
+        arena return None
+        """
+        return None
+
     def predict(self, states, is_legal=True):
         raise NotImplementedError("LSTMModel can predict, but SimpleModel cannot")
 
@@ -283,6 +359,9 @@ class BaseModel(ABC):
         treebank = []
         treebank_indices = []
         state_batch = build_batch_fn(batch_size, data_iterator)
+        arena = None if keep_state else self.build_state_arena(batch_size)
+        if arena is not None:
+            state_batch = arena.add_states(state_batch)
         # used to track which indices we are currently parsing
         # since the parses get finished at different times, this will let us unsort after
         batch_indices = list(range(len(state_batch)))
@@ -292,9 +371,11 @@ class BaseModel(ABC):
             constituents = defaultdict(list)
 
         while len(state_batch) > 0:
+            if arena is not None:
+                arena.reserve(state_batch)
             pred_scores, transitions, scores = transition_choice(state_batch)
             if keep_scores and scores is not None:
-                state_batch = [state._replace(score=state.score + score) for state, score in zip(state_batch, scores)]
+                state_batch = [state.add_score(score) for state, score in zip(state_batch, scores)]
             state_batch = parse_transitions.bulk_apply(self, state_batch, transitions)
 
             if keep_constituents:
@@ -329,6 +410,8 @@ class BaseModel(ABC):
                     horizon_iterator = iter(horizon_batch)
                     horizon_state = next(horizon_iterator, None)
 
+                if arena is not None:
+                    horizon_state = arena.add_state(horizon_state)
                 state_batch.append(horizon_state)
                 batch_indices.append(len(treebank) + len(state_batch))
 
@@ -362,7 +445,7 @@ class BaseModel(ABC):
         treebank = self.parse_sentences(tree_iterator, self.build_batch_from_trees_with_gold_sequence, batch_size, self.predict_gold, keep_state, keep_constituents, keep_scores=keep_scores)
         return treebank
 
-    def parse_tagged_words(self, words, batch_size):
+    def parse_tagged_words(self, words, batch_size, token_budget=None):
         """
         This parses tagged words and returns a list of trees.
 
@@ -373,15 +456,29 @@ class BaseModel(ABC):
           one list per sentence
             each sentence is a list of (word, tag)
         The return value is a list of ParseTree objects
+
+        If token_budget is set, the sentences are sorted by length and
+        the new states are built in groups where (longest sentence) *
+        (number of sentences) stays within the budget.  batch_size
+        still limits the number of sentences parsed at once.
         """
         logger.debug("Processing %d sentences", len(words))
         self.eval()
 
-        sentence_iterator = iter(words)
-        treebank = self.parse_sentences_no_grad(sentence_iterator, self.build_batch_from_tagged_words, batch_size, self.predict, keep_state=False, keep_constituents=False)
-
+        if not token_budget:
+            sentence_iterator = iter(words)
+            treebank = self.parse_sentences_no_grad(sentence_iterator, self.build_batch_from_tagged_words, batch_size, self.predict, keep_state=False, keep_constituents=False)
+            return [t.predictions[0].tree for t in treebank]
+
+        words = list(words)
+        batches, orig_idx = padded_cost_batches(words, token_budget, lens=[len(x) for x in words], max_batch_size=batch_size)
+        batch_iterator = iter(batches)
+        def build_batch_fn(_, data_iterator):
+            # the next group of sentences is already chosen, regardless of how many states are requested
+            return self.build_batch_from_tagged_words(batch_size, iter(next(data_iterator, [])))
+        treebank = self.parse_sentences_no_grad(batch_iterator, build_batch_fn, batch_size, self.predict, keep_state=False, keep_constituents=False)
         results = [t.predictions[0].tree for t in treebank]
-        return results
+        return utils.unsort(results, orig_idx)
 
 class SimpleModel(BaseModel):
     """
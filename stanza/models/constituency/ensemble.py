@@ -127,26 +127,8 @@ class Ensemble:
 
         model = self.models[0]
 
-        # TODO: possibly refactor with lstm_model.predict
-        pred_max = torch.argmax(predictions, dim=1)
-        scores = torch.take_along_dim(predictions, pred_max.unsqueeze(1), dim=1)
-        pred_max = pred_max.detach().cpu()
-
-        pred_trans = [model.transitions[pred_max[idx]] for idx in range(len(states[0]))]
-        if is_legal:
-            for idx, (state, trans) in enumerate(zip(states[0], pred_trans)):
-                if not trans.is_legal(state, model):
-                    _, indices = predictions[idx, :].sort(descending=True)
-                    for index in indices:
-                        if model.transitions[index].is_legal(state, model):
-                            pred_trans[idx] = model.transitions[index]
-                            scores[idx] = predictions[idx, index]
-                            break
-                    else: # yeah, else on a for loop, deal with it
-                        pred_trans[idx] = None
-                        scores[idx] = None
-
-        return predictions, pred_trans, scores.squeeze(1)
+        pred_trans, scores = model.choose_transitions(states[0], predictions, is_legal)
+        return predictions, pred_trans, scores
 
     def parse_sentences(self, data_iterator, build_batch_fn, batch_size, transition_choice, keep_state=False, keep_constituents=False, keep_scores=False):
         """
@@ -38,6 +38,7 @@ from torch.nn.utils.rnn import pack_padded_sequence
 
 from stanza.models.common.bert_embedding import extract_bert_embeddings
 from stanza.models.common.maxout_linear import MaxoutLinear
+from stanza.models.common.pretrain import build_pretrained_embedding
 from stanza.models.common.utils import unsort
 from stanza.models.common.vocab import PAD_ID, UNK_ID
 from stanza.models.constituency.base_model import BaseModel
@@ -47,6 +48,7 @@ from stanza.models.constituency.parse_transitions import TransitionScheme
 from stanza.models.constituency.parse_tree import Tree
 from stanza.models.constituency.partitioned_transformer import PartitionedTransformerModule
 from stanza.models.constituency.positional_encoding import ConcatSinusoidalEncoding
+from stanza.models.constituency.state_arena import StateArena
 from stanza.models.constituency.transformer_tree_stack import TransformerTreeStack
 from stanza.models.constituency.tree_stack import TreeStack
 from stanza.models.constituency.utils import build_nonlinearity, initialize_linear
@@ -239,7 +241,7 @@ class LSTMModel(BaseModel, nn.Module):
         self.unsaved_modules = []
 
         emb_matrix = pretrain.emb
-        self.add_unsaved_module('embedding', nn.Embedding.from_pretrained(torch.from_numpy(emb_matrix), freeze=True))
+        self.add_unsaved_module('embedding', build_pretrained_embedding(emb_matrix))
 
         # replacing NBSP picks up a whole bunch of words for VI
         self.vocab_map = { word.replace('\xa0', ' '): i for i, word in enumerate(pretrain.vocab) }
@@ -704,14 +706,16 @@ class LSTMModel(BaseModel, nn.Module):
                 return idx
             return vocab_map.get(word.lower(), UNK_ID)
 
-        all_word_inputs = []
         all_word_labels = [[word.children[0].label for word in tagged_words]
                            for tagged_words in tagged_word_lists]
 
-        for sentence_idx, tagged_words in enumerate(tagged_word_lists):
-            word_labels = all_word_labels[sentence_idx]
-            word_idx = torch.stack([self.vocab_tensors[map_word(word.children[0].label)] for word in tagged_words])
-            word_input = self.embedding(word_idx)
+        # map every word of every sentence to its indices first, so
+        # that each embedding only runs once on the whole batch
+        word_idx = []
+        delta_idx = []
+        tag_idx = []
+        for tagged_words, word_labels in zip(tagged_word_lists, all_word_labels):
+            word_idx.extend(map_word(word) for word in word_labels)
 
             # this occasionally learns UNK at train time
             if self.training:
@@ -719,21 +723,21 @@ class LSTMModel(BaseModel, nn.Module):
                                 for word in word_labels]
             else:
                 delta_labels = word_labels
-            delta_idx = torch.stack([self.delta_tensors[self.delta_word_map.get(word, UNK_ID)] for word in delta_labels])
-
-            delta_input = self.delta_embedding(delta_idx)
-            word_inputs = [word_input, delta_input]
+            delta_idx.extend(self.delta_word_map.get(word, UNK_ID) for word in delta_labels)
 
             if self.tag_embedding_dim > 0:
                 if self.training:
                     tag_labels = [None if random.random() < self.args['tag_unknown_frequency'] else word.label for word in tagged_words]
                 else:
                     tag_labels = [word.label for word in tagged_words]
-                tag_idx = torch.stack([self.tag_tensors[self.tag_map.get(tag, UNK_ID)] for tag in tag_labels])
-                tag_input = self.tag_embedding(tag_idx)
-                word_inputs.append(tag_input)
+                tag_idx.extend(self.tag_map.get(tag, UNK_ID) for tag in tag_labels)
 
-            all_word_inputs.append(word_inputs)
+        sentence_lens = [len(tagged_words) for tagged_words in tagged_word_lists]
+        batch_inputs = [self.embedding(torch.tensor(word_idx, dtype=torch.long, device=device)),
+                        self.delta_embedding(torch.tensor(delta_idx, dtype=torch.long, device=device))]
+        if self.tag_embedding_dim > 0:
+            batch_inputs.append(self.tag_embedding(torch.tensor(tag_idx, dtype=torch.long, device=device)))
+        all_word_inputs = [list(x) for x in zip(*[batch_input.split(sentence_lens) for batch_input in batch_inputs])]
 
         if self.forward_charlm is not None:
             all_forward_chars = self.forward_charlm.build_char_representation(all_word_labels)
@@ -787,27 +791,26 @@ class LSTMModel(BaseModel, nn.Module):
         word_output, word_output_lens = torch.nn.utils.rnn.pad_packed_sequence(word_output)
         # now sentence x batch x hidden_size
 
+        # the transform is applied to the whole padded batch at once
+        word_output = self.nonlinearity(self.word_to_constituent(word_output))
+        # TODO: this makes it so constituents downstream are
+        # build with the outputs of the LSTM, not the word
+        # embeddings themselves.  It is possible we want to
+        # transform the word_input to hidden_size in some way
+        # and use that instead
+
         word_queues = []
         for sentence_idx, tagged_words in enumerate(tagged_word_lists):
             if self.sentence_boundary_vectors is not SentenceBoundary.NONE:
-                sentence_output = word_output[:len(tagged_words)+2, sentence_idx, :]
-            else:
-                sentence_output = word_output[:len(tagged_words), sentence_idx, :]
-            sentence_output = self.word_to_constituent(sentence_output)
-            sentence_output = self.nonlinearity(sentence_output)
-            # TODO: this makes it so constituents downstream are
-            # build with the outputs of the LSTM, not the word
-            # embeddings themselves.  It is possible we want to
-            # transform the word_input to hidden_size in some way
-            # and use that instead
-            if self.sentence_boundary_vectors is not SentenceBoundary.NONE:
-                word_queue =  [WordNode(None, sentence_output[0, :])]
-                word_queue += [WordNode(tag_node, sentence_output[idx+1, :])
+                sentence_output = word_output[:len(tagged_words)+2, sentence_idx, :].unbind(0)
+                word_queue =  [WordNode(None, sentence_output[0])]
+                word_queue += [WordNode(tag_node, sentence_output[idx+1])
                                for idx, tag_node in enumerate(tagged_words)]
-                word_queue.append(WordNode(None, sentence_output[len(tagged_words)+1, :]))
+                word_queue.append(WordNode(None, sentence_output[len(tagged_words)+1]))
             else:
+                sentence_output = word_output[:len(tagged_words), sentence_idx, :].unbind(0)
                 word_queue =  [WordNode(None, self.word_zeros)]
-                word_queue += [WordNode(tag_node, sentence_output[idx, :])
+                word_queue += [WordNode(tag_node, sentence_output[idx])
                                    for idx, tag_node in enumerate(tagged_words)]
                 word_queue.append(WordNode(None, self.word_zeros))
 
@@ -832,6 +835,21 @@ class LSTMModel(BaseModel, nn.Module):
     def get_word(self, word_node):
         return word_node.value
 
+    def build_state_arena(self, batch_size):
+        """
+        Use a StateArena when parsing without gradients, as long as both stacks are LSTMs
+
+        The arena writes the LSTM states in place, which autograd
+        would not be able to follow.  Setting args['state_arena'] to
+        False turns this off: --no_state_arena for constituency_parser,
+        or constituency_state_arena=False for a Pipeline
+        """
+        if torch.is_grad_enabled() or not self.args.get('state_arena', True):
+            return None
+        if not isinstance(self.transition_stack, LSTMTreeStack) or not isinstance(self.constituent_stack, LSTMTreeStack):
+            return None
+        return StateArena(self, batch_size)
+
     def transform_word_to_constituent(self, state):
         word_node = state.get_word(state.word_position)
         word = word_node.value
@@ -1060,13 +1078,13 @@ class LSTMModel(BaseModel, nn.Module):
         return shape: (num_states, num_transitions)
         """
         word_hx = torch.stack([state.get_word(state.word_position).hx for state in states])
-        transition_hx = torch.stack([self.transition_stack.output(state.transitions) for state in states])
+        transition_hx = self.transition_stack.outputs([state.transitions for state in states])
         # this .output() is the output of the constituent stack, not the
         # constituent itself
         # this way, we can, as an option, NOT include the constituents to the left
         # when building the current vector for a constituent
         # and the vector used for inference will still incorporate the entire LSTM
-        constituent_hx = torch.stack([self.constituent_stack.output(state.constituents) for state in states])
+        constituent_hx = self.constituent_stack.outputs([state.constituents for state in states])
 
         hx = torch.cat((word_hx, transition_hx, constituent_hx), axis=1)
         for idx, output_layer in enumerate(self.output_layers):
@@ -1085,25 +1103,8 @@ class LSTMModel(BaseModel, nn.Module):
         Hopefully the constraints prevent that from happening
         """
         predictions = self.forward(states)
-        pred_max = torch.argmax(predictions, dim=1)
-        scores = torch.take_along_dim(predictions, pred_max.unsqueeze(1), dim=1)
-        pred_max = pred_max.detach().cpu()
-
-        pred_trans = [self.transitions[pred_max[idx]] for idx in range(len(states))]
-        if is_legal:
-            for idx, (state, trans) in enumerate(zip(states, pred_trans)):
-                if not trans.is_legal(state, self):
-                    _, indices = predictions[idx, :].sort(descending=True)
-                    for index in indices:
-                        if self.transitions[index].is_legal(state, self):
-                            pred_trans[idx] = self.transitions[index]
-                            scores[idx] = predictions[idx, index]
-                            break
-                    else: # yeah, else on a for loop, deal with it
-                        pred_trans[idx] = None
-                        scores[idx] = None
-
-        return predictions, pred_trans, scores.squeeze(1)
+        pred_trans, scores = self.choose_transitions(states, predictions, is_legal)
+        return predictions, pred_trans, scores
 
     def weighted_choice(self, states):
         """
@@ -1112,20 +1113,16 @@ class LSTMModel(BaseModel, nn.Module):
         TODO: pass in a temperature
         """
         predictions = self.forward(states)
-        pred_trans = []
-        all_scores = []
-        for state, prediction in zip(states, predictions):
-            legal_idx = [idx for idx in range(prediction.shape[0]) if self.transitions[idx].is_legal(state, self)]
-            if len(legal_idx) == 0:
-                pred_trans.append(None)
-                continue
-            scores = prediction[legal_idx]
-            scores = torch.softmax(scores, dim=0)
-            idx = torch.multinomial(scores, 1)
-            idx = legal_idx[idx]
-            pred_trans.append(self.transitions[idx])
-            all_scores.append(prediction[idx])
-        all_scores = torch.stack(all_scores)
+        mask = self.legal_mask(states).to(predictions.device)
+        has_legal = mask.any(dim=1)
+        legal_rows = torch.nonzero(has_legal).squeeze(1)
+        scores = torch.softmax(predictions[legal_rows].masked_fill(~mask[legal_rows], -float('inf')), dim=1)
+        choices = torch.multinomial(scores, 1)
+        all_scores = torch.take_along_dim(predictions[legal_rows], choices, dim=1).squeeze(1)
+
+        pred_trans = [None] * len(states)
+        for row, idx in zip(legal_rows.cpu().tolist(), choices.squeeze(1).cpu().tolist()):
+            pred_trans[row] = self.transitions[idx]
         return predictions, pred_trans, all_scores
 
     def predict_gold(self, states):
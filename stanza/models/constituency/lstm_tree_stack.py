@@ -6,7 +6,7 @@ The TreeStack nodes keep the hx and cx for the LSTM, along with a
 
 The TreeStacks can be ppped to get back to the previous LSTM state.
 
-The module itself implements three methods: initial_state, push_states, output
+The module itself implements four methods: initial_state, push_states, output, outputs
 """
 
 from collections import namedtuple
@@ -14,6 +14,7 @@ from collections import namedtuple
 import torch
 import torch.nn as nn
 
+from stanza.models.constituency.state_arena import ArenaStack
 from stanza.models.constituency.tree_stack import TreeStack
 
 Node = namedtuple("Node", ['value', 'lstm_hx', 'lstm_cx'])
@@ -75,6 +76,16 @@ class LSTMTreeStack(nn.Module):
         """
         inputs = self.input_dropout(inputs)
 
+        if isinstance(stacks[0], ArenaStack):
+            # the previous states can be gathered from the arena in one operation,
+            # and the new states are written back to it without slicing per stack
+            arena = stacks[0].arena
+            index = arena.index(stacks)
+            hx = arena.hx.index_select(1, index)
+            cx = arena.cx.index_select(1, index)
+            output, (hx, cx) = self.lstm(inputs, (hx, cx))
+            return arena.push(stacks, values, hx, cx)
+
         hx = torch.cat([t.value.lstm_hx for t in stacks], axis=1)
         cx = torch.cat([t.value.lstm_cx for t in stacks], axis=1)
         output, (hx, cx) = self.lstm(inputs, (hx, cx))
@@ -88,4 +99,14 @@ class LSTMTreeStack(nn.Module):
 
         Refactored so that alternate structures have an easy way of getting the output
         """
+        if isinstance(stack, ArenaStack):
+            return stack.arena.hx[-1, stack.node, :]
         return stack.value.lstm_hx[-1, 0, :]
+
+    def outputs(self, stacks):
+        """
+        Return the outputs of several stacks at once, shape len(stacks) x hidden_size
+        """
+        if len(stacks) > 0 and isinstance(stacks[0], ArenaStack):
+            return stacks[0].arena.outputs(stacks)
+        return torch.stack([self.output(stack) for stack in stacks])
@@ -106,6 +106,18 @@ class State(namedtuple('State', ['word_queue', 'transitions', 'constituents', 'g
         # (which you can actually get with pos=-1)
         return self.word_queue[pos+1]
 
+    def advance(self, transition, word_position, transitions, constituents):
+        """
+        Return a new State with the results of applying transition
+        """
+        return self._replace(num_opens=self.num_opens + transition.delta_opens(),
+                             word_position=word_position,
+                             transitions=transitions,
+                             constituents=constituents)
+
+    def add_score(self, score):
+        return self._replace(score=self.score + score)
+
     def finished(self, model):
         return self.empty_word_queue() and self.has_one_constituent() and model.get_top_constituent(self.constituents).label in model.get_root_labels()
 
@@ -185,6 +197,16 @@ class Transition(ABC):
         at parse time, the parser might choose a transition which cannot be made
         """
 
+    def legality_key(self, model):
+        """
+        Transitions with the same key are always legal or illegal together
+
+        This lets the model build a legality mask over all transitions
+        with one is_legal call per key instead of one per transition.
+        The default keeps each transition separate, which is always safe
+        """
+        return self
+
     def components(self):
         """
         Return a list of transitions which could theoretically make up this transition
@@ -260,6 +282,9 @@ class Shift(Transition):
                     return False
         return True
 
+    def legality_key(self, model):
+        return Shift
+
     def short_name(self):
         return "Shift"
 
@@ -326,6 +351,10 @@ class CompoundUnary(Transition):
     def components(self):
         return [CompoundUnary(label) for label in self.label]
 
+    def legality_key(self, model):
+        # is_legal only looks at whether the top label is a root
+        return (CompoundUnary, self.label[0] in model.get_root_labels())
+
     def short_name(self):
         return "Unary"
 
@@ -468,6 +497,10 @@ class OpenConstituent(Transition):
     def components(self):
         return [OpenConstituent(label) for label in self.label]
 
+    def legality_key(self, model):
+        # is_legal only looks at whether the top label is a root
+        return (OpenConstituent, self.top_label in model.get_root_labels())
+
     def short_name(self):
         return "Open"
 
@@ -521,6 +554,9 @@ class Finalize(Transition):
         """
         return state.empty_word_queue() and state.has_one_constituent() and not state.finished(model)
 
+    def legality_key(self, model):
+        return Finalize
+
     def short_name(self):
         return "Finalize"
 
@@ -638,6 +674,9 @@ class CloseConstituent(Transition):
                 return False
         return True
 
+    def legality_key(self, model):
+        return CloseConstituent
+
     def short_name(self):
         return "Close"
 
@@ -741,10 +780,7 @@ def bulk_apply(model, state_batch, transitions, fail=False):
     new_transitions = model.push_transitions([tree.transitions for tree in state_batch], transitions)
     new_constituents = model.push_constituents(constituents, new_constituents)
 
-    state_batch = [state._replace(num_opens=state.num_opens + transition.delta_opens(),
-                                 word_position=word_position,
-                                 transitions=transition_stack,
-                                 constituents=constituents)
+    state_batch = [state.advance(transition, word_position, transition_stack, constituents)
                   for (state, transition, word_position, transition_stack, constituents)
                   in zip(state_batch, transitions, word_positions, new_transitions, new_constituents)]
 
@@ -0,0 +1,335 @@
+"""
+An inference-time alternative to the namedtuple State and linked TreeStacks
+
+The regular parser builds a new State with _replace after every
+transition, and each LSTMTreeStack node keeps its own hx & cx slices.
+That is convenient for training, where states can branch (for example,
+when the oracle follows both a gold and a predicted transition), but
+the per-transition object and tensor churn is a large part of the
+cost of parsing a treebank.
+
+Here, all of the stack nodes of a batch live in flat arrays:
+  - NodeArena keeps the parent pointer, length, and value of each node
+    of one LSTM stack, with the hx & cx of every node in one
+    preallocated (num_layers, capacity, hidden_size) tensor each
+  - StateArena keeps one slot per state in the batch, with the word
+    position, open count, score, and pointers to the top of the
+    transition and constituent stacks
+
+ArenaState and ArenaStack are small views over these arrays which
+offer the same methods as State and TreeStack, so the Transitions can
+check legality and update states without knowing which representation
+is in use.  Applying a transition updates the slot in place, so unlike
+State, an ArenaState cannot be branched.  The arena is only meant for
+parse_sentences when no states are kept afterwards.
+"""
+
+import torch
+
+from stanza.models.constituency.parse_transitions import State
+
+class NodeArena:
+    """
+    Flat storage for the nodes of many stacks built on top of one LSTM
+
+    Node 0 is the sentinel shared by all of the stacks.  Nodes which
+    are no longer reachable from a live state are dropped when the
+    arena runs out of room, so the memory used stays proportional to
+    the batch rather than the number of sentences parsed.
+    """
+    def __init__(self, initial_stack, capacity):
+        """
+        initial_stack: a TreeStack sentinel from LSTMTreeStack.initial_state
+        capacity: the number of nodes to preallocate
+        """
+        if initial_stack.parent is not None:
+            raise ValueError("NodeArena must be built from the bottom of a stack")
+        hx = initial_stack.value.lstm_hx
+        cx = initial_stack.value.lstm_cx
+        capacity = max(capacity, 1)
+        self.hx = hx.new_zeros(hx.shape[0], capacity, hx.shape[2])
+        self.cx = cx.new_zeros(cx.shape[0], capacity, cx.shape[2])
+        self.hx[:, :1, :] = hx
+        self.cx[:, :1, :] = cx
+        # the Nodes in values keep the value the model pushed,
+        # but the LSTM states are only kept in hx & cx
+        self.values = [initial_stack.value._replace(lstm_hx=None, lstm_cx=None)]
+        self.parents = [-1]
+        self.lengths = [1]
+
+    def __len__(self):
+        return len(self.parents)
+
+    def capacity(self):
+        return self.hx.shape[1]
+
+    def root(self):
+        return ArenaStack(self, 0)
+
+    def push(self, stacks, values, hx, cx):
+        """
+        Add one new node on top of each of the stacks
+
+        hx & cx are the LSTM states of the new nodes, shape (num_layers, len(stacks), hidden_size)
+        Returns an ArenaStack for each new node
+        """
+        start = len(self.parents)
+        end = start + len(stacks)
+        if end > self.capacity():
+            raise RuntimeError("NodeArena is full.  Call StateArena.reserve before each step")
+        self.hx[:, start:end, :] = hx
+        self.cx[:, start:end, :] = cx
+        self.values.extend(self.values[0]._replace(value=value) for value in values)
+        self.parents.extend(stack.node for stack in stacks)
+        self.lengths.extend(self.lengths[stack.node] + 1 for stack in stacks)
+        return [ArenaStack(self, node) for node in range(start, end)]
+
+    def index(self, stacks):
+        """
+        Returns a tensor of the node index of each of the stacks
+        """
+        return torch.tensor([stack.node for stack in stacks], device=self.hx.device)
+
+    def outputs(self, stacks):
+        """
+        The output of the last LSTM layer for each stack, shape (len(stacks), hidden_size)
+        """
+        return self.hx[-1].index_select(0, self.index(stacks))
+
+    def compact(self, roots):
+        """
+        Keep only the nodes reachable from the given top nodes
+
+        Returns a map from the old node index to the new index
+        """
+        live = {0}
+        for node in roots:
+            while node not in live:
+                live.add(node)
+                node = self.parents[node]
+        live = sorted(live)
+        remap = {old: new for new, old in enumerate(live)}
+        index = torch.tensor(live, device=self.hx.device)
+        self.hx[:, :len(live), :] = self.hx.index_select(1, index)
+        self.cx[:, :len(live), :] = self.cx.index_select(1, index)
+        self.values = [self.values[old] for old in live]
+        self.parents = [-1] + [remap[self.parents[old]] for old in live[1:]]
+        self.lengths = [self.lengths[old] for old in live]
+        return remap
+
+    def reserve(self, num_nodes, roots):
+        """
+        Make sure there is room for num_nodes more nodes
+
+        First drops the unreachable nodes, then grows the arena if it
+        would still be more than half full.  Returns the remap from
+        compact, or None if nothing moved
+        """
+        if len(self) + num_nodes <= self.capacity():
+            return None
+        remap = self.compact(roots)
+        needed = len(self) + num_nodes
+        if needed * 2 > self.capacity():
+            capacity = max(self.capacity() * 2, needed * 2)
+            hx = self.hx.new_zeros(self.hx.shape[0], capacity, self.hx.shape[2])
+            cx = self.cx.new_zeros(self.cx.shape[0], capacity, self.cx.shape[2])
+            hx[:, :len(self), :] = self.hx[:, :len(self), :]
+            cx[:, :len(self), :] = self.cx[:, :len(self), :]
+            self.hx = hx
+            self.cx = cx
+        return remap
+
+class ArenaStack:
+    """
+    A view of one node of a NodeArena which acts like a TreeStack
+    """
+    __slots__ = ('arena', 'node')
+
+    def __init__(self, arena, node):
+        self.arena = arena
+        self.node = node
+
+    @property
+    def value(self):
+        return self.arena.values[self.node]
+
+    @property
+    def parent(self):
+        parent = self.arena.parents[self.node]
+        if parent < 0:
+            return None
+        return ArenaStack(self.arena, parent)
+
+    @property
+    def length(self):
+        return self.arena.lengths[self.node]
+
+    def pop(self):
+        return self.parent
+
+    def __iter__(self):
+        arena = self.arena
+        node = self.node
+        while node >= 0:
+            yield arena.values[node]
+            node = arena.parents[node]
+
+    def __len__(self):
+        return self.arena.lengths[self.node]
+
+    def __str__(self):
+        return "ArenaStack(%s)" % ", ".join([str(x) for x in self])
+
+class StateArena:
+    """
+    Per-slot arrays for a batch of states, along with the NodeArenas for their stacks
+
+    Slots are reused as states finish and new states join the batch
+    """
+    def __init__(self, model, batch_size, nodes_per_state=32):
+        capacity = batch_size * nodes_per_state
+        self.transition_nodes = NodeArena(model.initial_transitions(), capacity)
+        self.constituent_nodes = NodeArena(model.initial_constituents(), capacity)
+
+        self.word_queue = [None] * batch_size
+        self.sentence_length = [0] * batch_size
+        self.num_opens = [0] * batch_size
+        self.word_position = [0] * batch_size
+        self.score = [0.0] * batch_size
+        self.gold_tree = [None] * batch_size
+        self.gold_sequence = [None] * batch_size
+        self.transitions = [0] * batch_size
+        self.constituents = [0] * batch_size
+        self.free_slots = list(reversed(range(batch_size)))
+
+    def add_state(self, state):
+        """
+        Copy a newly built State into a free slot and return its ArenaState
+
+        Only States which have not had any transitions applied can be added
+        """
+        if state.transitions.parent is not None or state.constituents.parent is not None:
+            raise ValueError("Can only add initial states to a StateArena")
+        if not self.free_slots:
+            self.extend_slots(len(self.word_queue))
+        slot = self.free_slots.pop()
+        self.word_queue[slot] = state.word_queue
+        self.sentence_length[slot] = state.sentence_length
+        self.num_opens[slot] = state.num_opens
+        self.word_position[slot] = state.word_position
+        self.score[slot] = state.score
+        self.gold_tree[slot] = state.gold_tree
+        self.gold_sequence[slot] = state.gold_sequence
+        self.transitions[slot] = 0
+        self.constituents[slot] = 0
+        return ArenaState(self, slot)
+
+    def add_states(self, states):
+        return [self.add_state(state) for state in states]
+
+    def extend_slots(self, num_slots):
+        start = len(self.word_queue)
+        for array, default in ((self.word_queue, None), (self.sentence_length, 0), (self.num_opens, 0),
+                               (self.word_position, 0), (self.score, 0.0), (self.gold_tree, None),
+                               (self.gold_sequence, None), (self.transitions, 0), (self.constituents, 0)):
+            array.extend([default] * num_slots)
+        self.free_slots.extend(reversed(range(start, start + num_slots)))
+
+    def reserve(self, states):
+        """
+        Prepare the arena for one transition of each of the given states
+
+        Any slot which is not one of these states is released, so this
+        should be called with the full batch before each step
+        """
+        live_slots = set(state.slot for state in states)
+        self.free_slots = [slot for slot in reversed(range(len(self.word_queue))) if slot not in live_slots]
+        for slot in self.free_slots:
+            # let go of the words and trees of finished sentences
+            self.word_queue[slot] = None
+            self.gold_tree[slot] = None
+            self.gold_sequence[slot] = None
+
+        for nodes, pointers in ((self.transition_nodes, self.transitions), (self.constituent_nodes, self.constituents)):
+            remap = nodes.reserve(len(states), [pointers[slot] for slot in live_slots])
+            if remap is not None:
+                for slot in live_slots:
+                    pointers[slot] = remap[pointers[slot]]
+
+class ArenaState:
+    """
+    A view of one slot of a StateArena which acts like a State
+
+    The methods which only read the state are shared with State
+    """
+    __slots__ = ('arena', 'slot')
+
+    def __init__(self, arena, slot):
+        self.arena = arena
+        self.slot = slot
+
+    @property
+    def word_queue(self):
+        return self.arena.word_queue[self.slot]
+
+    @property
+    def sentence_length(self):
+        return self.arena.sentence_length[self.slot]
+
+    @property
+    def num_opens(self):
+        return self.arena.num_opens[self.slot]
+
+    @property
+    def word_position(self):
+        return self.arena.word_position[self.slot]
+
+    @property
+    def score(self):
+        return self.arena.score[self.slot]
+
+    @property
+    def gold_tree(self):
+        return self.arena.gold_tree[self.slot]
+
+    @property
+    def gold_sequence(self):
+        return self.arena.gold_sequence[self.slot]
+
+    @property
+    def transitions(self):
+        return ArenaStack(self.arena.transition_nodes, self.arena.transitions[self.slot])
+
+    @property
+    def constituents(self):
+        return ArenaStack(self.arena.constituent_nodes, self.arena.constituents[self.slot])
+
+    def advance(self, transition, word_position, transitions, constituents):
+        """
+        Update this slot in place after applying transition
+        """
+        arena = self.arena
+        slot = self.slot
+        arena.num_opens[slot] += transition.delta_opens()
+        arena.word_position[slot] = word_position
+        arena.transitions[slot] = transitions.node
+        arena.constituents[slot] = constituents.node
+        return self
+
+    def add_score(self, score):
+        self.arena.score[self.slot] = self.arena.score[self.slot] + score
+        return self
+
+    empty_word_queue = State.empty_word_queue
+    empty_transitions = State.empty_transitions
+    has_one_constituent = State.has_one_constituent
+    num_constituents = State.num_constituents
+    num_transitions = State.num_transitions
+    get_word = State.get_word
+    finished = State.finished
+    get_tree = State.get_tree
+    all_transitions = State.all_transitions
+    all_constituents = State.all_constituents
+    all_words = State.all_words
+    to_string = State.to_string
+    __str__ = State.__str__
@@ -22,6 +22,7 @@ import sys
 import torch
 from torch import nn
 
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common import pretrain
 from stanza.models.common import utils
 from stanza.models.common.foundation_cache import load_bert, load_charlm, load_pretrain, FoundationCache
@@ -47,6 +48,8 @@ tqdm = get_tqdm()
 
 logger = logging.getLogger('stanza.constituency.trainer')
 
+INFERENCE_ARGS = ('state_arena',)
+
 class Trainer:
     """
     Stores a constituency model and its optimizer
@@ -112,7 +115,7 @@ class Trainer:
 
         Refactoring allows other processors to include a constituency parser as a module
         """
-        saved_args = dict(params['config'])
+        saved_args = {k: v for k, v in params['config'].items() if k not in INFERENCE_ARGS}
         # some parameters which change the structure of a model have
         # to be ignored, or the model will not function when it is
         # reloaded from disk
@@ -174,7 +177,7 @@ class Trainer:
                               args=saved_args)
         else:
             raise ValueError("Unknown model type {}".format(model_type))
-        model.load_state_dict(params['model'], strict=False)
+        load_model_state(model, params['model'], strict=False)
         # model will stay on CPU if device==None
         # can be moved elsewhere later, of course
         model = model.to(args.get('device', None))
@@ -193,7 +196,7 @@ class Trainer:
             else:
                 raise FileNotFoundError("Cannot find model in {} or in {}".format(filename, os.path.join(args['save_dir'], filename)))
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.exception("Cannot load model from %s", filename)
             raise
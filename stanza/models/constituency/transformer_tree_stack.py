@@ -139,7 +139,7 @@ class TransformerTreeStack(nn.Module):
 
         Runs attention starting from the existing keys & values
         """
-        device = self.w_key.weight.device
+        device = inputs.device
 
         batch_len = len(stacks)   # B
         positions = [x.value.key_stack.shape[0] for x in stacks]
@@ -196,3 +196,9 @@ class TransformerTreeStack(nn.Module):
         Refactored so that alternate structures have an easy way of getting the output
         """
         return stack.value.output
+
+    def outputs(self, stacks):
+        """
+        Return the outputs of several stacks at once, shape len(stacks) x output_size
+        """
+        return torch.stack([self.output(stack) for stack in stacks])
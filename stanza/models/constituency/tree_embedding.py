@@ -11,6 +11,7 @@ Can be done over an existing parse tree or unparsed text
 import torch
 import torch.nn as nn
 
+from stanza.models.common.checkpoint import load_model_state
 from stanza.models.constituency.trainer import Trainer
 
 class TreeEmbedding(nn.Module):
@@ -130,5 +131,5 @@ class TreeEmbedding(nn.Module):
     def model_from_params(params, args, foundation_cache=None):
         constituency_parser = Trainer.model_from_params(params['constituency'], args, foundation_cache)
         model = TreeEmbedding(constituency_parser, params['config'])
-        model.load_state_dict(params['model'], strict=False)
+        load_model_state(model, params['model'], strict=False)
         return model
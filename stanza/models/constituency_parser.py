@@ -412,6 +412,7 @@ def build_argparse():
     # operations and the prediction step
     parser.add_argument('--train_batch_size', type=int, default=30, help='How many trees to train before taking an optimizer step')
     parser.add_argument('--eval_batch_size', type=int, default=50, help='How many trees to batch when running eval')
+    parser.add_argument('--no_state_arena', dest='state_arena', default=True, action='store_false', help="Don't use the StateArena when parsing without gradients, such as when scoring the dev set.  The slower namedtuple States are used instead")
 
     parser.add_argument('--save_dir', type=str, default='saved_models/constituency', help='Root dir for saving models.')
     parser.add_argument('--save_name', type=str, default="{shorthand}_{embedding}_{finetune}_constituency.pt", help="File name to save the model")
@@ -3,7 +3,7 @@ import logging
 import torch
 
 from stanza.models.common.bert_embedding import filter_data
-from stanza.models.common.data import map_to_ids, get_long_tensor, get_float_tensor, sort_all
+from stanza.models.common.data import map_to_ids, get_long_tensor, get_float_tensor, sort_all, padded_cost_batches
 from stanza.models.common.vocab import PAD_ID, VOCAB_PREFIX, ROOT_ID, CompositeVocab, CharVocab
 from stanza.models.pos.vocab import WordVocab, XPOSVocab, FeatureVocab, MultiVocab
 from stanza.models.pos.xpos_vocab_factory import xpos_vocab_factory
@@ -11,7 +11,7 @@ from stanza.models.common.doc import *
 
 logger = logging.getLogger('stanza')
 
-def data_to_batches(data, batch_size, eval_mode, sort_during_eval, min_length_to_batch_separately):
+def data_to_batches(data, batch_size, eval_mode, sort_during_eval, min_length_to_batch_separately, token_budget=None):
     """
     Given a list of lists, where the first element of each sublist
     represents the sentence, group the sentences into batches.
@@ -23,10 +23,17 @@ def data_to_batches(data, batch_size, eval_mode, sort_during_eval, min_length_to
     Refactored from the data structure in case other models could use
     it and for ease of testing.
 
+    If token_budget is set in eval mode, the sentences are instead
+    sorted and packed so that (longest sentence) * (batch size) stays
+    within the budget.  See common.data.padded_cost_batches
+
     Returns (batches, original_order), where original_order is None
     when in train mode or when unsorted and represents the original
     location of each sentence in the sort
     """
+    if eval_mode and token_budget:
+        return padded_cost_batches(data, token_budget)
+
     res = []
 
     if not eval_mode:
@@ -63,8 +70,9 @@ def data_to_batches(data, batch_size, eval_mode, sort_during_eval, min_length_to
 
 class DataLoader:
 
-    def __init__(self, doc, batch_size, args, pretrain, vocab=None, evaluation=False, sort_during_eval=False, min_length_to_batch_separately=None, bert_tokenizer=None):
+    def __init__(self, doc, batch_size, args, pretrain, vocab=None, evaluation=False, sort_during_eval=False, min_length_to_batch_separately=None, bert_tokenizer=None, token_budget=None):
         self.batch_size = batch_size
+        self.token_budget = token_budget
         self.min_length_to_batch_separately=min_length_to_batch_separately
         self.args = args
         self.eval = evaluation
@@ -126,9 +134,15 @@ class DataLoader:
         processed = []
         xpos_replacement = [[ROOT_ID] * len(vocab['xpos'])] if isinstance(vocab['xpos'], CompositeVocab) else [ROOT_ID]
         feats_replacement = [[ROOT_ID] * len(vocab['feats'])]
+        # most words repeat, so map the characters of each word type only once
+        word_chars = {}
+        def map_chars(word):
+            if word not in word_chars:
+                word_chars[word] = vocab['char'].map([x for x in word])
+            return word_chars[word]
         for sent in data:
             processed_sent = [[ROOT_ID] + vocab['word'].map([w[0] for w in sent])]
-            processed_sent += [[[ROOT_ID]] + [vocab['char'].map([x for x in w[0]]) for w in sent]]
+            processed_sent += [[[ROOT_ID]] + [map_chars(w[0]) for w in sent]]
             processed_sent += [[ROOT_ID] + vocab['upos'].map([w[1] for w in sent])]
             processed_sent += [xpos_replacement + vocab['xpos'].map([w[2] for w in sent])]
             processed_sent += [feats_replacement + vocab['feats'].map([w[3] for w in sent])]
@@ -213,7 +227,8 @@ class DataLoader:
     def chunk_batches(self, data):
         batches, data_orig_idx = data_to_batches(data=data, batch_size=self.batch_size,
                                                  eval_mode=self.eval, sort_during_eval=self.sort_during_eval,
-                                                 min_length_to_batch_separately=self.min_length_to_batch_separately)
+                                                 min_length_to_batch_separately=self.min_length_to_batch_separately,
+                                                 token_budget=self.token_budget)
         # data_orig_idx might be None at train time, since we don't anticipate unsorting
         self.data_orig_idx = data_orig_idx
         return batches
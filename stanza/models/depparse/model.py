@@ -12,8 +12,9 @@ from stanza.models.common.biaffine import DeepBiaffineScorer
 from stanza.models.common.foundation_cache import load_bert, load_charlm
 from stanza.models.common.hlstm import HighwayLSTM
 from stanza.models.common.dropout import WordDropout
+from stanza.models.common.pretrain import build_pretrained_embedding
 from stanza.models.common.vocab import CompositeVocab
-from stanza.models.common.char_model import CharacterModel, CharacterLanguageModel
+from stanza.models.common.char_model import CharacterModel, CharacterLanguageModel, ROOT_WORD
 
 logger = logging.getLogger('stanza')
 
@@ -99,7 +100,7 @@ class Parser(nn.Module):
 
         if self.args['pretrain']:
             # pretrained embeddings, by default this won't be saved into model file
-            add_unsaved_module('pretrained_emb', nn.Embedding.from_pretrained(torch.from_numpy(emb_matrix), freeze=True))
+            add_unsaved_module('pretrained_emb', build_pretrained_embedding(emb_matrix))
             self.trans_pretrained = nn.Linear(emb_matrix.shape[1], self.args['transformed_dim'], bias=False)
             input_size += self.args['transformed_dim']
 
@@ -164,7 +165,7 @@ class Parser(nn.Module):
         if self.args['char'] and self.args['char_emb_dim'] > 0:
             if self.args.get('charlm', None):
                 # \n is to add a somewhat neutral "word" for the ROOT
-                charlm_text = [["\n"] + x for x in text]
+                charlm_text = [[ROOT_WORD] + x for x in text]
                 all_forward_chars = self.charmodel_forward.build_char_representation(charlm_text)
                 all_forward_chars = pack(pad_sequence(all_forward_chars, batch_first=True))
                 all_backward_chars = self.charmodel_backward.build_char_representation(charlm_text)
@@ -202,7 +203,11 @@ class Parser(nn.Module):
         lstm_outputs, _ = pad_packed_sequence(lstm_outputs, batch_first=True)
 
         unlabeled_scores = self.unlabeled(self.drop(lstm_outputs), self.drop(lstm_outputs)).squeeze(3)
-        deprel_scores = self.deprel(self.drop(lstm_outputs), self.drop(lstm_outputs))
+        # in two phase mode, deprels are only scored for the heads chosen
+        # by the decoder, in predict_deprels, instead of for every pair
+        two_phase = not self.training and self.args.get('two_phase_deprel', True)
+        if not two_phase:
+            deprel_scores = self.deprel(self.drop(lstm_outputs), self.drop(lstm_outputs))
 
         #goldmask = head.new_zeros(*head.size(), head.size(-1)+1, dtype=torch.uint8)
         #goldmask.scatter_(2, head.unsqueeze(2), 1)
@@ -255,6 +260,22 @@ class Parser(nn.Module):
         else:
             loss = 0
             preds.append(F.log_softmax(unlabeled_scores, 2).detach().cpu().numpy())
-            preds.append(deprel_scores.max(3)[1].detach().cpu().numpy())
+            if two_phase:
+                preds.append(lstm_outputs.detach())
+            else:
+                preds.append(deprel_scores.max(3)[1].detach().cpu().numpy())
 
         return loss, preds
+
+    def predict_deprels(self, lstm_outputs, heads):
+        """
+        Pick the best deprel of each word for the head it was assigned
+
+        lstm_outputs: the second prediction of forward in two phase mode
+        heads: batch x n LongTensor of the head of each position.  Position 0 is ROOT and is ignored
+
+        Returns a batch x n array of deprel ids
+        """
+        with torch.no_grad():
+            deprel_scores = self.deprel.score_pairs(self.drop(lstm_outputs), self.drop(lstm_outputs), heads)
+            return deprel_scores.max(2)[1].cpu().numpy()
@@ -7,15 +7,18 @@ import logging
 import torch
 from torch import nn
 
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.trainer import Trainer as BaseTrainer
 from stanza.models.common import utils, loss
 from stanza.models.common.foundation_cache import NoTransformerFoundationCache
-from stanza.models.common.chuliu_edmonds import chuliu_edmonds_one_root
+from stanza.models.common.chuliu_edmonds import chuliu_edmonds_one_root, decode_trees, mst_executor
 from stanza.models.depparse.model import Parser
 from stanza.models.pos.vocab import MultiVocab
 
 logger = logging.getLogger('stanza')
 
+INFERENCE_ARGS = ('greedy_mst', 'mst_threads', 'two_phase_deprel', 'char_cache_size')
+
 def unpack_batch(batch, device):
     """ Unpack a batch from the data loader. """
     inputs = [b.to(device) if b is not None else None for b in batch[:11]]
@@ -60,6 +63,12 @@ class Trainer(BaseTrainer):
         self.optimizer.step()
         return loss_val
 
+    def mst_executor(self):
+        """
+        A thread pool for the MST fallback, if mst_threads is set
+        """
+        return mst_executor(self.args.get('mst_threads', 0))
+
     def predict(self, batch, unsort=True):
         device = next(self.model.parameters()).device
         inputs, orig_idx, word_orig_idx, sentlens, wordlens, text = unpack_batch(batch, device)
@@ -68,8 +77,19 @@ class Trainer(BaseTrainer):
         self.model.eval()
         batch_size = word.size(0)
         _, preds = self.model(word, word_mask, wordchars, wordchars_mask, upos, xpos, ufeats, pretrained, lemma, head, deprel, word_orig_idx, sentlens, wordlens, text)
-        head_seqs = [chuliu_edmonds_one_root(adj[:l, :l])[1:] for adj, l in zip(preds[0], sentlens)] # remove attachment for the root
-        deprel_seqs = [self.vocab['deprel'].unmap([preds[1][i][j+1][h] for j, h in enumerate(hs)]) for i, hs in enumerate(head_seqs)]
+        if self.args.get('greedy_mst', True):
+            head_seqs = [tree[1:] for tree in decode_trees(preds[0], sentlens, self.mst_executor())] # remove attachment for the root
+        else:
+            head_seqs = [chuliu_edmonds_one_root(adj[:l, :l])[1:] for adj, l in zip(preds[0], sentlens)] # remove attachment for the root
+        if isinstance(preds[1], torch.Tensor):
+            # two phase mode: score the deprels of the chosen heads only
+            heads = torch.zeros(preds[1].shape[:2], dtype=torch.long)
+            for i, hs in enumerate(head_seqs):
+                heads[i, 1:len(hs)+1] = torch.as_tensor(hs, dtype=torch.long)
+            deprels = self.model.predict_deprels(preds[1], heads.to(preds[1].device))
+            deprel_seqs = [self.vocab['deprel'].unmap([deprels[i][j+1] for j in range(len(hs))]) for i, hs in enumerate(head_seqs)]
+        else:
+            deprel_seqs = [self.vocab['deprel'].unmap([preds[1][i][j+1][h] for j, h in enumerate(hs)]) for i, hs in enumerate(head_seqs)]
 
         pred_tokens = [[[str(head_seqs[i][j]), deprel_seqs[i][j]] for j in range(sentlens[i]-1)] for i in range(batch_size)]
         if unsort:
@@ -86,7 +106,7 @@ class Trainer(BaseTrainer):
         params = {
                 'model': model_state,
                 'vocab': self.vocab.state_dict(),
-                'config': self.args
+                'config': {k: v for k, v in self.args.items() if k not in INFERENCE_ARGS}
                 }
         try:
             torch.save(params, filename, _use_new_zipfile_serialization=False)
@@ -100,11 +120,11 @@ class Trainer(BaseTrainer):
         and the actual use of pretrain embeddings will depend on the boolean config "pretrain" in the loaded args.
         """
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.error("Cannot load model from {}".format(filename))
             raise
-        self.args = checkpoint['config']
+        self.args = {k: v for k, v in checkpoint['config'].items() if k not in INFERENCE_ARGS}
         if args is not None: self.args.update(args)
         # preserve old models which were created before transformers were added
         if 'bert_model' not in self.args:
@@ -118,5 +138,5 @@ class Trainer(BaseTrainer):
             logger.debug("Model %s has a finetuned transformer.  Not using transformer cache to make sure the finetuned version of the transformer isn't accidentally used elsewhere", filename)
             foundation_cache = NoTransformerFoundationCache(foundation_cache)
         self.model = Parser(self.args, self.vocab, emb_matrix=emb_matrix, foundation_cache=foundation_cache)
-        self.model.load_state_dict(checkpoint['model'], strict=False)
+        load_model_state(self.model, checkpoint['model'], strict=False)
 
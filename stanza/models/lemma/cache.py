@@ -0,0 +1,140 @@
+"""
+A size bounded cache of lemmatizer results, optionally backed by sqlite
+
+The seq2seq lemmatizer only looks at the word and its UPOS, so once a
+(word, upos) pair has been lemmatized the result can be reused for
+every later occurrence.  The cache keeps the most recently used pairs
+in memory.  With a sqlite file, results are also written to disk, so
+that other processes and later runs using the same model start warm.
+
+Entries are keyed by a model id as well, so several models, or several
+versions of the same model, can share one sqlite file.
+"""
+
+from collections import OrderedDict
+import logging
+import os
+import sqlite3
+import threading
+
+from stanza.resources.common import MD5_CACHE_FILENAME, get_cached_md5
+
+logger = logging.getLogger('stanza')
+
+DEFAULT_CACHE_SIZE = 100000
+
+def model_file_id(filename, model_dir=None):
+    """
+    Identify a model by the md5 of its file, so a retrained model does not reuse old results
+
+    If the file is under model_dir, the md5 cache of model_dir is used,
+    so the file is only hashed again after it changes
+    """
+    md5_cache = None
+    if model_dir is not None:
+        model_dir = os.path.abspath(model_dir)
+        if os.path.commonpath([model_dir, os.path.abspath(filename)]) == model_dir:
+            md5_cache = os.path.join(model_dir, MD5_CACHE_FILENAME)
+    return get_cached_md5(filename, md5_cache)
+
+class LemmaCache:
+    def __init__(self, model_id, max_size=DEFAULT_CACHE_SIZE, filename=None):
+        """
+        model_id: results from different models are kept separate
+        max_size: number of (word, upos) pairs kept in memory
+        filename: if set, a sqlite file used to persist the results
+        """
+        self.model_id = model_id
+        self.max_size = max_size
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if filename:
+            # the connection is protected by our own lock
+            self._connection = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS lemmas (model_id TEXT, word TEXT, upos TEXT, lemma TEXT, PRIMARY KEY (model_id, word, upos))")
+            self._connection.commit()
+            self.warm_up()
+
+    def warm_up(self):
+        """
+        Fill the in memory cache from the sqlite file
+        """
+        cursor = self._connection.execute("SELECT word, upos, lemma FROM lemmas WHERE model_id = ? LIMIT ?", (self.model_id, self.max_size))
+        with self._lock:
+            for word, upos, lemma in cursor:
+                self._entries[(word, upos)] = lemma
+        logger.debug("Loaded %d cached lemmas from %s", len(self._entries), self.filename)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_from_file(self, key):
+        row = self._connection.execute("SELECT lemma FROM lemmas WHERE model_id = ? AND word = ? AND upos IS ?", (self.model_id, key[0], key[1])).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def _add(self, key, lemma):
+        self._entries[key] = lemma
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def lookup(self, pairs):
+        """
+        Returns the cached lemma of each (word, upos) pair, or None for pairs which are not cached
+
+        Pairs not in memory are looked up in the sqlite file, if there is one
+        """
+        lemmas = []
+        with self._lock:
+            for key in pairs:
+                key = tuple(key)
+                lemma = self._entries.get(key)
+                if lemma is not None:
+                    self._entries.move_to_end(key)
+                elif self._connection is not None:
+                    lemma = self._get_from_file(key)
+                    if lemma is not None:
+                        self._add(key, lemma)
+                if lemma is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                lemmas.append(lemma)
+        return lemmas
+
+    def update(self, triples):
+        """
+        Add (word, upos, lemma) triples to the cache, and to the sqlite file if there is one
+        """
+        triples = [tuple(x) for x in triples]
+        if not triples:
+            return
+        with self._lock:
+            for word, upos, lemma in triples:
+                self._add((word, upos), lemma)
+            if self._connection is not None:
+                self._connection.executemany("INSERT OR REPLACE INTO lemmas (model_id, word, upos, lemma) VALUES (?, ?, ?, ?)",
+                                             [(self.model_id, word, upos, lemma) for word, upos, lemma in triples])
+                self._connection.commit()
+
+    def stats(self):
+        """
+        Returns a dict with the hits, misses, hit rate, and number of entries in memory
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total > 0 else 0.0,
+                'size': len(self._entries)}
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
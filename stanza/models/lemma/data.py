@@ -6,7 +6,7 @@ import logging
 import torch
 
 import stanza.models.common.seq2seq_constant as constant
-from stanza.models.common.data import map_to_ids, get_long_tensor, get_float_tensor, sort_all
+from stanza.models.common.data import map_to_ids, get_long_tensor, get_float_tensor, sort_all, padded_cost_batches
 from stanza.models.lemma.vocab import Vocab, MultiVocab
 from stanza.models.lemma import edit
 from stanza.models.common.doc import *
@@ -14,7 +14,7 @@ from stanza.models.common.doc import *
 logger = logging.getLogger('stanza')
 
 class DataLoader:
-    def __init__(self, doc, batch_size, args, vocab=None, evaluation=False, conll_only=False, skip=None):
+    def __init__(self, doc, batch_size, args, vocab=None, evaluation=False, conll_only=False, skip=None, token_budget=None):
         self.batch_size = batch_size
         self.args = args
         self.eval = evaluation
@@ -53,7 +53,12 @@ class DataLoader:
         self.num_examples = len(data)
 
         # chunk into batches
-        data = [data[i:i+batch_size] for i in range(0, len(data), batch_size)]
+        if self.eval and token_budget:
+            # sorts the words, so the predictions need to be unsorted with data_orig_idx
+            data, self.data_orig_idx = padded_cost_batches(data, token_budget)
+        else:
+            data = [data[i:i+batch_size] for i in range(0, len(data), batch_size)]
+            self.data_orig_idx = None
         self.data = data
         logger.debug("{} batches created.".format(len(data)))
 
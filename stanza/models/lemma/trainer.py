@@ -12,6 +12,7 @@ from torch import nn
 import torch.nn.init as init
 
 import stanza.models.common.seq2seq_constant as constant
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.foundation_cache import load_charlm
 from stanza.models.common.seq2seq_model import Seq2SeqModel
 from stanza.models.common.char_model import CharacterLanguageModelWordAdapter
@@ -224,7 +225,7 @@ class Trainer(object):
 
     def load(self, filename, args, foundation_cache):
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.error("Cannot load model from {}".format(filename))
             raise
@@ -237,7 +238,7 @@ class Trainer(object):
             self.model = self.build_seq2seq(self.args, None, foundation_cache)
             # could remove strict=False after rebuilding all models,
             # or could switch to 1.6.0 torch with the buffer in seq2seq persistent=False
-            self.model.load_state_dict(checkpoint['model'], strict=False)
+            load_model_state(self.model, checkpoint['model'], strict=False)
         else:
             self.model = None
         self.vocab = MultiVocab.load_state_dict(checkpoint['vocab'])
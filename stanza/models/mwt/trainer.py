@@ -11,6 +11,7 @@ from torch import nn
 import torch.nn.init as init
 
 import stanza.models.common.seq2seq_constant as constant
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.trainer import Trainer as BaseTrainer
 from stanza.models.common.seq2seq_model import Seq2SeqModel
 from stanza.models.common import utils, loss
@@ -130,7 +131,7 @@ class Trainer(BaseTrainer):
 
     def load(self, filename):
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.error("Cannot load model from {}".format(filename))
             raise
@@ -140,7 +141,7 @@ class Trainer(BaseTrainer):
             self.model = Seq2SeqModel(self.args)
             # could remove strict=False after rebuilding all models,
             # or could switch to 1.6.0 torch with the buffer in seq2seq persistent=False
-            self.model.load_state_dict(checkpoint['model'], strict=False)
+            load_model_state(self.model, checkpoint['model'], strict=False)
         else:
             self.model = None
         self.vocab = Vocab.load_state_dict(checkpoint['vocab'])
@@ -3,7 +3,7 @@ import logging
 import torch
 
 from stanza.models.common.bert_embedding import filter_data
-from stanza.models.common.data import map_to_ids, get_long_tensor, sort_all
+from stanza.models.common.data import map_to_ids, get_long_tensor, sort_all, padded_cost_batches
 from stanza.models.common.vocab import PAD_ID, VOCAB_PREFIX
 from stanza.models.pos.vocab import CharVocab, WordVocab
 from stanza.models.ner.vocab import TagVocab, MultiVocab
@@ -13,8 +13,9 @@ from stanza.models.ner.utils import process_tags
 logger = logging.getLogger('stanza')
 
 class DataLoader:
-    def __init__(self, doc, batch_size, args, pretrain=None, vocab=None, evaluation=False, preprocess_tags=True, bert_tokenizer=None):
+    def __init__(self, doc, batch_size, args, pretrain=None, vocab=None, evaluation=False, preprocess_tags=True, bert_tokenizer=None, token_budget=None):
         self.batch_size = batch_size
+        self.token_budget = token_budget
         self.args = args
         self.eval = evaluation
         self.shuffled = not self.eval
@@ -182,6 +183,11 @@ class DataLoader:
         self.data = self.chunk_batches(data)
 
     def chunk_batches(self, data):
+        if self.eval and self.token_budget:
+            # sorts the sentences, so the predictions need to be unsorted with data_orig_idx
+            data, self.data_orig_idx = padded_cost_batches(data, self.token_budget)
+            return data
+        self.data_orig_idx = None
         data = [data[i:i+self.batch_size] for i in range(0, len(data), self.batch_size)]
         return data
 
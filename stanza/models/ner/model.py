@@ -10,9 +10,9 @@ from torch.nn.utils.rnn import pad_packed_sequence, pack_padded_sequence, pack_s
 from stanza.models.common.data import map_to_ids, get_long_tensor
 from stanza.models.common.packed_lstm import PackedLSTM
 from stanza.models.common.dropout import WordDropout, LockedDropout
-from stanza.models.common.char_model import CharacterModel, CharacterLanguageModel
+from stanza.models.common.char_model import CharacterModel, active_charlm_cache
 from stanza.models.common.crf import CRFLoss
-from stanza.models.common.foundation_cache import load_bert
+from stanza.models.common.foundation_cache import load_bert, load_charlm
 from stanza.models.common.vocab import PAD_ID, UNK_ID
 from stanza.models.common.bert_embedding import extract_bert_embeddings
 
@@ -82,8 +82,8 @@ class NERTagger(nn.Module):
                     raise FileNotFoundError('Could not find forward character model: {}  Please specify with --charlm_forward_file'.format(args['charlm_forward_file']))
                 if args['charlm_backward_file'] is None or not os.path.exists(args['charlm_backward_file']):
                     raise FileNotFoundError('Could not find backward character model: {}  Please specify with --charlm_backward_file'.format(args['charlm_backward_file']))
-                add_unsaved_module('charmodel_forward', CharacterLanguageModel.load(args['charlm_forward_file'], finetune=False))
-                add_unsaved_module('charmodel_backward', CharacterLanguageModel.load(args['charlm_backward_file'], finetune=False))
+                add_unsaved_module('charmodel_forward', load_charlm(args['charlm_forward_file'], foundation_cache=foundation_cache))
+                add_unsaved_module('charmodel_backward', load_charlm(args['charlm_backward_file'], foundation_cache=foundation_cache))
                 input_size += self.charmodel_forward.hidden_dim() + self.charmodel_backward.hidden_dim()
             else:
                 self.charmodel = CharacterModel(args, vocab, bidirectional=True, attention=False)
@@ -182,7 +182,13 @@ class NERTagger(nn.Module):
             return pad_packed_sequence(PackedSequence(x, word_emb.batch_sizes), batch_first=True)[0]
 
         if self.args['char'] and self.args['char_emb_dim'] > 0:
-            if self.args.get('charlm', None):
+            if self.args.get('charlm', None) and active_charlm_cache() is not None and not self.args.get('char_lowercase', False):
+                # same characters as the NER data loader builds, but
+                # the charlms can reuse what other processors computed
+                char_reps_forward = pack_sequence(self.charmodel_forward.build_char_representation(sentences))
+                char_reps_backward = pack_sequence(self.charmodel_backward.build_char_representation(sentences))
+                inputs += [char_reps_forward, char_reps_backward]
+            elif self.args.get('charlm', None):
                 char_reps_forward = self.charmodel_forward.get_representation(chars[0], charoffsets[0], charlens, char_orig_idx)
                 char_reps_forward = PackedSequence(char_reps_forward.data, char_reps_forward.batch_sizes)
                 char_reps_backward = self.charmodel_backward.get_representation(chars[1], charoffsets[1], charlens, char_orig_idx)
@@ -7,15 +7,18 @@ import logging
 import torch
 from torch import nn
 
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.trainer import Trainer as BaseTrainer
 from stanza.models.common.vocab import VOCAB_PREFIX
 from stanza.models.common import utils, loss
 from stanza.models.ner.model import NERTagger
 from stanza.models.ner.vocab import MultiVocab
-from stanza.models.common.crf import viterbi_decode
+from stanza.models.common.crf import viterbi_decode, viterbi_decode_batch
 
 logger = logging.getLogger('stanza')
 
+INFERENCE_ARGS = ('batch_viterbi', 'char_cache_size')
+
 def unpack_batch(batch, device):
     """ Unpack a batch from the data loader. """
     inputs = [batch[0]]
@@ -110,12 +113,15 @@ class Trainer(BaseTrainer):
         _, logits, trans = self.model(word, wordchars, wordchars_mask, tags, word_orig_idx, sentlens, wordlens, chars, charoffsets, charlens, char_orig_idx)
 
         # decode
-        trans = trans.data.cpu().numpy()
-        scores = logits.data.cpu().numpy()
-        bs = logits.size(0)
+        if self.args.get('batch_viterbi', True):
+            tag_ids, _ = viterbi_decode_batch(logits.data, trans.data, sentlens)
+        else:
+            trans = trans.data.cpu().numpy()
+            scores = logits.data.cpu().numpy()
+            bs = logits.size(0)
+            tag_ids = [viterbi_decode(scores[i, :sentlens[i]], trans)[0] for i in range(bs)]
         tag_seqs = []
-        for i in range(bs):
-            tags, _ = viterbi_decode(scores[i, :sentlens[i]], trans)
+        for tags in tag_ids:
             tags = self.vocab['tag'].unmap(tags)
             tags = fix_singleton_tags(tags)
             tag_seqs += [tags]
@@ -134,7 +140,7 @@ class Trainer(BaseTrainer):
         params = {
                 'model': model_state,
                 'vocab': self.vocab.state_dict(),
-                'config': self.args
+                'config': {k: v for k, v in self.args.items() if k not in INFERENCE_ARGS}
                 }
         try:
             torch.save(params, filename, _use_new_zipfile_serialization=False)
@@ -146,11 +152,11 @@ class Trainer(BaseTrainer):
 
     def load(self, filename, pretrain=None, args=None, foundation_cache=None):
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.error("Cannot load model from {}".format(filename))
             raise
-        self.args = checkpoint['config']
+        self.args = {k: v for k, v in checkpoint['config'].items() if k not in INFERENCE_ARGS}
         if args: self.args.update(args)
         self.vocab = MultiVocab.load_state_dict(checkpoint['vocab'])
 
@@ -159,7 +165,7 @@ class Trainer(BaseTrainer):
             emb_matrix = pretrain.emb
 
         self.model = NERTagger(self.args, self.vocab, emb_matrix=emb_matrix, foundation_cache=foundation_cache)
-        self.model.load_state_dict(checkpoint['model'], strict=False)
+        load_model_state(self.model, checkpoint['model'], strict=False)
 
         # there is a possible issue with the delta embeddings.
         # specifically, with older models trained without the delta
@@ -19,7 +19,7 @@ import torch
 from torch import nn, optim
 
 from stanza.models.ner.data import DataLoader
-from stanza.models.ner.trainer import Trainer
+from stanza.models.ner.trainer import INFERENCE_ARGS, Trainer
 from stanza.models.ner import scorer
 from stanza.models.common import utils
 from stanza.models.common.pretrain import Pretrain
@@ -61,6 +61,7 @@ def build_argparse():
     parser.add_argument('--dropout', type=float, default=0.5)
     parser.add_argument('--rec_dropout', type=float, default=0, help="Word recurrent dropout")
     parser.add_argument('--char_rec_dropout', type=float, default=0, help="Character recurrent dropout")
+    parser.add_argument('--char_cache_size', type=int, default=50000, help="At prediction time, remember the character model representation of this many word types.  0 to turn off")
     parser.add_argument('--char_dropout', type=float, default=0, help="Character-level language model dropout")
     parser.add_argument('--no_char', dest='char', action='store_false', help="Turn off training a character model.")
     parser.add_argument('--charlm', action='store_true', help="Turn on contextualized char embedding using pretrained character-level language model.")
@@ -88,6 +89,7 @@ def build_argparse():
     parser.add_argument('--patience', type=int, default=3, help="Patience for LR decay.")
 
     parser.add_argument('--ignore_tag_scores', type=str, default=None, help="Which tags to ignore, if any, when scoring dev & test sets")
+    parser.add_argument('--no_batch_viterbi', dest='batch_viterbi', default=True, action='store_false', help="Decode each sentence separately with the numpy viterbi instead of decoding the whole batch in torch")
 
     parser.add_argument('--max_steps', type=int, default=200000)
     parser.add_argument('--eval_interval', type=int, default=500)
@@ -375,6 +377,7 @@ def load_model(args, model_file):
         charlm_args['charlm_forward_file'] = args['charlm_forward_file']
     if 'charlm_backward_file' in args:
         charlm_args['charlm_backward_file'] = args['charlm_backward_file']
+    charlm_args.update({k: args[k] for k in INFERENCE_ARGS if k in args})
     pretrain = load_pretrain(args)
     trainer = Trainer(args=charlm_args, model_file=model_file, pretrain=pretrain, device=args['device'], train_classifier_only=args['train_classifier_only'])
     loaded_args, vocab = trainer.args, trainer.vocab
@@ -22,7 +22,7 @@ from torch import nn, optim
 
 import stanza.models.depparse.data as data
 from stanza.models.depparse.data import DataLoader
-from stanza.models.depparse.trainer import Trainer
+from stanza.models.depparse.trainer import INFERENCE_ARGS, Trainer
 from stanza.models.depparse import scorer
 from stanza.models.common import utils
 from stanza.models.common import pretrain
@@ -63,6 +63,7 @@ def build_argparse():
     parser.add_argument('--dropout', type=float, default=0.5)
     parser.add_argument('--rec_dropout', type=float, default=0, help="Recurrent dropout")
     parser.add_argument('--char_rec_dropout', type=float, default=0, help="Recurrent dropout")
+    parser.add_argument('--char_cache_size', type=int, default=50000, help="At prediction time, remember the character model representation of this many word types.  0 to turn off")
 
     parser.add_argument('--no_char', dest='char', action='store_false', help="Turn off character model.")
     parser.add_argument('--charlm', action='store_true', help="Turn on contextualized char embedding using pretrained character-level language model.")
@@ -92,6 +93,9 @@ def build_argparse():
     parser.add_argument('--max_steps_before_stop', type=int, default=3000)
     parser.add_argument('--batch_size', type=int, default=5000)
     parser.add_argument('--max_grad_norm', type=float, default=1.0, help='Gradient clipping.')
+    parser.add_argument('--no_greedy_mst', dest='greedy_mst', default=True, action='store_false', help="Run Chu-Liu/Edmonds on every sentence at prediction time, even when the greedy heads already form a tree")
+    parser.add_argument('--no_two_phase_deprel', dest='two_phase_deprel', default=True, action='store_false', help="At prediction time, score the deprels of every (dependent, head) pair instead of only the heads chosen by the decoder.  Uses O(n^2) instead of O(n) memory per sentence")
+    parser.add_argument('--mst_threads', type=int, default=0, help="Threads for running Chu-Liu/Edmonds on the sentences where the greedy heads do not form a tree.  0 means no thread pool")
     parser.add_argument('--log_step', type=int, default=20, help='Print log every k steps.')
     parser.add_argument('--save_dir', type=str, default='saved_models/depparse', help='Root dir for saving models.')
     parser.add_argument('--save_name', type=str, default="{shorthand}_{embedding}_parser.pt", help="File name to save the model")
@@ -296,6 +300,7 @@ def evaluate(args):
 
     load_args = {'charlm_forward_file': args.get('charlm_forward_file', None),
                  'charlm_backward_file': args.get('charlm_backward_file', None)}
+    load_args.update({k: args[k] for k in INFERENCE_ARGS if k in args})
 
     # load model
     logger.info("Loading model from: {}".format(model_file))
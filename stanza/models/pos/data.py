@@ -3,7 +3,7 @@ import logging
 import torch
 
 from stanza.models.common.bert_embedding import filter_data
-from stanza.models.common.data import map_to_ids, get_long_tensor, get_float_tensor, sort_all
+from stanza.models.common.data import map_to_ids, get_long_tensor, get_float_tensor, sort_all, padded_cost_batches
 from stanza.models.common.vocab import PAD_ID, VOCAB_PREFIX, CharVocab
 from stanza.models.pos.vocab import WordVocab, XPOSVocab, FeatureVocab, MultiVocab
 from stanza.models.pos.xpos_vocab_factory import xpos_vocab_factory
@@ -12,8 +12,9 @@ from stanza.models.common.doc import *
 logger = logging.getLogger('stanza')
 
 class DataLoader:
-    def __init__(self, doc, batch_size, args, pretrain, vocab=None, evaluation=False, sort_during_eval=False, bert_tokenizer=None):
+    def __init__(self, doc, batch_size, args, pretrain, vocab=None, evaluation=False, sort_during_eval=False, bert_tokenizer=None, token_budget=None):
         self.batch_size = batch_size
+        self.token_budget = token_budget
         self.args = args
         self.eval = evaluation
         self.shuffled = not self.eval
@@ -72,9 +73,15 @@ class DataLoader:
 
     def preprocess(self, data, vocab, pretrain_vocab, args):
         processed = []
+        # most words repeat, so map the characters of each word type only once
+        word_chars = {}
+        def map_chars(word):
+            if word not in word_chars:
+                word_chars[word] = vocab['char'].map([x for x in word])
+            return word_chars[word]
         for sent in data:
             processed_sent = [vocab['word'].map([w[0] for w in sent])]
-            processed_sent += [[vocab['char'].map([x for x in w[0]]) for w in sent]]
+            processed_sent += [[map_chars(w[0]) for w in sent]]
             processed_sent += [vocab['upos'].map([w[1] for w in sent])]
             processed_sent += [vocab['xpos'].map([w[2] for w in sent])]
             processed_sent += [vocab['feats'].map([w[3] for w in sent])]
@@ -153,6 +160,11 @@ class DataLoader:
         random.shuffle(self.data)
 
     def chunk_batches(self, data):
+        if self.eval and self.token_budget:
+            # at eval time, limit the padded size of each batch instead of its word count
+            res, self.data_orig_idx = padded_cost_batches(data, self.token_budget)
+            return res
+
         res = []
 
         if not self.eval:
@@ -12,6 +12,7 @@ from stanza.models.common.biaffine import BiaffineScorer
 from stanza.models.common.foundation_cache import load_bert, load_charlm
 from stanza.models.common.hlstm import HighwayLSTM
 from stanza.models.common.dropout import WordDropout
+from stanza.models.common.pretrain import build_pretrained_embedding
 from stanza.models.common.vocab import CompositeVocab
 from stanza.models.common.char_model import CharacterModel
 
@@ -95,7 +96,7 @@ class Tagger(nn.Module):
 
         if self.args['pretrain']:
             # pretrained embeddings, by default this won't be saved into model file
-            add_unsaved_module('pretrained_emb', nn.Embedding.from_pretrained(torch.from_numpy(emb_matrix), freeze=True))
+            add_unsaved_module('pretrained_emb', build_pretrained_embedding(emb_matrix))
             self.trans_pretrained = nn.Linear(emb_matrix.shape[1], self.args['transformed_dim'], bias=False)
             input_size += self.args['transformed_dim']
         
@@ -7,6 +7,7 @@ import logging
 import torch
 from torch import nn
 
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common.trainer import Trainer as BaseTrainer
 from stanza.models.common import utils, loss
 from stanza.models.common.foundation_cache import NoTransformerFoundationCache
@@ -15,6 +16,8 @@ from stanza.models.pos.vocab import MultiVocab
 
 logger = logging.getLogger('stanza')
 
+INFERENCE_ARGS = ('char_cache_size',)
+
 def unpack_batch(batch, device):
     """ Unpack a batch from the data loader. """
     inputs = [b.to(device) if b is not None else None for b in batch[:8]]
@@ -86,7 +89,7 @@ class Trainer(BaseTrainer):
         params = {
                 'model': model_state,
                 'vocab': self.vocab.state_dict(),
-                'config': self.args
+                'config': {k: v for k, v in self.args.items() if k not in INFERENCE_ARGS}
                 }
         try:
             torch.save(params, filename, _use_new_zipfile_serialization=False)
@@ -102,11 +105,11 @@ class Trainer(BaseTrainer):
         and the actual use of pretrain embeddings will depend on the boolean config "pretrain" in the loaded args.
         """
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.error("Cannot load model from {}".format(filename))
             raise
-        self.args = checkpoint['config']
+        self.args = {k: v for k, v in checkpoint['config'].items() if k not in INFERENCE_ARGS}
         if args is not None: self.args.update(args)
         if 'bert_model' not in self.args:
             self.args['bert_model'] = None
@@ -119,4 +122,4 @@ class Trainer(BaseTrainer):
             logger.debug("Model %s has a finetuned transformer.  Not using transformer cache to make sure the finetuned version of the transformer isn't accidentally used elsewhere", filename)
             foundation_cache = NoTransformerFoundationCache(foundation_cache)
         self.model = Tagger(self.args, self.vocab, emb_matrix=emb_matrix, share_hid=self.args['share_hid'], foundation_cache=foundation_cache)
-        self.model.load_state_dict(checkpoint['model'], strict=False)
+        load_model_state(self.model, checkpoint['model'], strict=False)
@@ -20,7 +20,7 @@ from torch import nn, optim
 
 import stanza.models.pos.data as data
 from stanza.models.pos.data import DataLoader
-from stanza.models.pos.trainer import Trainer
+from stanza.models.pos.trainer import INFERENCE_ARGS, Trainer
 from stanza.models.pos import scorer
 from stanza.models.common import utils
 from stanza.models.common import pretrain
@@ -64,6 +64,7 @@ def build_argparse():
     parser.add_argument('--dropout', type=float, default=0.5)
     parser.add_argument('--rec_dropout', type=float, default=0, help="Recurrent dropout")
     parser.add_argument('--char_rec_dropout', type=float, default=0, help="Recurrent dropout")
+    parser.add_argument('--char_cache_size', type=int, default=50000, help="At prediction time, remember the character model representation of this many word types.  0 to turn off")
 
     # TODO: refactor charlm arguments for models which use it?
     parser.add_argument('--no_char', dest='char', action='store_false', help="Turn off character model.")
@@ -353,6 +354,7 @@ def evaluate(args):
 
     load_args = {'charlm_forward_file': args.get('charlm_forward_file', None),
                  'charlm_backward_file': args.get('charlm_backward_file', None)}
+    load_args.update({k: args[k] for k in INFERENCE_ARGS if k in args})
 
     # load model
     logger.info("Loading model from: {}".format(model_file))
@@ -4,6 +4,7 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 
+from stanza.models.common.checkpoint import load_checkpoint, load_model_state
 from stanza.models.common import utils
 from stanza.models.common.trainer import Trainer as BaseTrainer
 from stanza.models.tokenization.utils import create_dictionary
@@ -79,7 +80,7 @@ class Trainer(BaseTrainer):
 
     def load(self, filename):
         try:
-            checkpoint = torch.load(filename, lambda storage, loc: storage)
+            checkpoint = load_checkpoint(filename)
         except BaseException:
             logger.error("Cannot load model from {}".format(filename))
             raise
@@ -89,7 +90,7 @@ class Trainer(BaseTrainer):
             # were built with mwt layers
             self.args['use_mwt'] = True
         self.model = Tokenizer(self.args, self.args['vocab_size'], self.args['emb_dim'], self.args['hidden_dim'], dropout=self.args['dropout'], feat_dropout=self.args['feat_dropout'])
-        self.model.load_state_dict(checkpoint['model'])
+        load_model_state(self.model, checkpoint['model'])
         self.vocab = Vocab.load_state_dict(checkpoint['vocab'])
         self.lexicon = checkpoint['lexicon']
 
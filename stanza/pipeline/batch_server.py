@@ -0,0 +1,467 @@
+"""
+An HTTP server which merges concurrent requests into batches for a Pipeline
+
+Running one Pipeline call per request means each request pays the
+per-batch overhead of every processor on its own.  Here, requests go
+into a queue, and a single worker thread takes as many of them as fit
+in a token budget, waiting at most max_wait seconds after the first
+one arrives, and runs them through one bulk_process call.  The
+resulting Documents are then handed back to the individual requests.
+
+Only the worker thread ever calls the Pipeline, so the models are
+never used by two threads at once.
+
+Example:
+
+python3 -m stanza.pipeline.batch_server --lang en --processors tokenize,pos,lemma,depparse --port 5000
+
+curl -d 'Jennifer has nice antennae.' http://localhost:5000/annotate
+curl -H 'Content-Type: application/json' -d '{"text": "Jennifer has nice antennae.", "timeout": 2.0}' http://localhost:5000/annotate
+curl http://localhost:5000/stats
+
+A request which is still queued when its timeout expires is dropped
+without being processed, and the client gets a 504.  If the queue is
+full, new requests get a 503.
+"""
+
+import argparse
+import bisect
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import queue
+import socketserver
+import threading
+import time
+
+from stanza.models.common.doc import Document
+
+logger = logging.getLogger('stanza')
+
+DEFAULT_TOKEN_BUDGET = 5000
+DEFAULT_MAX_WAIT = 0.01
+DEFAULT_MAX_QUEUE_SIZE = 1000
+
+# in seconds.  covers sub-millisecond queueing up to very overloaded servers
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+# number of requests merged into one bulk_process call
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class RequestTimeoutError(TimeoutError):
+    """
+    A request was not finished before its timeout
+    """
+
+class ServerBusyError(RuntimeError):
+    """
+    The request queue is full
+    """
+
+class Histogram:
+    """
+    Counts of values in fixed buckets
+
+    bounds are the inclusive upper limits of the buckets.  Values
+    larger than the last bound go in an overflow bucket
+    """
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, pct):
+        """
+        Return the upper bound of the bucket containing the given percentile
+
+        Values in the overflow bucket report the largest value seen
+        """
+        if self.count == 0:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        buckets = {"<=%s" % bound: count for bound, count in zip(self.bounds, self.counts)}
+        buckets[">%s" % self.bounds[-1]] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": buckets,
+        }
+
+def count_tokens(text):
+    """
+    A cheap estimate of the number of tokens, used for the token budget before the text is tokenized
+    """
+    if isinstance(text, Document):
+        if text.sentences:
+            return text.num_tokens
+        text = text.text
+    return max(1, len(text.split()))
+
+class BatchRequest:
+    """
+    One queued request: the document to process and the Future its result goes to
+    """
+    __slots__ = ('doc', 'tokens', 'future', 'arrival', 'deadline')
+
+    def __init__(self, doc, tokens, deadline):
+        self.doc = doc
+        self.tokens = tokens
+        self.future = Future()
+        self.arrival = time.monotonic()
+        self.deadline = deadline
+
+class MicroBatcher:
+    """
+    Merges concurrently submitted documents into batches for one Pipeline
+
+    pipeline: anything with a bulk_process(docs) method, usually a Pipeline
+    token_budget: stop adding requests to a batch once it has this many tokens.
+      a single request larger than the budget is processed on its own
+    max_wait: seconds to wait after the first request of a batch for more to arrive
+    max_queue_size: submit raises ServerBusyError beyond this many queued requests
+    default_timeout: seconds a request may take if submit is not given a timeout.
+      None means no limit
+    """
+    def __init__(self, pipeline, token_budget=DEFAULT_TOKEN_BUDGET, max_wait=DEFAULT_MAX_WAIT,
+                 max_queue_size=DEFAULT_MAX_QUEUE_SIZE, default_timeout=None):
+        self.pipeline = pipeline
+        self.token_budget = token_budget
+        self.max_wait = max_wait
+        self.default_timeout = default_timeout
+        self.queue = queue.Queue(maxsize=max_queue_size)
+
+        self.stats_lock = threading.Lock()
+        self.queue_latency = Histogram(LATENCY_BUCKETS)
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.batch_time = Histogram(LATENCY_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.requests = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.errors = 0
+
+        self.stop_event = threading.Event()
+        self.worker = None
+
+    def start(self):
+        if self.worker is not None:
+            return
+        self.stop_event.clear()
+        self.worker = threading.Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self.worker.start()
+
+    def stop(self):
+        """
+        Stop the worker thread.  Requests still in the queue fail with a RuntimeError
+        """
+        if self.worker is None:
+            return
+        self.stop_event.set()
+        self.worker.join()
+        self.worker = None
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError("MicroBatcher was stopped"))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def submit(self, doc, timeout=None):
+        """
+        Queue a str or Document to be processed.  Returns a Future for the processed Document
+
+        If the timeout passes while the request is still queued, the
+        Future fails with a RequestTimeoutError
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        if isinstance(doc, str):
+            doc = Document([], text=doc)
+        request = BatchRequest(doc, count_tokens(doc), None)
+        if timeout is not None:
+            request.deadline = request.arrival + timeout
+        try:
+            self.queue.put_nowait(request)
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected += 1
+            raise ServerBusyError("Request queue is full") from None
+        return request.future
+
+    def annotate(self, doc, timeout=None):
+        """
+        Process a str or Document as part of a batch, waiting for the result
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        future = self.submit(doc, timeout)
+        start = time.monotonic()
+        try:
+            result = future.result(timeout=timeout)
+        except (FutureTimeoutError, RequestTimeoutError) as e:
+            # the worker already counted the requests it dropped from the queue
+            # note that FutureTimeoutError is TimeoutError in newer Pythons
+            if isinstance(e, RequestTimeoutError):
+                raise
+            # if the request is still queued, the worker will skip it
+            future.cancel()
+            with self.stats_lock:
+                self.timeouts += 1
+            raise RequestTimeoutError("Request was not processed within %s seconds" % timeout) from None
+        with self.stats_lock:
+            self.request_latency.record(time.monotonic() - start)
+        return result
+
+    def _next_batch(self, carried):
+        """
+        Collect the next batch of requests
+
+        carried is a request taken from the queue which did not fit in
+        the previous batch, or None.  Returns the batch and the
+        request to carry over to the next batch
+        """
+        if carried is not None:
+            batch = [carried]
+        else:
+            try:
+                batch = [self.queue.get(timeout=0.1)]
+            except queue.Empty:
+                return [], None
+        tokens = batch[0].tokens
+        batch_deadline = batch[0].arrival + self.max_wait
+        while tokens < self.token_budget:
+            remaining = batch_deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    request = self.queue.get(timeout=remaining)
+                else:
+                    # anything already waiting still goes in the batch
+                    request = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if tokens + request.tokens > self.token_budget:
+                return batch, request
+            batch.append(request)
+            tokens += request.tokens
+        return batch, None
+
+    def _run(self):
+        carried = None
+        while not self.stop_event.is_set():
+            batch, carried = self._next_batch(carried)
+            if batch:
+                self._process_batch(batch)
+        if carried is not None and carried.future.set_running_or_notify_cancel():
+            carried.future.set_exception(RuntimeError("MicroBatcher was stopped"))
+
+    def _process_batch(self, batch):
+        now = time.monotonic()
+        live = []
+        for request in batch:
+            if not request.future.set_running_or_notify_cancel():
+                # the client already gave up on this request
+                continue
+            if request.deadline is not None and request.deadline < now:
+                with self.stats_lock:
+                    self.timeouts += 1
+                request.future.set_exception(RequestTimeoutError("Request timed out after %.3f seconds in the queue" % (now - request.arrival)))
+                continue
+            live.append(request)
+        with self.stats_lock:
+            self.requests += len(batch)
+            for request in live:
+                self.queue_latency.record(now - request.arrival)
+            if live:
+                self.batch_size.record(len(live))
+        if not live:
+            return
+
+        try:
+            docs = self.pipeline.bulk_process([request.doc for request in live])
+        except Exception as e:
+            if len(live) == 1:
+                self._fail_request(live[0], e)
+                return
+            # one bad request should not fail the unrelated requests
+            # merged into the same batch, so each is rerun on its own
+            logger.warning("Failed to process a batch of %d requests.  Retrying them one at a time", len(live))
+            for request in live:
+                try:
+                    doc = self.pipeline.bulk_process([request.doc])[0]
+                except Exception as request_error:
+                    self._fail_request(request, request_error)
+                    continue
+                request.future.set_result(doc)
+            return
+        with self.stats_lock:
+            self.batch_time.record(time.monotonic() - now)
+        for request, doc in zip(live, docs):
+            request.future.set_result(doc)
+
+    def _fail_request(self, request, e):
+        logger.error("Failed to process a request", exc_info=e)
+        with self.stats_lock:
+            self.errors += 1
+        request.future.set_exception(e)
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "requests": self.requests,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "queue_size": self.queue.qsize(),
+                "queue_latency": self.queue_latency.to_dict(),
+                "request_latency": self.request_latency.to_dict(),
+                "batch_time": self.batch_time.to_dict(),
+                "batch_size": self.batch_size.to_dict(),
+            }
+
+class BatchRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /annotate with either plain text or JSON {"text": ..., "timeout": ...}
+    GET /stats for the MicroBatcher statistics
+    GET /ping to check the server is up
+
+    The annotated document is returned in the format of Document.to_dict
+    """
+    batcher = None
+
+    def send_json(self, status, value):
+        body = json.dumps(value).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/ping":
+            self.send_json(200, "pong")
+        elif path == "/stats":
+            self.send_json(200, self.batcher.stats())
+        else:
+            self.send_json(404, {"error": "Unknown path %s" % self.path})
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("", "/annotate"):
+            self.send_json(404, {"error": "Unknown path %s" % self.path})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        timeout = None
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                request = json.loads(body)
+                text = request["text"]
+                timeout = request.get("timeout", None)
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {"error": "Could not read request: %s" % e})
+                return
+        else:
+            text = body
+
+        try:
+            doc = self.batcher.annotate(text, timeout=timeout)
+        except RequestTimeoutError as e:
+            self.send_json(504, {"error": str(e)})
+            return
+        except ServerBusyError as e:
+            self.send_json(503, {"error": str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, doc.to_dict())
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+class BatchServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    An HTTPServer with one thread per connection, all feeding the same MicroBatcher
+    """
+    daemon_threads = True
+    # the default listen backlog of 5 drops connections as soon as a few dozen clients arrive at once
+    request_queue_size = 128
+
+    def __init__(self, address, batcher):
+        handler = type("Handler", (BatchRequestHandler,), {"batcher": batcher})
+        super().__init__(address, handler)
+        self.batcher = batcher
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lang', type=str, default='en', help='Language of the Pipeline')
+    parser.add_argument('--processors', type=str, default=None, help='Processors for the Pipeline.  Default is the language default')
+    parser.add_argument('--package', type=str, default='default', help='Package for the Pipeline')
+    parser.add_argument('--cpu', default=False, action='store_true', help='Run the Pipeline on the CPU')
+    parser.add_argument('--host', type=str, default='localhost', help='Host to listen on')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on')
+    parser.add_argument('--token_budget', type=int, default=DEFAULT_TOKEN_BUDGET, help='Maximum number of tokens to merge into one batch')
+    parser.add_argument('--max_wait', type=float, default=DEFAULT_MAX_WAIT, help='Seconds to wait for more requests after the first request of a batch')
+    parser.add_argument('--max_queue_size', type=int, default=DEFAULT_MAX_QUEUE_SIZE, help='Reject requests when this many are queued')
+    parser.add_argument('--timeout', type=float, default=None, help='Default per-request timeout in seconds')
+    args = parser.parse_args(args=args)
+    return args
+
+def main(args=None):
+    import stanza
+
+    args = parse_args(args)
+    pipeline_args = {'lang': args.lang, 'package': args.package, 'use_gpu': not args.cpu}
+    if args.processors:
+        pipeline_args['processors'] = args.processors
+    pipeline = stanza.Pipeline(**pipeline_args)
+
+    with MicroBatcher(pipeline, token_budget=args.token_budget, max_wait=args.max_wait,
+                      max_queue_size=args.max_queue_size, default_timeout=args.timeout) as batcher:
+        server = BatchServer((args.host, args.port), batcher)
+        logger.info("Serving %s on %s:%d", pipeline, args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+if __name__ == '__main__':
+    main()
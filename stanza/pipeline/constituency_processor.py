@@ -2,7 +2,7 @@
 Processor that attaches a constituency tree to a sentence
 """
 
-from stanza.models.constituency.trainer import Trainer
+from stanza.models.constituency.trainer import Trainer, INFERENCE_ARGS
 
 from stanza.models.common import doc
 from stanza.utils.get_tqdm import get_tqdm
@@ -17,6 +17,7 @@ class ConstituencyProcessor(UDProcessor):
     PROVIDES_DEFAULT = set([CONSTITUENCY])
     # set of processor requirements for this processor
     REQUIRES_DEFAULT = set([TOKENIZE, POS])
+    USES_INFERENCE_CACHES = True
 
     # default batch size, measured in sentences
     DEFAULT_BATCH_SIZE = 50
@@ -38,6 +39,7 @@ class ConstituencyProcessor(UDProcessor):
             "charlm_backward_file": config.get('backward_charlm_path', None),
             "device": device,
         }
+        args.update(self.inference_args(config, INFERENCE_ARGS))
         trainer = Trainer.load(filename=config['model_path'],
                                args=args,
                                foundation_cache=pipeline.foundation_cache)
@@ -45,8 +47,13 @@ class ConstituencyProcessor(UDProcessor):
         self._model.eval()
         # batch size counted as sentences
         self._batch_size = int(config.get('batch_size', ConstituencyProcessor.DEFAULT_BATCH_SIZE))
+        # optional limit on (longest sentence) * (number of sentences) when building new states
+        self._token_budget = config.get('token_budget', None)
         self._tqdm = 'tqdm' in config and config['tqdm']
 
+    def _quantizable_models(self):
+        return [self._model]
+
     def process(self, document):
         sentences = document.sentences
 
@@ -57,7 +64,7 @@ class ConstituencyProcessor(UDProcessor):
         if self._tqdm:
             words = tqdm(words)
 
-        trees = self._model.parse_tagged_words(words, self._batch_size)
+        trees = self._model.parse_tagged_words(words, self._batch_size, token_budget=self._token_budget)
         document.set(CONSTITUENCY, trees, to_sentence=True)
         return document
 
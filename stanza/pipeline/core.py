@@ -2,31 +2,38 @@
 Pipeline that runs tokenize,mwt,pos,lemma,depparse
 """
 
+import asyncio
 import collections
+import concurrent.futures
+from contextlib import contextmanager, ExitStack
 from enum import Enum
+import functools
 import io
 import itertools
 import sys
 import logging
 import json
+import multiprocessing
 import os
+import queue
+import threading
+import time
+
+import torch
 
 from stanza.pipeline._constants import *
+from stanza.models.common.bert_embedding import BertEmbeddingCache, bert_embedding_cache
+from stanza.models.common.char_model import CharlmCache, charlm_cache
+from stanza.models.common.checkpoint import prefetch_checkpoints
 from stanza.models.common.constant import langcode_to_lang
 from stanza.models.common.doc import Document
 from stanza.models.common.foundation_cache import FoundationCache
+from stanza.models.common.pretrain import mmap_filenames
+from stanza.models.common.quantize import QUANTIZE_MODES
 from stanza.models.common.utils import default_device
+from stanza.models.tokenization.data import NEWLINE_WHITESPACE_RE
 from stanza.pipeline.processor import Processor, ProcessorRequirementsException
-from stanza.pipeline.registry import NAME_TO_PROCESSOR_CLASS, PIPELINE_NAMES, PROCESSOR_VARIANTS
-from stanza.pipeline.langid_processor import LangIDProcessor
-from stanza.pipeline.tokenize_processor import TokenizeProcessor
-from stanza.pipeline.mwt_processor import MWTProcessor
-from stanza.pipeline.pos_processor import POSProcessor
-from stanza.pipeline.lemma_processor import LemmaProcessor
-from stanza.pipeline.constituency_processor import ConstituencyProcessor
-from stanza.pipeline.depparse_processor import DepparseProcessor
-from stanza.pipeline.sentiment_processor import SentimentProcessor
-from stanza.pipeline.ner_processor import NERProcessor
+from stanza.pipeline.registry import PIPELINE_NAMES, PROCESSOR_VARIANTS, get_processor_class
 from stanza.resources.common import DEFAULT_MODEL_DIR, DEFAULT_RESOURCES_URL, DEFAULT_RESOURCES_VERSION, ModelSpecification, add_dependencies, add_mwt, download_models, download_resources_json, flatten_processor_list, load_resources_json, maintain_processor_list, process_pipeline_parameters, set_logging_level, sort_processors
 from stanza.utils.helper_func import make_table
 
@@ -61,6 +68,34 @@ class IllegalPackageError(ValueError):
     def __init__(self, msg):
         super().__init__(msg)
 
+def find_edited_paragraphs(old_text, new_text):
+    """
+    Find the paragraphs which contain all of the differences between two texts
+
+    Returns start, old_end, new_end: the edited paragraphs are
+    old_text[start:old_end] in the old text and new_text[start:new_end]
+    in the new text.  Paragraphs are separated the same way the
+    tokenizer separates them, so sentences never cross those boundaries.
+    """
+    prefix = 0
+    max_prefix = min(len(old_text), len(new_text))
+    while prefix < max_prefix and old_text[prefix] == new_text[prefix]:
+        prefix += 1
+    suffix = 0
+    max_suffix = max_prefix - prefix
+    while suffix < max_suffix and old_text[-suffix-1] == new_text[-suffix-1]:
+        suffix += 1
+
+    # the last paragraph break entirely before the first change
+    start = 0
+    for match in NEWLINE_WHITESPACE_RE.finditer(new_text, 0, prefix):
+        start = match.end()
+    # the first paragraph break entirely after the last change
+    match = NEWLINE_WHITESPACE_RE.search(new_text, len(new_text) - suffix)
+    new_end = match.start() if match else len(new_text)
+    old_end = new_end - (len(new_text) - len(old_text))
+    return start, old_end, new_end
+
 class PipelineRequirementsException(Exception):
     """
     Exception indicating one or more requirements failures while attempting to build a pipeline.
@@ -156,6 +191,56 @@ def build_default_config(resources, lang, model_dir, load_list):
 
     return default_config
 
+# the pipeline used by a worker process in Pipeline.stream(num_workers=...)
+# the workers are forked, so this refers to the parent's copy of the
+# models and the weights are shared copy-on-write instead of reloaded
+_stream_worker_pipeline = None
+
+def _init_stream_worker(pipeline, num_threads):
+    global _stream_worker_pipeline
+    _stream_worker_pipeline = pipeline
+    torch.set_num_threads(num_threads)
+
+def _stream_worker_bulk_process(batch, args, kwargs):
+    return _stream_worker_pipeline.bulk_process(batch, *args, **kwargs)
+
+class StageStats:
+    """
+    Counters for one processor stage of a pipelined stream
+
+    queue depth is the number of batches still waiting in the stage's
+    input queue each time the stage picks up a batch.  A stage with a
+    consistently full input queue is the bottleneck of the pipeline.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.busy_time = 0.0
+        self.total_queue_depth = 0
+        self.max_queue_depth = 0
+
+    def record_batch(self, queue_depth, busy_time):
+        self.batches += 1
+        self.busy_time += busy_time
+        self.total_queue_depth += queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    @property
+    def mean_queue_depth(self):
+        if self.batches == 0:
+            return 0.0
+        return self.total_queue_depth / self.batches
+
+    def __repr__(self):
+        return "<StageStats %s: batches=%d busy=%.3fs mean_queue=%.2f max_queue=%d>" % (self.name, self.batches, self.busy_time, self.mean_queue_depth, self.max_queue_depth)
+
+# markers passed down the stage queues of a pipelined stream
+_END_OF_STREAM = object()
+
+class _StageFailure:
+    def __init__(self, exception):
+        self.exception = exception
+
 def normalize_download_method(download_method):
     """
     Turn None -> DownloadMethod.NONE, strings to the corresponding enum
@@ -188,6 +273,10 @@ class Pipeline:
                  foundation_cache=None,
                  device=None,
                  allow_unknown_language=False,
+                 cache_bert_embeddings=True,
+                 cache_charlm=True,
+                 load_threads=4,
+                 quantize=None,
                  **kwargs):
         self.lang, self.dir, self.kwargs = lang, dir, kwargs
         if model_dir is not None and dir == DEFAULT_MODEL_DIR:
@@ -202,6 +291,17 @@ class Pipeline:
             self.foundation_cache = FoundationCache()
         else:
             self.foundation_cache = foundation_cache
+        # processors which share a transformer or a charlm reuse its
+        # results for the same sentences within one call to process()
+        self.cache_bert_embeddings = cache_bert_embeddings
+        self.cache_charlm = cache_charlm
+        # built the first time aprocess or astream is used
+        self.async_executor = None
+        # quantize the models of every processor after loading them.
+        # a <processor>_quantize option overrides this for one processor
+        if quantize is not None and quantize not in QUANTIZE_MODES:
+            raise ValueError("Unknown quantize option %s.  Known options are %s" % (quantize, ", ".join(QUANTIZE_MODES)))
+        self.quantize = quantize
 
         download_method = normalize_download_method(download_method)
         if (download_method is DownloadMethod.DOWNLOAD_RESOURCES or
@@ -263,6 +363,8 @@ class Pipeline:
 
         # Load processors
         self.processors = {}
+        # per-stage counters from the most recent stream(..., pipelined=True)
+        self.stage_stats = []
 
         # configs that are the same for all processors
         pipeline_level_configs = {'lang': lang, 'mode': 'predict'}
@@ -279,6 +381,50 @@ class Pipeline:
 
         # set up processors
         pipeline_reqs_exceptions = []
+        # the processors are built in order, since each one checks the
+        # requirements provided by the ones before it, but their model
+        # files are all read at once in the background
+        with prefetch_checkpoints(self.checkpoint_files(), max_workers=load_threads):
+            self.load_processors(resources, lang, pipeline_level_configs, pipeline_reqs_exceptions)
+
+        # if there are any processor exceptions, throw an exception to indicate pipeline build failure
+        if pipeline_reqs_exceptions:
+            logger.info('\n')
+            raise PipelineRequirementsException(pipeline_reqs_exceptions)
+
+        logger.info("Done loading processors!")
+
+    def checkpoint_files(self):
+        """
+        The model files which the processors in load_list will read with torch.load
+
+        Pretrains with a memory mapped version and charlms or pretrains
+        which are already in the foundation cache are left out
+        """
+        filenames = []
+        for processor_name, _ in self.load_list:
+            config = self.filter_config(processor_name, self.config)
+            model_path = config.get('model_path')
+            if isinstance(model_path, (list, tuple)):
+                filenames.extend(model_path)
+            elif model_path:
+                filenames.append(model_path)
+            for key in ('forward_charlm_path', 'backward_charlm_path'):
+                charlm_path = config.get(key)
+                if charlm_path and charlm_path not in getattr(self.foundation_cache, 'charlms', {}):
+                    filenames.append(charlm_path)
+            pretrain_path = config.get('pretrain_path')
+            if (pretrain_path and pretrain_path not in getattr(self.foundation_cache, 'pretrains', {}) and
+                not all(os.path.exists(x) for x in mmap_filenames(pretrain_path))):
+                filenames.append(pretrain_path)
+        return filenames
+
+    def load_processors(self, resources, lang, pipeline_level_configs, pipeline_reqs_exceptions):
+        """
+        Build the processors in load_list, in order
+
+        Requirements failures are added to pipeline_reqs_exceptions rather than raised
+        """
         for item in self.load_list:
             processor_name, _ = item
             logger.info('Loading: ' + processor_name)
@@ -289,13 +435,15 @@ class Pipeline:
             # and then subsequent modules can use those tags without knowing where those tags came from
             if "pretagged" in self.config and "pretagged" not in curr_processor_config:
                 curr_processor_config["pretagged"] = self.config["pretagged"]
+            if self.quantize and "quantize" not in curr_processor_config:
+                curr_processor_config["quantize"] = self.quantize
             logger.debug('With settings: ')
             logger.debug(curr_processor_config)
             try:
                 # try to build processor, throw an exception if there is a requirements issue
-                self.processors[processor_name] = NAME_TO_PROCESSOR_CLASS[processor_name](config=curr_processor_config,
-                                                                                          pipeline=self,
-                                                                                          device=self.device)
+                self.processors[processor_name] = get_processor_class(processor_name)(config=curr_processor_config,
+                                                                                      pipeline=self,
+                                                                                      device=self.device)
             except ProcessorRequirementsException as e:
                 # if there was a requirements issue, add it to list which will be printed at end
                 pipeline_reqs_exceptions.append(e)
@@ -328,13 +476,6 @@ class Pipeline:
                 # FileNotFoundError, just raise the old error
                 raise
 
-        # if there are any processor exceptions, throw an exception to indicate pipeline build failure
-        if pipeline_reqs_exceptions:
-            logger.info('\n')
-            raise PipelineRequirementsException(pipeline_reqs_exceptions)
-
-        logger.info("Done loading processors!")
-
     @staticmethod
     def update_kwargs(kwargs, processor_list):
         processor_dict = {processor: [{'package': model_spec.package, 'dependencies': model_spec.dependencies} for model_spec in model_specs]
@@ -376,6 +517,69 @@ class Pipeline:
         """
         return [self.processors[processor_name] for processor_name in PIPELINE_NAMES if self.processors.get(processor_name)]
 
+    def _processors_to_run(self, processors):
+        """
+        Turn the processors argument of process() into a list of processor names in execution order
+        """
+        # various options to limit the processors used by this pipeline action
+        if processors is None:
+            processors = PIPELINE_NAMES
+        elif not isinstance(processors, (str, list, tuple, set)):
+            raise ValueError("Cannot process {} as a list of processors to run".format(type(processors)))
+        else:
+            if isinstance(processors, str):
+                processors = {x for x in processors.split(",")}
+            else:
+                processors = set(processors)
+            if TOKENIZE in processors and MWT in self.processors and MWT not in processors:
+                logger.debug("Requested processors for pipeline did not have mwt, but pipeline needs mwt, so mwt is added")
+                processors.add(MWT)
+            processors = [x for x in PIPELINE_NAMES if x in processors]
+
+        return processors
+
+    def _new_inference_caches(self, names):
+        """
+        New caches of transformer and charlm results for running the processors in names
+
+        A cache is None if it is turned off, or if no transformer (or
+        charlm) is used by more than one of the models, since then
+        nothing stored in it would ever be read back
+        """
+        caches = []
+        for enabled, cache_class, idx in ((self.cache_bert_embeddings, BertEmbeddingCache, 0), (self.cache_charlm, CharlmCache, 1)):
+            users = collections.Counter()
+            for name in names:
+                users.update(self.processors[name].inference_cache_users()[idx])
+            shared = any(count > 1 for count in users.values())
+            caches.append(cache_class() if enabled and shared else None)
+        return tuple(caches)
+
+    @contextmanager
+    def _inference_caches(self, caches, names, idx):
+        """
+        Use caches, the result of _new_inference_caches, while running the processor names[idx]
+
+        Results are only stored if a later processor, or another model
+        of this one, will read them, and once this processor is done,
+        the entries of transformers and charlms no later processor uses are dropped.
+        The pipelined stream passes the same caches to each stage a batch goes through,
+        since the caches of one thread are not visible in the others
+        """
+        with ExitStack() as stack:
+            for cache_idx, (cache, use_cache) in enumerate(zip(caches, (bert_embedding_cache, charlm_cache))):
+                if cache is None:
+                    continue
+                current = self.processors[names[idx]].inference_cache_users()[cache_idx]
+                later = collections.Counter()
+                for name in names[idx+1:]:
+                    later.update(self.processors[name].inference_cache_users()[cache_idx])
+                cache.set_users(keep=set(current) | set(later),
+                                store=set(later) | {model for model, count in current.items() if count > 1})
+                stack.callback(cache.set_users, keep=set(later), store=set(later))
+                stack.enter_context(use_cache(cache))
+            yield
+
     def process(self, doc, processors=None):
         """
         Run the pipeline
@@ -398,24 +602,12 @@ class Pipeline:
         # determine whether we are in bulk processing mode for multiple documents
         bulk=(isinstance(doc, list) and len(doc) > 0 and isinstance(doc[0], Document))
 
-        # various options to limit the processors used by this pipeline action
-        if processors is None:
-            processors = PIPELINE_NAMES
-        elif not isinstance(processors, (str, list, tuple, set)):
-            raise ValueError("Cannot process {} as a list of processors to run".format(type(processors)))
-        else:
-            if isinstance(processors, str):
-                processors = {x for x in processors.split(",")}
-            else:
-                processors = set(processors)
-            if TOKENIZE in processors and MWT in self.processors and MWT not in processors:
-                logger.debug("Requested processors for pipeline did not have mwt, but pipeline needs mwt, so mwt is added")
-                processors.add(MWT)
-            processors = [x for x in PIPELINE_NAMES if x in processors]
+        names = [name for name in self._processors_to_run(processors) if self.processors.get(name)]
 
-        for processor_name in processors:
-            if self.processors.get(processor_name):
-                process = self.processors[processor_name].bulk_process if bulk else self.processors[processor_name].process
+        caches = self._new_inference_caches(names)
+        for idx, processor_name in enumerate(names):
+            process = self.processors[processor_name].bulk_process if bulk else self.processors[processor_name].process
+            with self._inference_caches(caches, names, idx):
                 doc = process(doc)
         return doc
 
@@ -429,11 +621,55 @@ class Pipeline:
         docs = [doc if isinstance(doc, Document) else Document([], text=doc) for doc in docs]
         return self.process(docs, *args, **kwargs)
 
-    def stream(self, docs, batch_size=50, *args, **kwargs):
+    def reprocess(self, doc, text, processors=None):
+        """
+        Update the annotations of a document after its text was edited
+
+        doc: a Document previously annotated by this pipeline
+        text: the full edited text
+
+        Only the paragraphs containing changes are tokenized and run
+        through the processors.  The results are spliced into doc in
+        place of the old sentences, and the character offsets and
+        sentence indices of the rest of the document are updated.
+        doc is modified and returned.
+        """
+        if doc.text is None:
+            raise ValueError("Cannot reprocess a document which has no text")
+        if TOKENIZE in self.processors and self.processors[TOKENIZE].config.get('pretokenized'):
+            # the pretokenized tokenizer replaces the text with the tokens joined by spaces
+            raise ValueError("Cannot reprocess documents with a pretokenized pipeline")
+        if text == doc.text:
+            return doc
+
+        start, old_end, new_end = find_edited_paragraphs(doc.text, text)
+        paragraphs = text[start:new_end]
+        if paragraphs.strip():
+            new_doc = self.process(Document([], text=paragraphs), processors=processors)
+        else:
+            new_doc = Document([], text=paragraphs)
+        logger.debug("Reprocessed characters %d to %d, %d sentences", start, new_end, len(new_doc.sentences))
+        doc.splice(start, old_end, text, new_doc)
+        return doc
+
+    def stream(self, docs, batch_size=50, *args, num_workers=None, pipelined=False, stage_queue_size=2, **kwargs):
         """
         Go through an iterator of documents in batches, yield processed documents
 
         sentence indices will be counted across the entire iterator
+
+        num_workers: if more than 1, fork that many worker processes
+          and send each of them batches of documents.  The workers
+          share the models already loaded in this process, and the
+          documents are still yielded in their original order.
+          Only supported for CPU pipelines on platforms which can fork.
+
+        pipelined: if True, each processor runs in its own thread as a
+          stage of an assembly line, connected by queues of at most
+          stage_queue_size batches.  This way batch k+1 can be tokenized
+          while batch k is tagged and batch k-1 is parsed.  Counters for
+          each stage are kept in self.stage_stats as a list of StageStats.
+          processors is the only extra argument which can be given.
         """
         if not isinstance(docs, collections.abc.Iterator):
             docs = iter(docs)
@@ -447,15 +683,255 @@ class Pipeline:
                     return batch
             return batch
 
+        if pipelined and num_workers is not None and num_workers > 1:
+            raise ValueError("Pipeline.stream cannot use both pipelined and num_workers")
+        if num_workers is not None and num_workers > 1:
+            batches = self._stream_parallel(next_batch, num_workers, args, kwargs)
+        elif pipelined:
+            # each stage calls its processor's bulk_process directly,
+            # so the only pipeline option which applies is processors
+            extra = [key for key in kwargs if key != 'processors']
+            if len(args) > 1 or (args and 'processors' in kwargs) or extra:
+                raise ValueError("Pipeline.stream with pipelined=True only accepts processors as an extra argument, got %s" % (list(args) + extra))
+            processors = args[0] if args else kwargs.get('processors', None)
+            batches = self._stream_pipelined(next_batch, processors, stage_queue_size)
+        else:
+            batches = self._stream_serial(next_batch, args, kwargs)
+
         sentence_start_index = 0
-        batch = next_batch()
-        while batch:
-            batch = self.bulk_process(batch, *args, **kwargs)
+        for batch in batches:
             for doc in batch:
                 doc.reindex_sentences(sentence_start_index)
                 sentence_start_index += len(doc.sentences)
                 yield doc
+
+    def _stream_serial(self, next_batch, args, kwargs):
+        batch = next_batch()
+        while batch:
+            yield self.bulk_process(batch, *args, **kwargs)
+            batch = next_batch()
+
+    def _stream_parallel(self, next_batch, num_workers, args, kwargs):
+        """
+        Process batches on a pool of forked workers, yielding the results in order
+
+        At most 2 * num_workers batches are in flight at once, so a
+        slow consumer or an endless input iterator does not cause
+        unbounded buffering of documents.
+        """
+        if torch.device(self.device).type != 'cpu':
+            raise ValueError("Pipeline.stream with num_workers > 1 is only supported for CPU pipelines, but this pipeline is using %s" % self.device)
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("Pipeline.stream with num_workers > 1 requires the fork start method, which is not available on this platform")
+
+        # split the available cores between the workers rather than
+        # having each worker compete for all of them
+        num_threads = max(1, torch.get_num_threads() // num_workers)
+        context = multiprocessing.get_context('fork')
+        pool = context.Pool(num_workers, initializer=_init_stream_worker, initargs=(self, num_threads))
+        try:
+            pending = collections.deque()
             batch = next_batch()
+            while batch or pending:
+                while batch and len(pending) < 2 * num_workers:
+                    pending.append(pool.apply_async(_stream_worker_bulk_process, (batch, args, kwargs)))
+                    batch = next_batch()
+                yield pending.popleft().get()
+            pool.close()
+            pool.join()
+        finally:
+            pool.terminate()
+
+    def _stream_pipelined(self, next_batch, processors, queue_size):
+        """
+        Run each processor as a separate stage in its own thread, yielding batches in order
+
+        Each stage only ever runs one processor, so a model is never
+        used by two threads at once.  Since torch releases the GIL in
+        its kernels, the stages can overlap on both CPU and GPU.
+        """
+        names = [name for name in self._processors_to_run(processors) if self.processors.get(name)]
+        self.stage_stats = [StageStats(name) for name in names]
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(len(names) + 1)]
+        stop = threading.Event()
+
+        def put(stage_queue, item):
+            while not stop.is_set():
+                try:
+                    stage_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def get(stage_queue):
+            while not stop.is_set():
+                try:
+                    return stage_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return None
+
+        def feed():
+            try:
+                batch = next_batch()
+                while batch:
+                    # the caches travel along with the batch, so each stage
+                    # can reuse the results of the earlier stages
+                    put(queues[0], ([doc if isinstance(doc, Document) else Document([], text=doc) for doc in batch],
+                                    self._new_inference_caches(names)))
+                    batch = next_batch()
+                put(queues[0], _END_OF_STREAM)
+            except Exception as e:
+                put(queues[0], _StageFailure(e))
+
+        def run_stage(stage_idx):
+            processor = self.processors[names[stage_idx]]
+            stats = self.stage_stats[stage_idx]
+            while True:
+                batch = get(queues[stage_idx])
+                if batch is None:
+                    return
+                if batch is _END_OF_STREAM or isinstance(batch, _StageFailure):
+                    put(queues[stage_idx + 1], batch)
+                    return
+                docs, caches = batch
+                queue_depth = queues[stage_idx].qsize()
+                start_time = time.time()
+                try:
+                    with self._inference_caches(caches, names, stage_idx):
+                        docs = processor.bulk_process(docs)
+                except Exception as e:
+                    put(queues[stage_idx + 1], _StageFailure(e))
+                    return
+                stats.record_batch(queue_depth, time.time() - start_time)
+                put(queues[stage_idx + 1], (docs, caches))
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        threads.extend(threading.Thread(target=run_stage, args=(stage_idx,), daemon=True) for stage_idx in range(len(names)))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                batch = get(queues[-1])
+                if batch is _END_OF_STREAM:
+                    break
+                if isinstance(batch, _StageFailure):
+                    raise batch.exception
+                docs, _ = batch
+                yield docs
+            for thread in threads:
+                thread.join()
+            stats_table = make_table(['Stage', 'Batches', 'Busy (s)', 'Mean queue', 'Max queue'],
+                                     [(stats.name, stats.batches, "%.3f" % stats.busy_time, "%.2f" % stats.mean_queue_depth, stats.max_queue_depth)
+                                      for stats in self.stage_stats])
+            logger.debug("Pipelined stream stages:\n%s", stats_table)
+        finally:
+            stop.set()
+
+    def _get_async_executor(self):
+        """
+        The executor which runs the model work for aprocess and astream
+
+        It has a single thread, so the models are never used by two
+        coroutines at once, and the event loop never runs them itself
+        """
+        if self.async_executor is None:
+            self.async_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="stanza-pipeline")
+        return self.async_executor
+
+    async def aprocess(self, doc, processors=None):
+        """
+        Same as process, but runs in the pipeline's executor so the event loop is not blocked
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_async_executor(), functools.partial(self.process, doc, processors))
+
+    async def astream(self, docs, batch_size=50, processors=None, max_pending_batches=2):
+        """
+        An async generator version of stream: use with `async for`
+
+        docs can be an async iterable or a regular iterable of str or
+        Document.  Batches of batch_size documents are run through
+        bulk_process in the pipeline's executor.
+
+        At most max_pending_batches batches are read and processed
+        ahead of the consumer.  A slow consumer therefore stops the
+        input from being read, rather than letting annotated documents
+        pile up in memory.  A batch is only sent to the pipeline once
+        batch_size documents have been read or the input has ended,
+        but batches which are already finished are yielded right away.
+
+        sentence indices will be counted across the entire iterator
+        """
+        if max_pending_batches < 1:
+            raise ValueError("max_pending_batches must be at least 1, got %d" % max_pending_batches)
+        loop = asyncio.get_running_loop()
+        executor = self._get_async_executor()
+
+        if hasattr(docs, '__aiter__'):
+            doc_iterator = docs.__aiter__()
+            async def next_doc():
+                try:
+                    return await doc_iterator.__anext__()
+                except StopAsyncIteration:
+                    return _END_OF_STREAM
+        else:
+            doc_iterator = iter(docs)
+            async def next_doc():
+                return next(doc_iterator, _END_OF_STREAM)
+
+        async def next_batch():
+            batch = []
+            while len(batch) < batch_size:
+                next_item = await next_doc()
+                if next_item is _END_OF_STREAM:
+                    break
+                batch.append(next_item)
+            return batch
+
+        # the input is read in its own task, so that finished batches
+        # are yielded as soon as they are done, even if the source is
+        # slow to produce the next batch.  each slot is one batch read
+        # ahead of the consumer, and is given back once that batch is done
+        ready = asyncio.Queue()
+        slots = asyncio.Semaphore(max_pending_batches)
+
+        async def read_batches():
+            try:
+                while True:
+                    await slots.acquire()
+                    batch = await next_batch()
+                    if batch:
+                        ready.put_nowait(loop.run_in_executor(executor, functools.partial(self.bulk_process, batch, processors=processors)))
+                    if len(batch) < batch_size:
+                        break
+                ready.put_nowait(_END_OF_STREAM)
+            except Exception as e:
+                ready.put_nowait(_StageFailure(e))
+
+        reader = loop.create_task(read_batches())
+        sentence_start_index = 0
+        try:
+            while True:
+                item = await ready.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, _StageFailure):
+                    raise item.exception
+                batch = await item
+                slots.release()
+                for doc in batch:
+                    doc.reindex_sentences(sentence_start_index)
+                    sentence_start_index += len(doc.sentences)
+                    yield doc
+        finally:
+            reader.cancel()
+            # batches which have not started yet are dropped if the consumer stops early
+            while not ready.empty():
+                item = ready.get_nowait()
+                if isinstance(item, asyncio.Future):
+                    item.cancel()
+            await asyncio.wait([reader])
 
     def __str__(self):
         """
@@ -8,13 +8,10 @@ from stanza.models.common import doc
 from stanza.models.common.utils import unsort
 from stanza.models.common.vocab import VOCAB_PREFIX
 from stanza.models.depparse.data import DataLoader
-from stanza.models.depparse.trainer import Trainer
+from stanza.models.depparse.trainer import INFERENCE_ARGS, Trainer
 from stanza.pipeline._constants import *
 from stanza.pipeline.processor import UDProcessor, register_processor
 
-# these imports trigger the "register_variant" decorations
-from stanza.pipeline.external.corenlp_converter_depparse import ConverterDepparse
-
 DEFAULT_SEPARATE_BATCH=150
 
 @register_processor(name=DEPPARSE)
@@ -24,6 +21,7 @@ class DepparseProcessor(UDProcessor):
     PROVIDES_DEFAULT = set([DEPPARSE])
     # set of processor requirements for this processor
     REQUIRES_DEFAULT = set([TOKENIZE, POS, LEMMA])
+    USES_INFERENCE_CACHES = True
 
     def __init__(self, config, pipeline, device):
         self._pretagged = None
@@ -40,6 +38,7 @@ class DepparseProcessor(UDProcessor):
         self._pretrain = pipeline.foundation_cache.load_pretrain(config['pretrain_path']) if 'pretrain_path' in config else None
         args = {'charlm_forward_file': config.get('forward_charlm_path', None),
                 'charlm_backward_file': config.get('backward_charlm_path', None)}
+        args.update(self.inference_args(config, INFERENCE_ARGS))
         self._trainer = Trainer(args=args, pretrain=self.pretrain, model_file=config['model_path'], device=device, foundation_cache=pipeline.foundation_cache)
 
     def get_known_relations(self):
@@ -58,7 +57,8 @@ class DepparseProcessor(UDProcessor):
         try:
             batch = DataLoader(document, self.config['batch_size'], self.config, self.pretrain, vocab=self.vocab, evaluation=True,
                                sort_during_eval=self.config.get('sort_during_eval', True),
-                               min_length_to_batch_separately=self.config.get('min_length_to_batch_separately', DEFAULT_SEPARATE_BATCH))
+                               min_length_to_batch_separately=self.config.get('min_length_to_batch_separately', DEFAULT_SEPARATE_BATCH),
+                               token_budget=self.config.get('token_budget', None))
             with torch.no_grad():
                 preds = []
                 for i, b in enumerate(batch):
@@ -7,6 +7,8 @@ from itertools import compress
 import torch
 
 from stanza.models.common import doc
+from stanza.models.common.utils import unsort
+from stanza.models.lemma.cache import DEFAULT_CACHE_SIZE, LemmaCache, model_file_id
 from stanza.models.lemma.data import DataLoader
 from stanza.models.lemma.trainer import Trainer
 from stanza.pipeline._constants import *
@@ -29,6 +31,7 @@ class LemmaProcessor(UDProcessor):
         # run lemmatizer in identity mode
         self._use_identity = None
         self._pretagged = None
+        self.cache = None
         super().__init__(config, pipeline, device)
 
     @property
@@ -54,6 +57,16 @@ class LemmaProcessor(UDProcessor):
                     'charlm_backward_file': config.get('backward_charlm_path', None)}
             self._trainer = Trainer(args=args, model_file=config['model_path'], device=device, foundation_cache=pipeline.foundation_cache)
 
+            # a bounded cache of (word, upos) -> lemma, unlike store_results
+            # with cache_file, the results are kept in sqlite and
+            # reused by other processes using the same model
+            cache_size = int(config.get('cache_size', 0))
+            cache_file = config.get('cache_file', None)
+            if cache_file and not cache_size:
+                cache_size = DEFAULT_CACHE_SIZE
+            if cache_size > 0:
+                self.cache = LemmaCache(model_file_id(config['model_path'], pipeline.dir), cache_size, cache_file)
+
     def _set_up_requires(self):
         self._pretagged = self._config.get('pretagged', None)
         if self._pretagged:
@@ -65,7 +78,8 @@ class LemmaProcessor(UDProcessor):
 
     def process(self, document):
         if not self.use_identity:
-            batch = DataLoader(document, self.config['batch_size'], self.config, vocab=self.vocab, evaluation=True)
+            batch = DataLoader(document, self.config['batch_size'], self.config, vocab=self.vocab, evaluation=True,
+                               token_budget=self.config.get('token_budget', None))
         else:
             batch = DataLoader(document, self.config['batch_size'], self.config, evaluation=True, conll_only=True)
         if self.use_identity:
@@ -73,11 +87,22 @@ class LemmaProcessor(UDProcessor):
         elif self.config.get('dict_only', False):
             preds = self.trainer.predict_dict(batch.doc.get([doc.TEXT, doc.UPOS]))
         else:
-            if self.config.get('ensemble_dict', False):
+            word_tags = batch.doc.get(WORD_TAGS)
+            ensemble_dict = self.config.get('ensemble_dict', False)
+            if self.cache is not None:
+                cached = self.cache.lookup(word_tags)
+            else:
+                cached = [None] * len(word_tags)
+            if ensemble_dict:
                 # skip the seq2seq model when we can
-                skip = self.trainer.skip_seq2seq(batch.doc.get([doc.TEXT, doc.UPOS]))
+                skip = self.trainer.skip_seq2seq(word_tags)
+            else:
+                skip = [False] * len(word_tags)
+            # only the words missing from both the cache and the dictionary go to the seq2seq model
+            skip = [x or y is not None for x, y in zip(skip, cached)]
+            if any(skip):
                 seq2seq_batch = DataLoader(document, self.config['batch_size'], self.config, vocab=self.vocab,
-                                           evaluation=True, skip=skip)
+                                           evaluation=True, skip=skip, token_budget=self.config.get('token_budget', None))
             else:
                 seq2seq_batch = batch
 
@@ -89,27 +114,35 @@ class LemmaProcessor(UDProcessor):
                     preds += ps
                     if es is not None:
                         edits += es
+            if seq2seq_batch.data_orig_idx is not None:
+                preds = unsort(preds, seq2seq_batch.data_orig_idx)
+                if edits:
+                    edits = unsort(edits, seq2seq_batch.data_orig_idx)
 
-            if self.config.get('ensemble_dict', False):
-                word_tags = batch.doc.get(WORD_TAGS)
-                words = [x[0] for x in word_tags]
-                preds = self.trainer.postprocess([x for x, y in zip(words, skip) if not y], preds, edits=edits)
-                if self.store_results:
-                    new_word_tags = compress(word_tags, map(lambda x: not x, skip))
-                    new_predictions = [(x[0], x[1], y) for x, y in zip(new_word_tags, preds)]
-                    self.trainer.train_dict(new_predictions, update_word_dict=False)
-                # expand seq2seq predictions to the same size as all words
-                i = 0
-                preds1 = []
-                for s in skip:
-                    if s:
-                        preds1.append('')
-                    else:
-                        preds1.append(preds[i])
-                        i += 1
+            words = [x[0] for x in word_tags]
+            preds = self.trainer.postprocess([x for x, y in zip(words, skip) if not y], preds, edits=edits)
+            new_word_tags = list(compress(word_tags, map(lambda x: not x, skip)))
+            new_predictions = [(x[0], x[1], y) for x, y in zip(new_word_tags, preds)]
+            if self.store_results and ensemble_dict:
+                self.trainer.train_dict(new_predictions, update_word_dict=False)
+            if self.cache is not None:
+                self.cache.update(new_predictions)
+            # expand seq2seq predictions to the same size as all words
+            # words found in the cache use the cached lemma
+            i = 0
+            preds1 = []
+            for s, c in zip(skip, cached):
+                if c is not None:
+                    preds1.append(c)
+                elif s:
+                    preds1.append('')
+                else:
+                    preds1.append(preds[i])
+                    i += 1
+            if ensemble_dict:
                 preds = self.trainer.ensemble(word_tags, preds1)
             else:
-                preds = self.trainer.postprocess(batch.doc.get([doc.TEXT]), preds, edits=edits)
+                preds = preds1
 
         # map empty string lemmas to '_'
         preds = [max([(len(x), x), (0, '_')])[1] for x in preds]
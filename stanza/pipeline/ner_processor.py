@@ -9,7 +9,7 @@ import logging
 from stanza.models.common import doc
 from stanza.models.common.utils import unsort
 from stanza.models.ner.data import DataLoader
-from stanza.models.ner.trainer import Trainer
+from stanza.models.ner.trainer import INFERENCE_ARGS, Trainer
 from stanza.models.ner.utils import merge_tags
 from stanza.pipeline._constants import *
 from stanza.pipeline.processor import UDProcessor, register_processor
@@ -23,6 +23,7 @@ class NERProcessor(UDProcessor):
     PROVIDES_DEFAULT = set([NER])
     # set of processor requirements for this processor
     REQUIRES_DEFAULT = set([TOKENIZE])
+    USES_INFERENCE_CACHES = True
 
     def _get_dependencies(self, config, dep_name):
         dependencies = config.get(dep_name, None)
@@ -49,12 +50,16 @@ class NERProcessor(UDProcessor):
             pretrain = pipeline.foundation_cache.load_pretrain(pretrain_path) if pretrain_path else None
             args = {'charlm_forward_file': charlm_forward,
                     'charlm_backward_file': charlm_backward}
+            args.update(self.inference_args(config, INFERENCE_ARGS))
             trainer = Trainer(args=args, model_file=model_path, pretrain=pretrain, device=device, foundation_cache=pipeline.foundation_cache)
             self.trainers.append(trainer)
 
         self._trainer = self.trainers[0]
         self.model_paths = model_paths
 
+    def _quantizable_models(self):
+        return [trainer.model for trainer in self.trainers]
+
     def _set_up_final_config(self, config):
         """ Finalize the configurations for this processor, based off of values from a UD model. """
         # set configurations from loaded model
@@ -83,10 +88,13 @@ class NERProcessor(UDProcessor):
             all_preds = []
             for trainer, config in zip(self.trainers, self.configs):
                 # set up a eval-only data loader and skip tag preprocessing
-                batch = DataLoader(document, config['batch_size'], config, vocab=trainer.vocab, evaluation=True, preprocess_tags=False, bert_tokenizer=trainer.model.bert_tokenizer)
+                batch = DataLoader(document, config['batch_size'], config, vocab=trainer.vocab, evaluation=True, preprocess_tags=False, bert_tokenizer=trainer.model.bert_tokenizer,
+                                   token_budget=config.get('token_budget', None))
                 preds = []
                 for i, b in enumerate(batch):
                     preds += trainer.predict(b)
+                if batch.data_orig_idx is not None:
+                    preds = unsort(preds, batch.data_orig_idx)
                 all_preds.append(preds)
         # for each sentence, gather a list of predictions
         # merge those predictions into a single list
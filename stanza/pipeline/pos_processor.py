@@ -8,7 +8,7 @@ from stanza.models.common import doc
 from stanza.models.common.utils import unsort
 from stanza.models.common.vocab import VOCAB_PREFIX, CompositeVocab
 from stanza.models.pos.data import DataLoader
-from stanza.models.pos.trainer import Trainer
+from stanza.models.pos.trainer import INFERENCE_ARGS, Trainer
 from stanza.pipeline._constants import *
 from stanza.pipeline.processor import UDProcessor, register_processor
 from stanza.utils.get_tqdm import get_tqdm
@@ -22,12 +22,14 @@ class POSProcessor(UDProcessor):
     PROVIDES_DEFAULT = set([POS])
     # set of processor requirements for this processor
     REQUIRES_DEFAULT = set([TOKENIZE])
+    USES_INFERENCE_CACHES = True
 
     def _set_up_model(self, config, pipeline, device):
         # get pretrained word vectors
         self._pretrain = pipeline.foundation_cache.load_pretrain(config['pretrain_path']) if 'pretrain_path' in config else None
         args = {'charlm_forward_file': config.get('forward_charlm_path', None),
                 'charlm_backward_file': config.get('backward_charlm_path', None)}
+        args.update(self.inference_args(config, INFERENCE_ARGS))
         # set up trainer
         self._trainer = Trainer(pretrain=self.pretrain, model_file=config['model_path'], device=device, args=args, foundation_cache=pipeline.foundation_cache)
         self._tqdm = 'tqdm' in config and config['tqdm']
@@ -69,7 +71,7 @@ class POSProcessor(UDProcessor):
     def process(self, document):
         batch = DataLoader(
             document, self.config['batch_size'], self.config, self.pretrain, vocab=self.vocab, evaluation=True,
-            sort_during_eval=True)
+            sort_during_eval=True, token_budget=self.config.get('token_budget', None))
         preds = []
 
         with torch.no_grad():
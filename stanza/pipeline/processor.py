@@ -3,9 +3,14 @@ Base classes for processors
 """
 
 from abc import ABC, abstractmethod
+from collections import Counter
 
+from torch import nn
+
+from stanza.models.common.char_model import CharacterLanguageModel
 from stanza.models.common.doc import Document
-from stanza.pipeline.registry import NAME_TO_PROCESSOR_CLASS, PIPELINE_NAMES, PROCESSOR_VARIANTS
+from stanza.models.common.quantize import quantize_model
+from stanza.pipeline.registry import NAME_TO_PROCESSOR_CLASS, PIPELINE_NAMES, PROCESSOR_VARIANTS, get_processor_variant
 
 class ProcessorRequirementsException(Exception):
     """ Exception indicating a processor's requirements will not be met """
@@ -97,6 +102,16 @@ class Processor(ABC):
 
         return [self.process(doc) for doc in docs]
 
+    def inference_cache_users(self):
+        """
+        The transformers and charlms this processor reads through the Pipeline's inference caches
+
+        Returns two Counters, keyed by the id of each transformer and
+        each charlm, of how many of this processor's models use it.
+        Most processors do not use the caches at all
+        """
+        return Counter(), Counter()
+
     def _set_up_provides(self):
         """ Set up what processor requirements this processor fulfills.  Default is to use a class defined list. """
         self._provides = self.__class__.PROVIDES_DEFAULT
@@ -127,7 +142,7 @@ class Processor(ABC):
         if any(config.get(f'with_{variant}', False) for variant in PROCESSOR_VARIANTS[processor_name]):
             self._trainer = None
             variant_name = [variant for variant in PROCESSOR_VARIANTS[processor_name] if config.get(f'with_{variant}', False)][0]
-            self._variant = PROCESSOR_VARIANTS[processor_name][variant_name](config)
+            self._variant = get_processor_variant(processor_name, variant_name)(config)
 
     @property
     def config(self):
@@ -182,6 +197,9 @@ class ProcessorVariant(ABC):
 class UDProcessor(Processor):
     """ Base class for the neural UD Processors (tokenize,mwt,pos,lemma,depparse,sentiment,constituency) """
 
+    # whether the models of this processor get their transformer and charlm results through the inference caches
+    USES_INFERENCE_CACHES = False
+
     def __init__(self, config, pipeline, device):
         super().__init__(config, pipeline, device)
 
@@ -191,6 +209,9 @@ class UDProcessor(Processor):
         self._vocab = None
         if not hasattr(self, '_variant'):
             self._set_up_model(config, pipeline, device)
+            if config.get('quantize'):
+                for model in self._quantizable_models():
+                    quantize_model(model, config['quantize'], device)
 
         # build the final config for the processor
         self._set_up_final_config(config)
@@ -199,6 +220,24 @@ class UDProcessor(Processor):
     def _set_up_model(self, config, pipeline, device):
         pass
 
+    def _quantizable_models(self):
+        """ The models which the quantize option applies to.  Processors which keep their models somewhere other than the trainer override this """
+        model = getattr(self._trainer, 'model', None)
+        return [model] if model is not None else []
+
+    def inference_cache_users(self):
+        if not self.USES_INFERENCE_CACHES:
+            return super().inference_cache_users()
+        if getattr(self, '_inference_cache_users', None) is None:
+            transformers, charlms = Counter(), Counter()
+            for model in self._quantizable_models():
+                modules = list(model.modules())
+                transformers.update({id(module.bert_model) for module in modules
+                                     if isinstance(getattr(module, 'bert_model', None), nn.Module)})
+                charlms.update({id(module) for module in modules if isinstance(module, CharacterLanguageModel)})
+            self._inference_cache_users = (transformers, charlms)
+        return self._inference_cache_users
+
     def _set_up_final_config(self, config):
         """ Finalize the configurations for this processor, based off of values from a UD model. """
         # set configurations from loaded model
@@ -228,6 +267,18 @@ class UDProcessor(Processor):
     def vocab(self):
         return self._vocab
 
+    @staticmethod
+    def inference_args(config, names):
+        """
+        The options in names which are set in this processor's config, to pass on to the Trainer
+
+        A Trainer's INFERENCE_ARGS are options which only change how its
+        model predicts.  They are not saved with the model, so whatever
+        runs the model gets to choose them, and they are passed on here
+        rather than read from the checkpoint.
+        """
+        return {name: config[name] for name in names if config.get(name) is not None}
+
     @staticmethod
     def filter_out_option(option):
         """ Filter out non-processor configurations """
@@ -279,7 +330,9 @@ def register_processor(name):
             raise ProcessorRegisterException(Cls, Processor)
 
         NAME_TO_PROCESSOR_CLASS[name] = Cls
-        PIPELINE_NAMES.append(name)
+        # the built in processors already have their place in the pipeline order
+        if name not in PIPELINE_NAMES:
+            PIPELINE_NAMES.append(name)
         return Cls
     return wrapper
 
@@ -1,8 +1,60 @@
 from collections import defaultdict
+import importlib
+
+from stanza.pipeline._constants import *
+
+# the modules of the processors which come with stanza, in the order
+# they run.  A module is only imported when a pipeline needs that
+# processor, at which point its register_processor fills in
+# NAME_TO_PROCESSOR_CLASS
+PROCESSOR_MODULES = {
+    LANGID: 'stanza.pipeline.langid_processor',
+    TOKENIZE: 'stanza.pipeline.tokenize_processor',
+    MWT: 'stanza.pipeline.mwt_processor',
+    POS: 'stanza.pipeline.pos_processor',
+    LEMMA: 'stanza.pipeline.lemma_processor',
+    CONSTITUENCY: 'stanza.pipeline.constituency_processor',
+    DEPPARSE: 'stanza.pipeline.depparse_processor',
+    SENTIMENT: 'stanza.pipeline.sentiment_processor',
+    NER: 'stanza.pipeline.ner_processor',
+}
+
+# the modules of the processor variants which come with stanza
+VARIANT_MODULES = {
+    TOKENIZE: {
+        'jieba': 'stanza.pipeline.external.jieba',
+        'spacy': 'stanza.pipeline.external.spacy',
+        'sudachipy': 'stanza.pipeline.external.sudachipy',
+        'pythainlp': 'stanza.pipeline.external.pythainlp',
+    },
+    DEPPARSE: {
+        'converter': 'stanza.pipeline.external.corenlp_converter_depparse',
+    },
+}
 
 # these two get filled by register_processor
+# the names of the built in processors are known before their modules are imported
 NAME_TO_PROCESSOR_CLASS = dict()
-PIPELINE_NAMES = []
+PIPELINE_NAMES = list(PROCESSOR_MODULES)
 
 # this gets filled by register_processor_variant
-PROCESSOR_VARIANTS = defaultdict(dict)
+# until a built in variant is imported, its entry is the name of its module
+PROCESSOR_VARIANTS = defaultdict(dict, {name: dict(variants) for name, variants in VARIANT_MODULES.items()})
+
+def get_processor_class(name):
+    """
+    Returns the class registered for processor `name`, importing it first if it is a built in processor
+    """
+    if name not in NAME_TO_PROCESSOR_CLASS and name in PROCESSOR_MODULES:
+        importlib.import_module(PROCESSOR_MODULES[name])
+    return NAME_TO_PROCESSOR_CLASS[name]
+
+def get_processor_variant(name, variant):
+    """
+    Returns the class registered for `variant` of processor `name`, importing it first if needed
+    """
+    cls = PROCESSOR_VARIANTS[name][variant]
+    if isinstance(cls, str):
+        importlib.import_module(cls)
+        cls = PROCESSOR_VARIANTS[name][variant]
+    return cls
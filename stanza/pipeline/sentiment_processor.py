@@ -27,6 +27,7 @@ class SentimentProcessor(UDProcessor):
     # issue: by the time we load the model in Processor.__init__,
     # the requirements are already prepared
     REQUIRES_DEFAULT = set([TOKENIZE])
+    USES_INFERENCE_CACHES = True
 
     # default batch size, measured in words per batch
     DEFAULT_BATCH_SIZE = 5000
@@ -60,6 +61,9 @@ class SentimentProcessor(UDProcessor):
         # batch size counted as words
         self._batch_size = config.get('batch_size', SentimentProcessor.DEFAULT_BATCH_SIZE)
 
+    def _quantizable_models(self):
+        return [self._model]
+
     def process(self, document):
         sentences = self._model.extract_sentences(document)
         with torch.no_grad():
@@ -15,12 +15,6 @@ from stanza.pipeline.processor import UDProcessor, register_processor
 from stanza.pipeline.registry import PROCESSOR_VARIANTS
 from stanza.models.common import doc
 
-# these imports trigger the "register_variant" decorations
-from stanza.pipeline.external.jieba import JiebaTokenizer
-from stanza.pipeline.external.spacy import SpacyTokenizer
-from stanza.pipeline.external.sudachipy import SudachiPyTokenizer
-from stanza.pipeline.external.pythainlp import PyThaiNLPTokenizer
-
 logger = logging.getLogger('stanza')
 
 # class for running the tokenizer
@@ -9,7 +9,6 @@ import json
 import logging
 import os
 from pathlib import Path
-import requests
 import shutil
 import tempfile
 import zipfile
@@ -64,13 +63,86 @@ def ensure_dir(path):
     """
     Path(path).mkdir(parents=True, exist_ok=True)
 
-def get_md5(path):
+MD5_CHUNK_SIZE = 1 << 20
+MD5_CACHE_FILENAME = '.md5_cache.json'
+
+def get_md5(path, chunk_size=MD5_CHUNK_SIZE):
     """
     Get the MD5 value of a path.
+
+    The file is read in chunks so that large models are never entirely in memory.
     """
+    md5 = hashlib.md5()
     with open(path, 'rb') as fin:
-        data = fin.read()
-    return hashlib.md5(data).hexdigest()
+        for chunk in iter(lambda: fin.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+def md5_cache_key(path):
+    """
+    The file attributes which must be unchanged for a cached md5 to be trusted.
+
+    ctime is included as well as mtime, since ctime cannot be set back
+    by copying a file over an existing one with its timestamps preserved.
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino]
+
+def read_md5_cache(md5_cache):
+    try:
+        with open(md5_cache, encoding='utf-8') as fin:
+            cache = json.load(fin)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return cache
+
+def write_md5_cache(md5_cache, cache):
+    """
+    Atomically replace the md5 cache.  A cache which cannot be written is only logged
+    """
+    try:
+        fd, temppath = tempfile.mkstemp(dir=os.path.dirname(md5_cache), prefix=MD5_CACHE_FILENAME, suffix='.tmp')
+    except OSError as e:
+        logger.debug("Could not update md5 cache %s: %s", md5_cache, e)
+        return
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fout:
+            json.dump(cache, fout, indent=1, sort_keys=True)
+        os.replace(temppath, md5_cache)
+    except OSError as e:
+        logger.debug("Could not update md5 cache %s: %s", md5_cache, e)
+        if os.path.exists(temppath):
+            os.unlink(temppath)
+
+def get_cached_md5(path, md5_cache=None):
+    """
+    Get the MD5 value of a path, reusing a value from the md5 cache if possible.
+
+    `md5_cache` is the path of a json sidecar file, usually MD5_CACHE_FILENAME
+    in the model dir, which maps each file under that dir to its
+    size, mtime, ctime, and inode along with the md5 computed for it.
+    If any of those have changed since, the file is hashed again and
+    the entry updated.  Without `md5_cache`, the file is always hashed.
+    """
+    if md5_cache is None:
+        return get_md5(path)
+    key = md5_cache_key(path)
+    name = os.path.relpath(os.path.abspath(path), os.path.dirname(os.path.abspath(md5_cache)))
+    entry = read_md5_cache(md5_cache).get(name)
+    if isinstance(entry, dict) and entry.get('stat') == key:
+        return entry['md5']
+
+    md5 = get_md5(path)
+    # if the file changed while it was being hashed, the md5 may be
+    # of neither version, so don't remember it
+    if md5_cache_key(path) == key:
+        # reread in case another process updated the cache in the meantime
+        cache = read_md5_cache(md5_cache)
+        cache[name] = {'stat': key, 'md5': md5}
+        write_md5_cache(md5_cache, cache)
+    return md5
 
 def unzip(path, filename):
     """
@@ -89,17 +161,17 @@ def get_root_from_zipfile(filename):
         f"Zip file at f{filename} seems to be corrupted. Please check it."
     return os.path.dirname(zf.filelist[0].filename)
 
-def file_exists(path, md5):
+def file_exists(path, md5, md5_cache=None):
     """
     Check if the file at `path` exists and match the provided md5 value.
     """
-    return os.path.exists(path) and get_md5(path) == md5
+    return os.path.exists(path) and get_cached_md5(path, md5_cache) == md5
 
-def assert_file_exists(path, md5=None, alternate_md5=None):
+def assert_file_exists(path, md5=None, alternate_md5=None, md5_cache=None):
     if not os.path.exists(path):
         raise FileNotFoundError(errno.ENOENT, "Cannot find expected file", path)
     if md5:
-        file_md5 = get_md5(path)
+        file_md5 = get_cached_md5(path, md5_cache)
         if file_md5 != md5:
             if file_md5 == alternate_md5:
                 logger.debug("Found a possibly older version of file %s, md5 %s instead of %s", path, alternate_md5, md5)
@@ -110,6 +182,9 @@ def download_file(url, path, proxies, raise_for_status=False):
     """
     Download a URL into a file as specified by `path`.
     """
+    # requests is only needed for downloading, so it is not imported with stanza
+    import requests
+
     verbose = logger.level in [0, 10, 20]
     r = requests.get(url, stream=True, proxies=proxies)
     with open(path, 'wb') as f:
@@ -127,16 +202,17 @@ def download_file(url, path, proxies, raise_for_status=False):
         r.raise_for_status()
     return r.status_code
 
-def request_file(url, path, proxies=None, md5=None, raise_for_status=False, log_info=True, alternate_md5=None):
+def request_file(url, path, proxies=None, md5=None, raise_for_status=False, log_info=True, alternate_md5=None, md5_cache=None):
     """
     A complete wrapper over download_file() that also make sure the directory of
     `path` exists, and that a file matching the md5 value does not exist.
 
     alternate_md5 allows for an alternate md5 that is acceptable (such as if an older version of a file is okay)
+    md5_cache is a sidecar file of previously verified md5s, so that unchanged files are not hashed again
     """
     basedir = Path(path).parent
     ensure_dir(basedir)
-    if file_exists(path, md5):
+    if file_exists(path, md5, md5_cache):
         if log_info:
             logger.info(f'File exists: {path}')
         else:
@@ -151,7 +227,7 @@ def request_file(url, path, proxies=None, md5=None, raise_for_status=False, log_
         temppath = os.path.join(temp, os.path.split(path)[-1])
         download_file(url, temppath, proxies, raise_for_status)
         os.replace(temppath, path)
-    assert_file_exists(path, md5, alternate_md5)
+    assert_file_exists(path, md5, alternate_md5, md5_cache)
 
 def sort_processors(processor_list):
     sorted_list = []
@@ -526,7 +602,8 @@ def download_models(download_list,
                 proxies,
                 md5=resources[lang][key][value]['md5'],
                 log_info=log_info,
-                alternate_md5=resources[lang][key][value].get('alternate_md5', None)
+                alternate_md5=resources[lang][key][value].get('alternate_md5', None),
+                md5_cache=os.path.join(model_dir, MD5_CACHE_FILENAME)
             )
         except KeyError as e:
             raise ValueError(
@@ -584,6 +661,7 @@ def download(
             os.path.join(model_dir, lang, f'default.zip'),
             proxies,
             md5=resources[lang]['default_md5'],
+            md5_cache=os.path.join(model_dir, MD5_CACHE_FILENAME)
         )
         unzip(os.path.join(model_dir, lang), 'default.zip')
     # Customize: maintain download list
@@ -3,6 +3,7 @@ Client for accessing Stanford CoreNLP in Python
 """
 
 import atexit
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import enum
 import io
@@ -14,6 +15,7 @@ import json
 import shlex
 import socket
 import subprocess
+import threading
 import time
 import sys
 import uuid
@@ -85,6 +87,14 @@ class PermanentlyFailedException(Exception):
     """ Exception raised if the service should NOT retry the request. """
     pass
 
+
+class RetryableAnnotationException(AnnotationException, ShouldRetryException):
+    """ Exception raised when an annotation request failed in a way that may succeed if sent again, such as a dropped connection or a busy server. """
+    pass
+
+# HTTP statuses which mean the server is temporarily unable to handle the request
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
 class StartServer(enum.Enum):
     DONT_START = 0
     FORCE_START = 1
@@ -103,7 +113,7 @@ class RobustService(object):
     CHECK_ALIVE_TIMEOUT = 120
 
     def __init__(self, start_cmd, stop_cmd, endpoint, stdout=None,
-                 stderr=None, be_quiet=False, host=None, port=None, ignore_binding_error=False):
+                 stderr=None, be_quiet=False, host=None, port=None, ignore_binding_error=False, session=None):
         self.start_cmd = start_cmd and shlex.split(start_cmd)
         self.stop_cmd = stop_cmd and shlex.split(stop_cmd)
         self.endpoint = endpoint
@@ -116,13 +126,17 @@ class RobustService(object):
         self.host = host
         self.port = port
         self.ignore_binding_error = ignore_binding_error
+        # reused for every request, so connections to the service are kept alive
+        self.session = session if session is not None else requests.Session()
+        # only one thread at a time may check on, stop, or restart the service
+        self.alive_lock = threading.Lock()
         atexit.register(self.atexit_kill)
 
     def is_alive(self):
         try:
             if not self.ignore_binding_error and self.server is not None and self.server.poll() is not None:
                 return False
-            return requests.get(self.endpoint + "/ping").ok
+            return self.session.get(self.endpoint + "/ping").ok
         except requests.exceptions.ConnectionError as e:
             raise ShouldRetryException(e)
 
@@ -166,6 +180,8 @@ class RobustService(object):
             self.server.terminate()
 
     def stop(self):
+        # any pooled connections are to the service being stopped
+        self.session.close()
         if self.server:
             self.server.terminate()
             try:
@@ -191,6 +207,10 @@ class RobustService(object):
         self.stop()
 
     def ensure_alive(self):
+        with self.alive_lock:
+            self._ensure_alive()
+
+    def _ensure_alive(self):
         # Check if the service is active and alive
         if self.is_active:
             try:
@@ -253,6 +273,8 @@ class CoreNLPClient(RobustService):
     DEFAULT_OUTPUT_FORMAT = "serialized"
     DEFAULT_MEMORY = "5G"
     DEFAULT_MAX_CHAR_LENGTH = 100000
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_RETRY_DELAY = 1.0
 
     def __init__(self, start_server=StartServer.FORCE_START,
                  endpoint=DEFAULT_ENDPOINT,
@@ -269,6 +291,8 @@ class CoreNLPClient(RobustService):
                  max_char_length=DEFAULT_MAX_CHAR_LENGTH,
                  preload=True,
                  classpath=None,
+                 pool_size=None,
+                 keep_alive=True,
                  **kwargs):
 
         # whether or not server should be started by client
@@ -361,11 +385,29 @@ class CoreNLPClient(RobustService):
             start_cmd = stop_cmd = None
             host = port = None
 
+        # connections are kept open and reused between requests.
+        # by default, there is one connection per server thread
+        self.pool_size = pool_size if pool_size is not None else threads
+        self.keep_alive = keep_alive
+
         super(CoreNLPClient, self).__init__(start_cmd, stop_cmd, endpoint,
-                                            stdout, stderr, be_quiet, host=host, port=port, ignore_binding_error=(start_server == StartServer.TRY_START))
+                                            stdout, stderr, be_quiet, host=host, port=port, ignore_binding_error=(start_server == StartServer.TRY_START),
+                                            session=self._build_session())
 
         self.timeout = timeout
 
+    def _build_session(self):
+        """
+        A requests.Session with a connection pool of pool_size connections to the server
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
     def _setup_client_defaults(self):
         """
         Do some processing of annotators and output_format specified for the client.
@@ -434,15 +476,16 @@ class CoreNLPClient(RobustService):
             atexit.register(clean_props_file, tmp_path)
             self.server_props_path = tmp_path
 
-    def _request(self, buf, properties, reset_default=False, **kwargs):
+    def _request(self, buf, properties, reset_default=False, check_alive=True, **kwargs):
         """
         Send a request to the CoreNLP server.
 
         :param (str | bytes) buf: data to be sent with the request
         :param (dict) properties: properties that the server expects
+        :param (bool) check_alive: make sure the server is running before sending the request
         :return: request result
         """
-        if self.start_server is not StartServer.DONT_START:
+        if check_alive and self.start_server is not StartServer.DONT_START:
             self.ensure_alive()
 
         try:
@@ -458,15 +501,19 @@ class CoreNLPClient(RobustService):
                 kwargs['auth'] = requests.auth.HTTPBasicAuth(kwargs['username'], kwargs['password'])
                 kwargs.pop('username')
                 kwargs.pop('password')
-            r = requests.post(self.endpoint,
-                              params={'properties': str(properties), 'resetDefault': str(reset_default).lower()},
-                              data=buf, headers={'content-type': ctype},
-                              timeout=(self.timeout*2)/1000, **kwargs)
+            r = self.session.post(self.endpoint,
+                                  params={'properties': str(properties), 'resetDefault': str(reset_default).lower()},
+                                  data=buf, headers={'content-type': ctype},
+                                  timeout=(self.timeout*2)/1000, **kwargs)
             r.raise_for_status()
             return r
         except requests.exceptions.Timeout as e:
             raise TimeoutException("Timeout requesting to CoreNLPServer. Maybe server is unavailable or your document is too long")
+        except requests.exceptions.ConnectionError as e:
+            raise RetryableAnnotationException("Could not connect to CoreNLPServer at %s" % self.endpoint) from e
         except requests.exceptions.RequestException as e:
+            if e.response is not None and e.response.status_code in RETRY_STATUS_CODES:
+                raise RetryableAnnotationException(e.response.text) from e
             if e.response is not None and e.response.text is not None:
                 raise AnnotationException(e.response.text) from e
             elif e.args:
@@ -545,6 +592,50 @@ class CoreNLPClient(RobustService):
         else:
             return r
 
+    def annotate_many(self, texts, max_concurrency=None, max_retries=DEFAULT_MAX_RETRIES, retry_delay=DEFAULT_RETRY_DELAY,
+                      annotators=None, output_format=None, properties=None, reset_default=None, **kwargs):
+        """
+        Annotate several texts with up to max_concurrency requests in flight at once
+
+        :param (list) texts: texts to annotate
+        :param (int) max_concurrency: number of concurrent requests.  Defaults to the connection pool size
+        :param (int) max_retries: how many times to resend a request which failed with a ShouldRetryException
+        :param (float) retry_delay: seconds to wait before the first retry, doubled for each later retry
+
+        The other arguments are the same as for annotate.
+
+        :return: list of results, in the same order as texts
+        """
+        if max_concurrency is None:
+            max_concurrency = self.pool_size
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1, got %d" % max_concurrency)
+        texts = list(texts)
+        if not texts:
+            return []
+
+        # start the server once here rather than having every thread try at the same time.
+        # the threads then skip the check, so that one slow /ping does not
+        # make a thread restart the server under the other requests
+        if self.start_server is not StartServer.DONT_START:
+            self.ensure_alive()
+
+        def annotate_with_retry(text):
+            for attempt in range(max_retries + 1):
+                try:
+                    return self.annotate(text, annotators=annotators, output_format=output_format,
+                                         properties=dict(properties) if isinstance(properties, dict) else properties,
+                                         reset_default=reset_default, check_alive=False, **kwargs)
+                except ShouldRetryException as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = retry_delay * (2 ** attempt)
+                    logger.debug("Retrying annotation in %.1f seconds after error: %s", delay, e)
+                    time.sleep(delay)
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(texts))) as executor:
+            return list(executor.map(annotate_with_retry, texts))
+
     def update(self, doc, annotators=None, properties=None):
         if properties is None:
             properties = {}
@@ -670,7 +761,7 @@ class CoreNLPClient(RobustService):
             else:
                 raise ValueError("Unrecognized inputFormat " + input_format)
             # change request method from `get` to `post` as required by CoreNLP
-            r = requests.post(
+            r = self.session.post(
                 self.endpoint + path, params={
                     'pattern': pattern,
                     'filter': filter,
@@ -707,7 +798,7 @@ class CoreNLPClient(RobustService):
         # the json output format is much more useful
         properties['outputFormat'] = 'json'
         try:
-            r = requests.post(
+            r = self.session.post(
                 self.endpoint + "/scenegraph",
                 params={
                     'properties': str(properties)
@@ -5,6 +5,8 @@ Utilities for testing
 import os
 import re
 
+from stanza.resources.common import MD5_CACHE_FILENAME
+
 # Environment Variables
 # set this to specify working directory of tests
 TEST_HOME_VAR = 'STANZA_TEST_HOME'
@@ -109,3 +111,8 @@ def compare_ignoring_whitespace(predicted, expected):
     expected = re.sub('\r\n', '\n', expected)
     assert predicted == expected
 
+def list_model_dir(path):
+    """
+    List a model dir, leaving out the md5 cache
+    """
+    return sorted(x for x in os.listdir(path) if x != MD5_CACHE_FILENAME)
@@ -0,0 +1,47 @@
+import pytest
+import torch
+
+from stanza.models.common.bert_embedding import load_bert, extract_bert_embeddings, bert_embedding_cache
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+BERT_MODEL = "hf-internal-testing/tiny-bert"
+
+@pytest.fixture(scope="module")
+def tiny_bert():
+    model, tokenizer = load_bert(BERT_MODEL)
+    return model, tokenizer
+
+DATA = [["Unban", "Mox", "Opal"], ["Ban", "Lurrus", "and", "Jeweled", "Lotus"]]
+
+@pytest.mark.parametrize("keep_endpoints, num_layers", [(False, None), (True, None), (False, 2), (True, 4)])
+def test_cached_embeddings(tiny_bert, keep_endpoints, num_layers):
+    """
+    Features returned from the cache should be the same as running the transformer
+    """
+    model, tokenizer = tiny_bert
+    expected = extract_bert_embeddings(BERT_MODEL, tokenizer, model, DATA, "cpu", keep_endpoints=keep_endpoints, num_layers=num_layers)
+    with bert_embedding_cache() as cache:
+        # fill the cache with one sentence, then reuse it for the batch
+        extract_bert_embeddings(BERT_MODEL, tokenizer, model, DATA[:1], "cpu", keep_endpoints=not keep_endpoints, num_layers=num_layers)
+        result = extract_bert_embeddings(BERT_MODEL, tokenizer, model, DATA, "cpu", keep_endpoints=keep_endpoints, num_layers=num_layers)
+        assert cache.hits == 1
+        assert cache.misses == 2
+        assert len(cache) == 2
+    assert len(result) == len(expected)
+    for x, y in zip(result, expected):
+        assert x.shape == y.shape
+        assert torch.allclose(x, y, atol=1e-5)
+
+def test_cache_more_layers(tiny_bert):
+    """
+    A caller which needs more layers than are stored recomputes the features
+    """
+    model, tokenizer = tiny_bert
+    with bert_embedding_cache() as cache:
+        extract_bert_embeddings(BERT_MODEL, tokenizer, model, DATA, "cpu", keep_endpoints=False, num_layers=1)
+        result = extract_bert_embeddings(BERT_MODEL, tokenizer, model, DATA, "cpu", keep_endpoints=False, num_layers=3)
+        assert cache.hits == 0
+        extract_bert_embeddings(BERT_MODEL, tokenizer, model, DATA, "cpu", keep_endpoints=False, num_layers=2)
+        assert cache.hits == 2
+    assert all(x.shape[2] == 3 for x in result)
@@ -0,0 +1,42 @@
+import pytest
+import torch
+
+from stanza.models.common.biaffine import DeepBiaffineScorer, PairwiseBilinear
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+def test_score_pairs():
+    """
+    score_pairs should match the full pairwise scores gathered at the index
+    """
+    torch.manual_seed(1234)
+    scorer = DeepBiaffineScorer(6, 8, 5, 7)
+    # the weights start at zero, which would make any comparison pass
+    torch.nn.init.normal_(scorer.scorer.W_bilin.weight)
+    scorer.eval()
+
+    input1 = torch.randn(3, 9, 6)
+    input2 = torch.randn(3, 11, 8)
+    index = torch.randint(0, 11, (3, 9))
+
+    full = scorer(input1, input2)
+    expected = torch.gather(full, 2, index.view(3, 9, 1, 1).expand(-1, -1, 1, 7)).squeeze(2)
+    result = scorer.score_pairs(input1, input2, index)
+    assert result.shape == (3, 9, 7)
+    assert torch.allclose(result, expected, atol=1e-5)
+
+def test_forward_pairs_chunks():
+    """
+    The result should not depend on how many rows are scored at once
+    """
+    torch.manual_seed(1234)
+    bilinear = PairwiseBilinear(6, 8, 7)
+    torch.nn.init.normal_(bilinear.weight)
+    input1 = torch.randn(3, 9, 6)
+    input2 = torch.randn(3, 9, 8)
+
+    full = bilinear(input1, input2)
+    expected = torch.diagonal(full, dim1=1, dim2=2).transpose(1, 2)
+    for chunk_size in (1, 5, 1000):
+        result = bilinear.forward_pairs(input1, input2, chunk_size=chunk_size)
+        assert torch.allclose(result, expected, atol=1e-5)
@@ -11,9 +11,11 @@ import os
 import tempfile
 
 import pytest
+import torch
 
 from stanza.models import charlm
 from stanza.models.common import char_model
+from stanza.models.common.data import get_long_tensor
 from stanza.tests import TEST_MODELS_DIR
 
 pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
@@ -188,3 +190,86 @@ class TestCharModel:
                 model.save(save_file)
                 reloaded = char_model.CharacterLanguageModel.load(save_file)
                 assert model.is_forward_lm == reloaded.is_forward_lm
+
+def build_random_charlm(tempdir, is_forward_lm):
+    """
+    An untrained charlm is enough to check that cached results match uncached results
+    """
+    sample_file = os.path.join(tempdir, "text.txt")
+    with open(sample_file, "w", encoding="utf-8") as fout:
+        fout.write(fake_text_1)
+        fout.write(fake_text_2)
+    vocab = {'char': char_model.build_charlm_vocab(sample_file)}
+    args = {'char_emb_dim': 10, 'char_hidden_dim': 12, 'char_num_layers': 1, 'char_dropout': 0.0, 'char_rec_dropout': 0.0}
+    model = char_model.CharacterLanguageModel(args, vocab, is_forward_lm=is_forward_lm)
+    model.eval()
+    return model
+
+SENTENCES = [["Unban", "mox", "opal", "!"], ["I", "hate", "watching", "Peppa", "Pig"], ["This", "is", "plastic", "cheese"]]
+
+@pytest.mark.parametrize("is_forward_lm", [True, False])
+def test_charlm_cache(tmp_path, is_forward_lm):
+    """
+    Representations from the cache should match running the charlm, including the ROOT prefixed sentences depparse uses
+    """
+    model = build_random_charlm(tmp_path, is_forward_lm)
+    rooted = [[char_model.ROOT_WORD] + x for x in SENTENCES]
+    expected = model.build_char_representation(SENTENCES)
+    expected_rooted = model.build_char_representation(rooted)
+
+    with char_model.charlm_cache() as cache:
+        result = model.build_char_representation(SENTENCES[:2])
+        result = model.build_char_representation(SENTENCES)
+        result_rooted = model.build_char_representation(rooted)
+        assert cache.hits == 2 + (3 if not is_forward_lm else 0)
+        if is_forward_lm:
+            # the ROOT prefix changes the forward charlm results
+            assert cache.sentences_run[id(model)] == 6
+        else:
+            # the backward charlm ran on the prefixed sentences once
+            assert cache.sentences_run[id(model)] == 3
+
+    for x, y in zip(result + result_rooted, expected + expected_rooted):
+        assert x.shape == y.shape
+        assert torch.allclose(x, y, atol=1e-6)
+
+@pytest.mark.parametrize("attention", [True, False])
+def test_character_model_word_cache(tmp_path, attention):
+    """
+    In eval mode, CharacterModel remembers each word type, and the results match the uncached results
+    """
+    sample_file = os.path.join(tmp_path, "text.txt")
+    with open(sample_file, "w", encoding="utf-8") as fout:
+        fout.write(fake_text_1)
+    vocab = {'char': char_model.build_charlm_vocab(sample_file)}
+    args = {'char_emb_dim': 10, 'char_hidden_dim': 12, 'char_num_layers': 1, 'char_rec_dropout': 0.0, 'dropout': 0.0}
+    model = char_model.CharacterModel(args, vocab, bidirectional=True, attention=attention)
+    if attention:
+        torch.nn.init.normal_(model.char_attn.weight)
+
+    sentences = [["I", "hate", "Peppa", "Pig", "opal"], ["Unban", "mox", "opal", "!"], ["mox", "Pig"]]
+    words = [word for sentence in sentences for word in sentence]
+    wordlens = [len(word) for word in words]
+    order = sorted(range(len(words)), key=lambda x: wordlens[x], reverse=True)
+    chars = get_long_tensor([vocab['char'].map(list(words[idx])) for idx in order], len(words))
+    sorted_lens = [wordlens[idx] for idx in order]
+    sentlens = [len(sentence) for sentence in sentences]
+
+    model.eval()
+    model.word_cache_size = 0
+    expected = model(chars, None, order, sentlens, sorted_lens)
+
+    model.word_cache_size = 100
+    result = model(chars, None, order, sentlens, sorted_lens)
+    assert len(model.word_cache) == len(set(words))
+    assert torch.allclose(result.data, expected.data, atol=1e-6)
+    # a second pass comes entirely from the cache
+    result = model(chars, None, order, sentlens, sorted_lens)
+    assert torch.allclose(result.data, expected.data, atol=1e-6)
+
+    model.word_cache_size = 3
+    model(chars, None, order, sentlens, sorted_lens)
+    assert len(model.word_cache) == 3
+
+    model.train()
+    assert len(model.word_cache) == 0
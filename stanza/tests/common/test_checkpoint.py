@@ -0,0 +1,201 @@
+"""
+Test the loading of checkpoints: prefetching and tensor archives
+"""
+
+from collections import OrderedDict
+import os
+import shutil
+import tempfile
+
+import pytest
+import torch
+
+from stanza.models.common import checkpoint, convert_checkpoints, tensor_archive
+from stanza.models.common.pretrain import mmap_filenames
+from stanza.models.constituency.parse_transitions import TransitionScheme
+from stanza.tests import TEST_WORKING_DIR
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+def test_prefetch_checkpoints():
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        filenames = []
+        for idx in range(3):
+            filename = os.path.join(test_dir, "model%d.pt" % idx)
+            torch.save({'idx': idx, 'weight': torch.full((2, 2), float(idx))}, filename)
+            filenames.append(filename)
+        missing = os.path.join(test_dir, "missing.pt")
+
+        with checkpoint.prefetch_checkpoints(filenames + [missing, filenames[0]]):
+            assert sorted(checkpoint._prefetched.keys()) == sorted(os.path.abspath(x) for x in filenames)
+            loaded = checkpoint.load_checkpoint(filenames[1])
+            assert loaded['idx'] == 1
+            assert torch.equal(loaded['weight'], torch.full((2, 2), 1.0))
+            # each prefetched checkpoint is only used once
+            assert os.path.abspath(filenames[1]) not in checkpoint._prefetched
+            assert checkpoint.load_checkpoint(filenames[1])['idx'] == 1
+            with pytest.raises(FileNotFoundError):
+                checkpoint.load_checkpoint(missing)
+        # the unused checkpoints are dropped
+        assert not checkpoint._prefetched
+        assert checkpoint.load_checkpoint(filenames[2])['idx'] == 2
+
+def test_prefetch_disabled():
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        filenames = []
+        for idx in range(2):
+            filename = os.path.join(test_dir, "model%d.pt" % idx)
+            torch.save({'idx': idx}, filename)
+            filenames.append(filename)
+        with checkpoint.prefetch_checkpoints(filenames, max_workers=1):
+            assert not checkpoint._prefetched
+            assert checkpoint.load_checkpoint(filenames[0])['idx'] == 0
+
+def test_tensor_archive():
+    """
+    Everything in a checkpoint comes back from a tensor archive with the same type
+    """
+    lstm = torch.nn.LSTM(3, 4)
+    state_dict = lstm.state_dict()
+    original = {
+        'model': state_dict,
+        'vocab': {'_id2unit': ['<PAD>', 'a', 'b'], 3: 'int key', '__tuple__': 'tag as a key'},
+        'config': {'shape': (1, 2), 'tags': {'NN', 'VB'}, 'scheme': TransitionScheme.IN_ORDER, 'lr': 0.5, 'name': None},
+        'bfloat16': torch.randn(3, 2).to(torch.bfloat16),
+        'bool': torch.tensor([True, False, True]),
+        'scalar': torch.tensor(5),
+        'empty': torch.zeros(0, 3),
+        'transposed': torch.randn(4, 5).t(),
+    }
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        filename = os.path.join(test_dir, "model.tensors")
+        tensor_archive.save_tensor_archive(original, filename)
+        loaded = tensor_archive.load_tensor_archive(filename)
+
+        for key in ('bfloat16', 'bool', 'scalar', 'empty', 'transposed'):
+            assert loaded[key].dtype == original[key].dtype
+            assert torch.equal(loaded[key], original[key])
+        assert loaded['vocab'] == original['vocab']
+        assert loaded['config'] == original['config']
+        assert isinstance(loaded['config']['shape'], tuple)
+
+        assert isinstance(loaded['model'], OrderedDict)
+        assert loaded['model']._metadata == state_dict._metadata
+        new_lstm = torch.nn.LSTM(3, 4)
+        new_lstm.load_state_dict(loaded['model'])
+        for key in state_dict:
+            assert torch.equal(new_lstm.state_dict()[key], state_dict[key])
+
+        # the tensors are copy on write, so changing one does not change the file
+        loaded['scalar'].fill_(10)
+        assert tensor_archive.load_tensor_archive(filename)['scalar'].item() == 5
+
+def mapped_ranges(filename):
+    """
+    The address ranges at which this process has filename memory mapped, from /proc/self/maps
+    """
+    if not os.path.exists("/proc/self/maps"):
+        pytest.skip("Checking the memory maps needs /proc/self/maps")
+    filename = os.path.realpath(filename)
+    ranges = []
+    with open("/proc/self/maps") as fin:
+        for line in fin:
+            pieces = line.split(maxsplit=5)
+            if len(pieces) == 6 and pieces[5].strip() == filename:
+                start, end = pieces[0].split("-")
+                ranges.append((int(start, 16), int(end, 16)))
+    return ranges
+
+def is_mapped(tensor, ranges):
+    return any(start <= tensor.data_ptr() < end for start, end in ranges)
+
+def test_load_model_state():
+    """
+    The parameters loaded from a tensor archive are the memory mapped tensors, not copies of them
+    """
+    model = torch.nn.Sequential(torch.nn.Linear(3, 4), torch.nn.LSTM(4, 5))
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        filename = os.path.join(test_dir, "model.tensors")
+        tensor_archive.save_tensor_archive({'model': model.state_dict()}, filename)
+        loaded = tensor_archive.load_tensor_archive(filename)
+        ranges = mapped_ranges(filename)
+        assert ranges
+
+        new_model = torch.nn.Sequential(torch.nn.Linear(3, 4), torch.nn.LSTM(4, 5))
+        checkpoint.load_model_state(new_model, loaded['model'])
+        for name, param in new_model.named_parameters():
+            assert torch.equal(param, model.state_dict()[name])
+            assert isinstance(param, torch.nn.Parameter)
+            assert param.requires_grad
+            if checkpoint.ASSIGN_SUPPORTED:
+                assert param.data_ptr() == loaded['model'][name].data_ptr()
+                assert is_mapped(param, ranges)
+            else:
+                assert not is_mapped(param, ranges)
+
+        # the LSTM uses the new weights, not the ones it was built with
+        inputs = torch.randn(2, 3)
+        assert torch.allclose(new_model(inputs)[0], model(inputs)[0])
+
+        # changing a weight in place makes a private copy of its pages
+        new_model[0].weight.data.fill_(1.0)
+        assert torch.equal(tensor_archive.load_tensor_archive(filename)['model']['0.weight'], model[0].weight)
+
+def test_load_model_state_copies():
+    """
+    Tensors which do not match the model's dtype, or which would untie tied weights, are copied
+    """
+    model = torch.nn.Linear(3, 4)
+    state_dict = {name: tensor.to(torch.float64) for name, tensor in model.state_dict().items()}
+    assert not checkpoint.can_assign(model, state_dict)
+    checkpoint.load_model_state(model, state_dict)
+    assert model.weight.dtype == torch.float32
+    assert model.weight.data_ptr() != state_dict['weight'].data_ptr()
+
+    model = torch.nn.Sequential(torch.nn.Linear(3, 3), torch.nn.Linear(3, 3))
+    model[1].weight = model[0].weight
+    state_dict = {name: tensor.clone() for name, tensor in model.state_dict().items()}
+    assert not checkpoint.can_assign(model, state_dict)
+    checkpoint.load_model_state(model, state_dict)
+    assert model[1].weight is model[0].weight
+
+def test_load_checkpoint_prefers_archive():
+    """
+    load_checkpoint uses the archive of a .pt, unless the .pt has changed since the archive was written
+    """
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        filename = os.path.join(test_dir, "model.pt")
+        torch.save({'weight': torch.zeros(2)}, filename)
+        archive = tensor_archive.tensor_archive_filename(filename)
+        assert archive == os.path.join(test_dir, "model.tensors")
+
+        # a different checkpoint in the archive shows which file was read
+        tensor_archive.save_tensor_archive({'weight': torch.ones(2)}, archive, source=filename)
+        assert tensor_archive.is_up_to_date(archive, filename)
+        assert torch.equal(checkpoint.load_checkpoint(filename)['weight'], torch.ones(2))
+        assert torch.equal(checkpoint.load_checkpoint(archive)['weight'], torch.ones(2))
+
+        torch.save({'weight': torch.full((3,), 2.0)}, filename)
+        assert not tensor_archive.is_up_to_date(archive, filename)
+        assert torch.equal(checkpoint.load_checkpoint(filename)['weight'], torch.full((3,), 2.0))
+
+def test_convert_checkpoints():
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        model_dir = os.path.join(test_dir, "en", "pos")
+        os.makedirs(model_dir)
+        filename = os.path.join(model_dir, "model.pt")
+        torch.save({'model': {'weight': torch.randn(3, 3)}, 'config': {'hidden_dim': 3}}, filename)
+        pretrain_dir = os.path.join(test_dir, "en", "pretrain")
+        os.makedirs(pretrain_dir)
+        pretrain_file = os.path.join(pretrain_dir, "tiny.pt")
+        shutil.copyfile(os.path.join(TEST_WORKING_DIR, "in", "tiny_emb.pt"), pretrain_file)
+
+        convert_checkpoints.main([test_dir, "--verify"])
+        loaded = checkpoint.load_checkpoint(filename)
+        assert torch.equal(loaded['model']['weight'], torch.load(filename)['model']['weight'])
+        assert loaded['config'] == {'hidden_dim': 3}
+        assert all(os.path.exists(x) for x in mmap_filenames(pretrain_file))
+        assert not os.path.exists(tensor_archive.tensor_archive_filename(pretrain_file))
+
+        assert convert_checkpoints.convert_checkpoint(filename) == "up to date"
+        assert convert_checkpoints.convert_checkpoint(pretrain_file) == "up to date"
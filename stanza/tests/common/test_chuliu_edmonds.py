@@ -7,7 +7,9 @@ Test some use cases of the chuliu_edmonds algorithm
 import numpy as np
 import pytest
 
-from stanza.models.common.chuliu_edmonds import tarjan
+from concurrent.futures import ThreadPoolExecutor
+
+from stanza.models.common.chuliu_edmonds import tarjan, chuliu_edmonds_one_root, greedy_trees, decode_trees, mst_executor
 
 pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
 
@@ -34,3 +36,58 @@ def test_tarjan_cycle():
                 np.array([False, False, False, False,  True,  True,  True])]
     for r, e in zip(result, expected):
         np.testing.assert_array_equal(r, e)
+
+
+def test_greedy_trees():
+    """
+    Check that greedy_trees recognizes well formed trees, cycles, and multiple roots
+    """
+    # padded to length 5
+    scores = np.full((3, 5, 5), -10.0)
+    # "This is a test": all attached to 4, 4 attached to the root
+    for dep, head in [(1, 4), (2, 4), (3, 4), (4, 0)]:
+        scores[0, dep, head] = 0.0
+    # 1 -> 2 -> 3 -> 1 is a cycle
+    for dep, head in [(1, 2), (2, 3), (3, 1)]:
+        scores[1, dep, head] = 0.0
+    # two roots, with garbage in the padding
+    for dep, head in [(1, 0), (2, 0)]:
+        scores[2, dep, head] = 0.0
+    scores[2, 1, 4] = 10.0
+
+    heads, is_tree = greedy_trees(scores, [5, 4, 3])
+    np.testing.assert_array_equal(is_tree, [True, False, False])
+    np.testing.assert_array_equal(heads[0], [0, 4, 4, 4, 0])
+
+def test_decode_trees_matches():
+    """
+    decode_trees should give exactly the same trees as running chuliu_edmonds_one_root on each sentence
+    """
+    rng = np.random.default_rng(1234)
+    sentlens = [2, 3, 8, 15, 15, 30]
+    max_len = max(sentlens)
+    # a mix of peaked scores, which are mostly trees already,
+    # and flat random scores, which mostly need the full search
+    scores = rng.normal(size=(len(sentlens), max_len, max_len)).astype(np.float32)
+    for idx in range(0, len(sentlens), 2):
+        scores[idx, np.arange(1, max_len), np.arange(max_len - 1)] += 10.0
+
+    expected = [chuliu_edmonds_one_root(scores[idx, :length, :length]) for idx, length in enumerate(sentlens)]
+    trees = decode_trees(scores, sentlens)
+    for tree, expected_tree in zip(trees, expected):
+        np.testing.assert_array_equal(tree, expected_tree)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        trees = decode_trees(scores, sentlens, executor)
+    for tree, expected_tree in zip(trees, expected):
+        np.testing.assert_array_equal(tree, expected_tree)
+
+def test_mst_executor():
+    """
+    Parsers with the same number of threads share one pool rather than each starting their own
+    """
+    assert mst_executor(0) is None
+    assert mst_executor(None) is None
+    executor = mst_executor(2)
+    assert executor is mst_executor(2)
+    assert executor is not mst_executor(3)
@@ -2,7 +2,8 @@ import pytest
 import stanza
 
 from stanza.tests import *
-from stanza.models.common.data import get_augment_ratio, augment_punct
+from stanza.models.common.data import get_augment_ratio, augment_punct, padded_cost_batches
+from stanza.models.common.utils import unsort
 
 pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
 
@@ -30,3 +31,20 @@ def test_augment_punct():
     can_augment = should_augment
     new_data = augment_punct(data, 1.0, should_augment, can_augment)
     assert new_data == [["Simple", "test"]]
+
+def test_padded_cost_batches():
+    data = [["A"] * 2, ["B"] * 10, ["C"] * 3, ["D"] * 1, ["E"] * 3]
+    batches, orig_idx = padded_cost_batches(data, 9, lens=[len(x) for x in data])
+    # B is too long to share a batch
+    # C, E, A fit in 3 * 3 = 9 padded positions, but adding D would be 12
+    assert [[x[0] for x in batch] for batch in batches] == [["B"], ["E", "C", "A"], ["D"]]
+    for batch in batches:
+        assert len(batch) == 1 or len(batch) * max(len(x) for x in batch) <= 9
+
+    flattened = [x[0] for batch in batches for x in batch]
+    assert unsort(flattened, orig_idx) == ["A", "B", "C", "D", "E"]
+
+    batches, orig_idx = padded_cost_batches(data, 100, lens=[len(x) for x in data], max_batch_size=2)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+    assert padded_cost_batches([], 10) == ([], [])
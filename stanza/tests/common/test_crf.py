@@ -0,0 +1,39 @@
+"""
+Test the batched viterbi decode against the per-sentence version
+"""
+
+import pytest
+import torch
+
+from stanza.models.common.crf import viterbi_decode, viterbi_decode_batch
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+def test_batch_matches_single():
+    torch.manual_seed(1234)
+    sentlens = [9, 7, 7, 3, 1]
+    num_tags = 6
+    scores = torch.randn(len(sentlens), max(sentlens), num_tags)
+    trans = torch.randn(num_tags, num_tags)
+
+    batch_tags, batch_scores = viterbi_decode_batch(scores, trans, sentlens)
+    assert len(batch_tags) == len(sentlens)
+    for i, length in enumerate(sentlens):
+        tags, score = viterbi_decode(scores[i, :length].numpy(), trans.numpy())
+        assert len(batch_tags[i]) == length
+        assert batch_tags[i] == [int(x) for x in tags]
+        assert batch_scores[i].item() == pytest.approx(float(score), abs=1e-5)
+
+def test_padding_ignored():
+    """
+    Garbage scores in the padding should not change the decode
+    """
+    torch.manual_seed(1234)
+    scores = torch.randn(2, 5, 4)
+    trans = torch.randn(4, 4)
+    sentlens = [5, 2]
+    expected, _ = viterbi_decode_batch(scores, trans, sentlens)
+
+    scores[1, 2:] = 1000.0
+    result, _ = viterbi_decode_batch(scores, trans, sentlens)
+    assert result == expected
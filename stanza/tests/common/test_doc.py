@@ -2,7 +2,7 @@ import pytest
 
 import stanza
 from stanza.tests import *
-from stanza.models.common.doc import Document, ID, TEXT, NER, CONSTITUENCY, SENTIMENT
+from stanza.models.common.doc import Document, ID, TEXT, NER, CONSTITUENCY, SENTIMENT, START_CHAR, END_CHAR
 
 pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
 
@@ -151,3 +151,34 @@ def test_serialized(pipeline):
     assert len(doc2.ents) == 2
     assert doc.sentences[0].constituency == doc2.sentences[0].constituency
     assert doc.sentences[0].sentiment == doc2.sentences[0].sentiment
+
+
+def build_offset_doc(text, sentences):
+    """
+    Build a doc with character offsets from a list of list of (start, end) pairs
+    """
+    return Document([[{ID: idx+1, TEXT: text[start:end], START_CHAR: start, END_CHAR: end}
+                      for idx, (start, end) in enumerate(sentence)]
+                     for sentence in sentences], text=text)
+
+def test_splice():
+    """
+    Replace the middle paragraph of a doc and check the offsets & indices are updated
+    """
+    text = "unban mox\n\nban opal\n\nLurrus"
+    doc = build_offset_doc(text, [[(0, 5), (6, 9)], [(11, 14), (15, 19)], [(21, 27)]])
+
+    new_text = "unban mox\n\nban the opal. ban jeweled\n\nLurrus"
+    new_doc = build_offset_doc("ban the opal. ban jeweled", [[(0, 3), (4, 7), (8, 12), (12, 13)], [(14, 17), (18, 25)]])
+    doc.splice(11, 19, new_text, new_doc)
+
+    assert doc.text == new_text
+    assert len(doc.sentences) == 4
+    assert doc.num_tokens == 9
+    for idx, sentence in enumerate(doc.sentences):
+        assert sentence.index == idx
+        assert sentence.sent_id == str(idx)
+        assert sentence.doc is doc
+        for token in sentence.tokens:
+            assert new_text[token.start_char:token.end_char] == token.text
+    assert doc.sentences[3].tokens[0].start_char == 38
@@ -3,11 +3,14 @@ import os
 import shutil
 import tempfile
 
+import numpy as np
 import pytest
+import torch
+import torch.multiprocessing as mp
 
 import stanza
-from stanza.models.common.foundation_cache import FoundationCache, load_charlm
-from stanza.tests import TEST_MODELS_DIR
+from stanza.models.common.foundation_cache import FoundationCache, SharedFoundationCache, load_charlm, module_memory, tensor_storage
+from stanza.tests import TEST_MODELS_DIR, TEST_WORKING_DIR
 
 pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
 
@@ -34,3 +37,63 @@ def test_charlm_cache():
 
     # it should remember the cached version
     model = cache.load_charlm(temp_file)
+
+def read_shared_pretrain(cache, filename, queue):
+    pretrain = cache.load_pretrain(filename)
+    queue.put((pretrain.is_shared, float(pretrain.emb.sum()), pretrain.vocab['mox']))
+
+def test_shared_pretrain():
+    """
+    A spawned process should attach to the vectors in the shared cache rather than reload them
+    """
+    filename = os.path.join(TEST_WORKING_DIR, "in", "tiny_emb.pt")
+    cache = SharedFoundationCache()
+    pretrain = cache.load_pretrain(filename)
+    assert pretrain.is_shared
+
+    usage = cache.memory_usage()
+    assert len(usage) == 1
+    assert usage[0].kind == 'pretrain'
+    assert usage[0].name == filename
+    assert usage[0].num_bytes == pretrain.emb.nbytes
+    assert usage[0].shared
+
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=read_shared_pretrain, args=(cache, filename, queue))
+    process.start()
+    is_shared, total, mox = queue.get(timeout=120)
+    process.join()
+    assert is_shared
+    assert total == float(pretrain.emb.sum())
+    assert mox == pretrain.vocab['mox']
+
+def test_unshared_memory_usage():
+    filename = os.path.join(TEST_WORKING_DIR, "in", "tiny_emb.pt")
+    cache = FoundationCache()
+    pretrain = cache.load_pretrain(filename)
+    # the pretrain is not loaded until it is used
+    assert cache.memory_usage()[0].num_bytes == 0
+    assert isinstance(pretrain.emb, np.ndarray)
+    usage = cache.memory_usage()[0]
+    assert usage.num_bytes == pretrain.emb.nbytes
+    assert not usage.shared
+
+class OldTensor:
+    """
+    Stands in for a tensor from a version of torch before untyped_storage existed
+    """
+    def __init__(self, tensor):
+        self.tensor = tensor
+
+    def storage(self):
+        return self.tensor.storage()
+
+def test_module_memory():
+    module = torch.nn.Linear(10, 5)
+    assert module_memory(module) == ((10 * 5 + 5) * 4, False)
+
+    weight = module.weight
+    assert tensor_storage(OldTensor(weight)) == tensor_storage(weight)
+    # a view shares the storage of the whole tensor
+    assert tensor_storage(weight[1:]) == tensor_storage(weight)
@@ -0,0 +1,111 @@
+"""
+Test the fused inference path of HighwayLSTM
+"""
+
+import pytest
+import torch
+import torch.nn as nn
+
+from stanza.models.common import hlstm
+from stanza.models.common.hlstm import HighwayLSTM
+from stanza.models.common.quantize import quantize_model
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+LENGTHS = [7, 5, 5, 2]
+
+def build_model(highway_func=torch.tanh, rec_dropout=0):
+    torch.manual_seed(1234)
+    model = HighwayLSTM(10, 8, num_layers=3, batch_first=True, bidirectional=True, dropout=0.3,
+                        rec_dropout=rec_dropout, highway_func=highway_func, pad=True)
+    for layer in model.gate:
+        nn.init.normal_(layer.bias)
+    model.eval()
+    return model
+
+def run_model(model, inputs, fused):
+    model.fused_inference = fused
+    return model(inputs, LENGTHS)
+
+def check_same(left, right):
+    output, (hs, cs) = left
+    other_output, (other_hs, other_cs) = right
+    assert torch.allclose(output, other_output, atol=1e-6)
+    assert torch.allclose(hs, other_hs, atol=1e-6)
+    assert torch.allclose(cs, other_cs, atol=1e-6)
+
+@pytest.mark.parametrize("highway_func", [torch.tanh, None])
+def test_fused_same(highway_func):
+    """
+    The fused path gives the same results as the separate layers
+    """
+    model = build_model(highway_func)
+    assert all(model.can_fuse(l) for l in range(model.num_layers))
+    inputs = torch.randn(len(LENGTHS), max(LENGTHS), 10)
+    with torch.no_grad():
+        check_same(run_model(model, inputs, True), run_model(model, inputs, False))
+    assert len(model.fused_weights_cache) == model.num_layers
+
+def test_rec_dropout():
+    model = build_model(rec_dropout=0.2)
+    inputs = torch.randn(len(LENGTHS), max(LENGTHS), 10)
+    with torch.no_grad():
+        check_same(run_model(model, inputs, True), run_model(model, inputs, False))
+
+def test_not_fused():
+    """
+    Training mode, unknown highway functions, and quantized layers use the regular path
+    """
+    model = build_model()
+    model.train()
+    assert not model.can_fuse(0)
+
+    model = build_model(highway_func=torch.relu)
+    assert not model.can_fuse(0)
+
+    model = build_model()
+    quantize_model(model, "int8")
+    assert not model.can_fuse(0)
+    inputs = torch.randn(len(LENGTHS), max(LENGTHS), 10)
+    with torch.no_grad():
+        model(inputs, LENGTHS)
+    assert len(model.fused_weights_cache) == 0
+
+def test_gradient():
+    """
+    With gradients turned on, the fused path in eval mode still trains the separate weights
+    """
+    model = build_model()
+    inputs = torch.randn(len(LENGTHS), max(LENGTHS), 10)
+    run_model(model, inputs, True)[0].sum().backward()
+    fused_grads = [x.grad.clone() for x in model.gate.parameters()]
+    assert len(model.fused_weights_cache) == 0
+
+    model.zero_grad()
+    run_model(model, inputs, False)[0].sum().backward()
+    for fused_grad, parameter in zip(fused_grads, model.gate.parameters()):
+        assert torch.allclose(fused_grad, parameter.grad, atol=1e-6)
+
+def test_cache_updated():
+    """
+    Loading new weights replaces the cached concatenated weights
+    """
+    model = build_model()
+    other = build_model()
+    with torch.no_grad():
+        for parameter in other.parameters():
+            parameter.add_(0.1)
+    inputs = torch.randn(len(LENGTHS), max(LENGTHS), 10)
+    with torch.no_grad():
+        run_model(model, inputs, True)
+        model.load_state_dict(other.state_dict())
+        check_same(run_model(model, inputs, True), run_model(other, inputs, False))
+
+def test_scripted():
+    """
+    On versions of torch which have TorchScript, the fused highway is scripted
+    """
+    fused = hlstm.get_fused_highway()
+    assert fused is hlstm.get_fused_highway()
+    if hasattr(torch.jit, "script"):
+        assert fused is not hlstm.fused_highway
@@ -137,3 +137,53 @@ def test_no_header():
             fout.write(UNK_PRETRAIN)
         pt = pretrain.Pretrain(vec_filename=filename, save_to_file=False)
         check_embedding(pt.emb, unk=True)
+
+def test_mmap_pretrain():
+    """
+    Test writing the memory mapped version of a pretrain and loading it back
+    """
+    with tempfile.TemporaryDirectory(dir=f'{TEST_WORKING_DIR}/out') as tmpdir:
+        filename = os.path.join(tmpdir, "tiny.pt")
+        pt = pretrain.Pretrain(filename=filename, vec_filename=f'{TEST_WORKING_DIR}/in/tiny_emb.xz')
+        check_pretrain(pt)
+        vocab_filename, emb_filename = pt.save_mmap(filename)
+        assert os.path.exists(vocab_filename)
+        assert os.path.exists(emb_filename)
+
+        pt2 = pretrain.Pretrain(filename=filename)
+        check_pretrain(pt2)
+        assert isinstance(pt2.emb, np.memmap)
+        assert pt2.vocab['mox'] == pt.vocab['mox']
+
+        # the .pt file is still available if requested
+        pt3 = pretrain.Pretrain(filename=filename, use_mmap=False)
+        check_pretrain(pt3)
+        assert not isinstance(pt3.emb, np.memmap)
+
+        # a .pt file newer than the memory mapped files takes precedence
+        os.utime(emb_filename, (0, 0))
+        pt4 = pretrain.Pretrain(filename=filename)
+        check_pretrain(pt4)
+        assert not isinstance(pt4.emb, np.memmap)
+
+def test_mmap_embedding():
+    """
+    The lazy embedding should give the same results as nn.Embedding, even when stored as float16
+    """
+    with tempfile.TemporaryDirectory(dir=f'{TEST_WORKING_DIR}/out') as tmpdir:
+        filename = os.path.join(tmpdir, "tiny.pt")
+        pt = pretrain.Pretrain(filename=filename, vec_filename=f'{TEST_WORKING_DIR}/in/tiny_emb.xz', save_to_file=False)
+        pt.save_mmap(filename, dtype=np.float16)
+
+        mmap_pt = pretrain.Pretrain(filename=filename)
+        assert mmap_pt.emb.dtype == np.float16
+        mmap_emb = pretrain.build_pretrained_embedding(mmap_pt.emb)
+        assert isinstance(mmap_emb, pretrain.MmapEmbedding)
+        full_emb = pretrain.build_pretrained_embedding(pt.emb)
+        assert isinstance(full_emb, torch.nn.Embedding)
+
+        ids = torch.tensor([[4, 5, 6], [6, 0, 4]])
+        result = mmap_emb(ids)
+        assert result.shape == (2, 3, 4)
+        assert result.dtype == torch.float32
+        assert torch.allclose(result, full_emb(ids))
@@ -0,0 +1,106 @@
+"""
+Test the quantize option for models loaded by a Pipeline
+"""
+
+import pytest
+import torch
+import torch.nn as nn
+
+from stanza.models.common.quantize import QUANTIZE_MODES, quantize_model
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+class Tagger(nn.Module):
+    """
+    A small model with a shared charlm-like module, in the style of the stanza models
+    """
+    def __init__(self, charlm):
+        super().__init__()
+        self.unsaved_modules = []
+        self.add_unsaved_module('charlm', charlm)
+        self.lstm = nn.LSTM(8, 6, batch_first=True, bidirectional=True)
+        self.cell = nn.LSTMCell(12, 6)
+        self.output = nn.Sequential(nn.Linear(6, 4), nn.ReLU(), nn.Linear(4, 3))
+
+    def add_unsaved_module(self, name, module):
+        self.unsaved_modules += [name]
+        setattr(self, name, module)
+
+    def forward(self, inputs):
+        inputs = self.charlm(inputs)
+        hidden, _ = self.lstm(inputs)
+        hx, _ = self.cell(hidden[:, -1, :])
+        return self.output(hx)
+
+class CharLM(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.proj = nn.Linear(5, 8)
+
+    def forward(self, inputs):
+        return self.proj(inputs)
+
+@pytest.fixture
+def charlm():
+    torch.manual_seed(1234)
+    return CharLM()
+
+def test_quantize(charlm):
+    """
+    The saved layers are quantized, and the results stay close to the original
+    """
+    model = Tagger(charlm)
+    model.eval()
+    inputs = torch.randn(3, 7, 5)
+    with torch.no_grad():
+        expected = model(inputs)
+
+    assert quantize_model(model, "int8") == 4
+    assert type(model.lstm) is not nn.LSTM
+    assert type(model.cell) is not nn.LSTMCell
+    assert type(model.output[0]) is not nn.Linear
+    assert type(model.output[2]) is not nn.Linear
+    with torch.no_grad():
+        result = model(inputs)
+    assert result.shape == expected.shape
+    assert torch.allclose(result, expected, atol=0.05)
+
+def test_shared_modules(charlm):
+    """
+    A module shared between two models, such as the charlm of a FoundationCache, is not changed
+    """
+    first = Tagger(charlm)
+    second = Tagger(charlm)
+    weight = charlm.proj.weight.clone()
+
+    quantize_model(first, "int8")
+    assert first.charlm is charlm
+    assert type(charlm.proj) is nn.Linear
+    assert torch.equal(charlm.proj.weight, weight)
+    assert second.charlm is charlm
+
+    # the same goes for a module reachable from an unsaved module somewhere further down
+    wrapper = nn.Module()
+    wrapper.tagger = Tagger(charlm)
+    wrapper.head = nn.Linear(3, 2)
+    assert quantize_model(wrapper, "int8") == 5
+    assert type(charlm.proj) is nn.Linear
+
+def test_no_quantize(charlm):
+    model = Tagger(charlm)
+    assert quantize_model(model, None) == 0
+    assert quantize_model(None, "int8") == 0
+    assert type(model.lstm) is nn.LSTM
+
+def test_unknown_mode(charlm):
+    assert "int8" in QUANTIZE_MODES
+    with pytest.raises(ValueError):
+        quantize_model(Tagger(charlm), "int3")
+
+def test_gpu_skipped(charlm):
+    """
+    Quantization only works on the CPU, so other devices leave the model alone
+    """
+    model = Tagger(charlm)
+    assert quantize_model(model, "int8", device="cuda") == 0
+    assert type(model.lstm) is nn.LSTM
@@ -0,0 +1,100 @@
+"""
+Test the batched decoding of the seq2seq model against a sentence at a time beam search
+"""
+
+import pytest
+import torch
+
+import stanza.models.common.seq2seq_constant as constant
+from stanza.models.common import utils
+from stanza.models.common.beam import Beam
+from stanza.models.common.seq2seq_model import Seq2SeqModel
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+def build_model(copy=False, seed=12, eos_bias=0.2):
+    """
+    Build a small random model
+
+    The seeds & EOS biases used in the tests are ones where the
+    sentences in the batch finish at different steps, so that
+    removing finished sentences from the batch gets tested
+    """
+    torch.manual_seed(seed)
+    args = {
+        'vocab_size': 12,
+        'emb_dim': 8,
+        'hidden_dim': 10,
+        'num_layers': 1,
+        'dropout': 0.0,
+        'max_dec_len': 15,
+        'attn_type': 'soft',
+        'copy': copy,
+    }
+    model = Seq2SeqModel(args)
+    with torch.no_grad():
+        torch.nn.init.normal_(model.dec2vocab.weight, std=1.0)
+        model.dec2vocab.bias[constant.EOS_ID] += eos_bias
+    model.eval()
+    return model
+
+def build_batch():
+    torch.manual_seed(5678)
+    lens = [7, 6, 4, 2]
+    src = torch.zeros(len(lens), max(lens), dtype=torch.long)
+    for idx, length in enumerate(lens):
+        src[idx, :length] = torch.randint(4, 12, (length,))
+    src_mask = src.eq(constant.PAD_ID)
+    return src, src_mask
+
+def beam_search_one(model, src, src_mask, beam_size):
+    """
+    Beam search a single sentence with the Beam class
+    """
+    enc_inputs, _, src_lens, src_mask = model.embed(src, src_mask, None, None)
+    h_in, (hn, cn) = model.encode(enc_inputs, src_lens)
+    h_in = h_in.repeat(beam_size, 1, 1)
+    src_mask = src_mask.repeat(beam_size, 1)
+    src = src.repeat(beam_size, 1)
+    hn = hn.repeat(beam_size, 1)
+    cn = cn.repeat(beam_size, 1)
+    beam = Beam(beam_size)
+    for _ in range(model.max_dec_len):
+        dec_inputs = model.embedding(beam.get_current_state().view(-1, 1))
+        log_probs, (hn, cn) = model.decode(dec_inputs, hn, cn, h_in, src_mask, src=src)
+        is_done = beam.advance(log_probs.squeeze(1))
+        hn = hn.index_select(0, beam.get_current_origin())
+        cn = cn.index_select(0, beam.get_current_origin())
+        if is_done:
+            break
+    _, ks = beam.sort_best()
+    hyp = utils.prune_hyp(beam.get_hyp(ks[0]))
+    return [x.item() for x in hyp]
+
+@pytest.mark.parametrize("copy, seed, eos_bias", [(False, 12, 0.2), (False, 7, 0.2), (True, 22, 3.0)])
+def test_beam_search(copy, seed, eos_bias):
+    model = build_model(copy, seed, eos_bias)
+    src, src_mask = build_batch()
+    with torch.no_grad():
+        preds, _ = model.predict(src, src_mask, beam_size=3)
+        assert len(preds) == src.size(0)
+        assert len(set(len(pred) for pred in preds)) > 1
+        for idx in range(src.size(0)):
+            length = int(src_mask[idx].eq(0).sum())
+            expected = beam_search_one(model, src[idx:idx+1, :length], src_mask[idx:idx+1, :length], beam_size=3)
+            assert preds[idx] == expected
+
+def test_greedy():
+    """
+    Greedy decoding of the batch should match greedy decoding of each sentence
+    """
+    model = build_model()
+    src, src_mask = build_batch()
+    with torch.no_grad():
+        preds, _ = model.predict(src, src_mask, beam_size=1)
+        assert any(len(pred) < model.max_dec_len for pred in preds)
+        for idx in range(src.size(0)):
+            length = int(src_mask[idx].eq(0).sum())
+            single, _ = model.predict_greedy(src[idx:idx+1, :length], src_mask[idx:idx+1, :length])
+            assert preds[idx] == single[0]
+            assert constant.EOS_ID not in single[0]
@@ -3,9 +3,11 @@ import os
 import pytest
 import torch
 
+import stanza
 from stanza.models.common import pretrain
 from stanza.models.common.utils import set_random_seed
 from stanza.models.constituency import parse_transitions
+from stanza.models.constituency.trainer import Trainer
 from stanza.tests import *
 from stanza.tests.constituency import test_parse_transitions
 from stanza.tests.constituency.test_trainer import build_trainer
@@ -550,3 +552,111 @@ def test_parse_tagged_words(pretrain_file):
     for word, pt in zip(sentence, pts):
         assert pt.children[0].label == word[0]
         assert pt.label == word[1]
+
+def test_parse_tagged_words_token_budget(pretrain_file):
+    """
+    Batching by token budget sorts the sentences, so check that the trees come back in the original order
+    """
+    model = build_model(pretrain_file)
+
+    sentences = [[("I", "PRP"), ("am", "VBZ"), ("Luffa", "NNP")],
+                 [("Luffa", "NNP")],
+                 [("I", "PRP"), ("am", "VBZ"), ("Luffa", "NNP"), ("and", "CC"), ("I", "PRP"), ("am", "VBZ"), ("Luffa", "NNP")],
+                 [("I", "PRP"), ("am", "VBZ")]]
+
+    result = model.parse_tagged_words(sentences, 2, token_budget=6)
+    assert len(result) == len(sentences)
+    for sentence, tree in zip(sentences, result):
+        pts = [x for x in tree.yield_preterminals()]
+        assert [(pt.children[0].label, pt.label) for pt in pts] == sentence
+
+@pytest.mark.parametrize("transition_scheme", ["TOP_DOWN_UNARY", "TOP_DOWN_COMPOUND", "IN_ORDER"])
+def test_legal_mask(pretrain_file, transition_scheme):
+    """
+    Check the grouped legality mask against calling is_legal on every transition
+
+    Walks a few states forward with weighted_choice, which uses the mask
+    """
+    set_random_seed(1000)
+    model = build_model(pretrain_file, '--transition_scheme', transition_scheme)
+    states = test_parse_transitions.build_initial_state(model, 3)
+    for _ in range(30):
+        mask = model.legal_mask(states)
+        expected = [[trans.is_legal(state, model) for trans in model.transitions] for state in states]
+        assert mask.tolist() == expected
+
+        _, pred_trans, _ = model.predict(states)
+        for state, trans in zip(states, pred_trans):
+            assert trans.is_legal(state, model)
+
+        _, pred_trans, _ = model.weighted_choice(states)
+        for state, trans in zip(states, pred_trans):
+            assert trans.is_legal(state, model)
+        states = parse_transitions.bulk_apply(model, states, pred_trans)
+        states = [state for state in states if not state.finished(model)]
+        if len(states) == 0:
+            break
+
+@pytest.mark.parametrize("transition_scheme", ["TOP_DOWN_UNARY", "IN_ORDER"])
+def test_state_arena(pretrain_file, transition_scheme):
+    """
+    Parsing with the StateArena should produce the same trees and scores as the regular States
+
+    A batch size of 2 with a long sentence forces the arena to compact and grow
+    """
+    model = build_model(pretrain_file, '--transition_scheme', transition_scheme)
+    model.eval()
+    sentences = [[("I", "PRP"), ("am", "VBZ"), ("Luffa", "NNP")],
+                 [("Luffa", "NNP")],
+                 [("I", "PRP"), ("am", "VBZ"), ("Luffa", "NNP"), ("and", "CC"), ("I", "PRP"), ("am", "VBZ"), ("Luffa", "NNP")] * 3,
+                 [("I", "PRP"), ("am", "VBZ")]]
+
+    def parse(use_arena):
+        model.args['state_arena'] = use_arena
+        return model.parse_sentences_no_grad(iter(sentences), model.build_batch_from_tagged_words, 2, model.predict, keep_scores=True)
+
+    with torch.no_grad():
+        assert model.build_state_arena(2) is not None
+    expected = parse(False)
+    result = parse(True)
+    assert len(result) == len(expected)
+    for expected_result, arena_result in zip(expected, result):
+        assert arena_result.predictions[0].tree == expected_result.predictions[0].tree
+        assert torch.allclose(arena_result.predictions[0].score, expected_result.predictions[0].score)
+
+def test_state_arena_attn_stack(pretrain_file):
+    """
+    The arena only stores LSTM stacks, so a model with an attention stack keeps using States
+    """
+    model = build_model(pretrain_file,
+                        '--pattn_num_layers', '0', '--lattn_d_proj', '0',
+                        '--transition_stack', 'attn', '--transition_heads', '1')
+    with torch.no_grad():
+        assert model.build_state_arena(2) is None
+    assert model.build_state_arena(2) is None
+
+def test_no_state_arena(pretrain_file, tmp_path):
+    """
+    --no_state_arena turns off the arena, but is not saved with the model.  A Pipeline can turn it off with constituency_state_arena
+    """
+    trainer = build_trainer(pretrain_file, '--no_multistage', '--no_state_arena')
+    with torch.no_grad():
+        assert trainer.model.build_state_arena(2) is None
+
+    filename = str(tmp_path / "parser.pt")
+    trainer.save(filename)
+    loaded = Trainer.load(filename, args={'wordvec_pretrain_file': pretrain_file})
+    with torch.no_grad():
+        assert loaded.model.build_state_arena(2) is not None
+    loaded = Trainer.load(filename, args={'wordvec_pretrain_file': pretrain_file, 'state_arena': False})
+    with torch.no_grad():
+        assert loaded.model.build_state_arena(2) is None
+
+    with open(tmp_path / "resources.json", "w") as fout:
+        fout.write('{"en": {"default_processors": {}}}')
+    for state_arena in (True, False):
+        pipe = stanza.Pipeline("en", dir=str(tmp_path), processors="constituency", constituency_pretagged=True,
+                               constituency_model_path=filename, constituency_pretrain_path=pretrain_file,
+                               constituency_state_arena=state_arena, download_method=None, use_gpu=False)
+        with torch.no_grad():
+            assert (pipe.processors['constituency']._model.build_state_arena(2) is not None) == state_arena
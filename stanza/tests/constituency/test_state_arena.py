@@ -0,0 +1,91 @@
+import pytest
+import torch
+
+from stanza.models.constituency.lstm_tree_stack import LSTMTreeStack
+from stanza.models.constituency.state_arena import ArenaStack, NodeArena
+
+from stanza.tests import *
+
+pytestmark = [pytest.mark.pipeline, pytest.mark.travis]
+
+def build_stack():
+    return LSTMTreeStack(input_size=5, hidden_size=4, num_lstm_layers=2, dropout=0.0, uses_boundary_vector=False, input_dropout=torch.nn.Dropout(0.0))
+
+def test_push():
+    """
+    Pushing to an arena should give the same values and outputs as pushing TreeStacks
+    """
+    torch.manual_seed(1000)
+    lstm_stack = build_stack()
+    initial = lstm_stack.initial_state()
+    arena = NodeArena(initial, 3)
+
+    with torch.no_grad():
+        stacks = [initial, initial]
+        arena_stacks = [arena.root(), arena.root()]
+        for step in range(3):
+            inputs = torch.randn(1, 2, 5)
+            values = ["a%d" % step, "b%d" % step]
+            stacks = lstm_stack.push_states(stacks, values, inputs)
+            # the arena only has room for 3 nodes, so it needs to compact or grow
+            remap = arena.reserve(2, [stack.node for stack in arena_stacks])
+            if remap is not None:
+                arena_stacks = [ArenaStack(arena, remap[stack.node]) for stack in arena_stacks]
+            arena_stacks = lstm_stack.push_states(arena_stacks, values, inputs)
+
+        for stack, arena_stack in zip(stacks, arena_stacks):
+            assert len(stack) == len(arena_stack) == 4
+            assert [x.value for x in stack] == [x.value for x in arena_stack]
+            assert torch.allclose(lstm_stack.output(stack), lstm_stack.output(arena_stack))
+        assert torch.allclose(lstm_stack.outputs(stacks), lstm_stack.outputs(arena_stacks))
+
+def test_push_compacts():
+    """
+    When a dead node comes before the live ones, reserve renumbers the live nodes
+    """
+    torch.manual_seed(1001)
+    lstm_stack = build_stack()
+    initial = lstm_stack.initial_state()
+    arena = NodeArena(initial, 4)
+
+    remaps = []
+    with torch.no_grad():
+        # the first stack is dropped after one step, leaving node 1 dead
+        inputs = torch.randn(1, 2, 5)
+        stacks = lstm_stack.push_states([initial, initial], ["dead", "b0"], inputs)[1:]
+        arena_stacks = lstm_stack.push_states([arena.root(), arena.root()], ["dead", "b0"], inputs)[1:]
+        for step in range(1, 4):
+            inputs = torch.randn(1, 1, 5)
+            values = ["b%d" % step]
+            stacks = lstm_stack.push_states(stacks, values, inputs)
+            remap = arena.reserve(1, [stack.node for stack in arena_stacks])
+            if remap is not None:
+                remaps.append(remap)
+                arena_stacks = [ArenaStack(arena, remap[stack.node]) for stack in arena_stacks]
+            arena_stacks = lstm_stack.push_states(arena_stacks, values, inputs)
+
+    assert len(remaps) == 1
+    assert remaps[0] == {0: 0, 2: 1, 3: 2}
+    assert len(arena) == 5
+    assert [x.value for x in arena_stacks[0]] == ["b3", "b2", "b1", "b0", None]
+    assert [x.value for x in stacks[0]] == [x.value for x in arena_stacks[0]]
+    assert torch.allclose(lstm_stack.output(stacks[0]), lstm_stack.output(arena_stacks[0]))
+
+def test_compact():
+    """
+    Nodes which are not reachable from the given stacks are dropped
+    """
+    lstm_stack = build_stack()
+    arena = NodeArena(lstm_stack.initial_state(), 10)
+    with torch.no_grad():
+        first = lstm_stack.push_states([arena.root(), arena.root()], ["a", "b"], torch.randn(1, 2, 5))
+        second = lstm_stack.push_states(first, ["c", "d"], torch.randn(1, 2, 5))
+        expected = lstm_stack.output(second[1])
+
+    assert len(arena) == 5
+    remap = arena.compact([second[1].node])
+    assert len(arena) == 3
+    stack = ArenaStack(arena, remap[second[1].node])
+    assert [x.value for x in stack] == ["d", "b", None]
+    assert stack.pop().pop().pop() is None
+    assert torch.allclose(lstm_stack.output(stack), expected)
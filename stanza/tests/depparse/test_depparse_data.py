@@ -57,6 +57,15 @@ def test_data_to_batches_eval_mode():
     batched_data = data_to_batches(data, batch_size=5, eval_mode=True, sort_during_eval=False, min_length_to_batch_separately=3)
     check_batches(batched_data[0], [1, 4, 1], ['A', 'B', 'C'])
 
+def test_data_to_batches_token_budget():
+    """
+    With a token budget, the batches are limited by (longest sentence) * (number of sentences)
+    """
+    data = make_fake_data(1, 6, 2, 2, 2)
+    batched_data, data_orig_idx = data_to_batches(data, batch_size=5, eval_mode=True, sort_during_eval=True, min_length_to_batch_separately=None, token_budget=6)
+    check_batches(batched_data, [6, 6, 1], ['B', 'E', 'D', 'C', 'A'])
+    assert data_orig_idx == [1, 4, 3, 2, 0]
+
 if __name__ == '__main__':
     test_data_to_batches()
 
@@ -6,10 +6,14 @@ Uses a couple sentences of UD_English-EWT as training/dev data
 
 import os
 import pytest
+import torch
 
+import stanza
 from stanza.models import parser
 from stanza.models.common import pretrain
+from stanza.models.depparse.data import DataLoader
 from stanza.models.depparse.trainer import Trainer
+from stanza.utils.conll import CoNLL
 from stanza.tests import TEST_WORKING_DIR
 
 pytestmark = [pytest.mark.pipeline, pytest.mark.travis]
@@ -121,6 +125,59 @@ class TestParser:
         """
         self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA)
 
+    def test_two_phase_deprel(self, tmp_path, wordvec_pretrain_file):
+        """
+        Scoring the deprels of only the chosen heads should give the same predictions as scoring every pair
+        """
+        trainer = self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA)
+        pt = pretrain.Pretrain(wordvec_pretrain_file)
+        doc = CoNLL.conll2doc(input_str=TRAIN_DATA + DEV_DATA)
+        batch = DataLoader(doc, 5000, trainer.args, pt, vocab=trainer.vocab, evaluation=True, sort_during_eval=True)
+
+        results = []
+        for two_phase in (False, True):
+            trainer.args['two_phase_deprel'] = two_phase
+            results.append([pred for b in batch for pred in trainer.predict(b)])
+        assert results[0] == results[1]
+
+        assert 'two_phase_deprel' not in torch.load(str(tmp_path / "test_parser.pt"), lambda storage, loc: storage)['config']
+        pipe, expected = self.run_pipeline(tmp_path, wordvec_pretrain_file)
+        assert pipe.processors['depparse'].trainer.model.args.get('two_phase_deprel', True)
+        pipe, results = self.run_pipeline(tmp_path, wordvec_pretrain_file, depparse_two_phase_deprel=False)
+        assert pipe.processors['depparse'].trainer.model.args['two_phase_deprel'] is False
+        assert results == expected
+
+    def run_pipeline(self, tmp_path, wordvec_pretrain_file, **kwargs):
+        """
+        Parse DEV_DATA, with its gold tags, with a Pipeline built from the model trained by run_training
+        """
+        with open(tmp_path / "resources.json", "w", encoding="utf-8") as fout:
+            fout.write('{"en": {"default_processors": {}}}')
+        pipe = stanza.Pipeline("en", dir=str(tmp_path), processors="depparse", depparse_pretagged=True,
+                               depparse_model_path=str(tmp_path / "test_parser.pt"), depparse_pretrain_path=wordvec_pretrain_file,
+                               download_method=None, use_gpu=False, **kwargs)
+        doc = pipe(CoNLL.conll2doc(input_str=DEV_DATA))
+        return pipe, [(word.head, word.deprel) for sentence in doc.sentences for word in sentence.words]
+
+    def test_pipeline_mst_options(self, tmp_path, wordvec_pretrain_file):
+        """
+        greedy_mst and mst_threads come from the Pipeline, not from the saved model
+        """
+        self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA, extra_args=['--mst_threads', '2'])
+        config = torch.load(str(tmp_path / "test_parser.pt"), lambda storage, loc: storage)['config']
+        assert 'greedy_mst' not in config
+        assert 'mst_threads' not in config
+
+        pipe, expected = self.run_pipeline(tmp_path, wordvec_pretrain_file)
+        trainer = pipe.processors['depparse'].trainer
+        assert trainer.mst_executor() is None
+
+        pipe, results = self.run_pipeline(tmp_path, wordvec_pretrain_file, depparse_greedy_mst=False, depparse_mst_threads=2)
+        trainer = pipe.processors['depparse'].trainer
+        assert trainer.args['greedy_mst'] is False
+        assert trainer.mst_executor() is not None
+        assert results == expected
+
     def test_with_bert(self, tmp_path, wordvec_pretrain_file):
         self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA, extra_args=['--bert_model', 'hf-internal-testing/tiny-bert'])
 
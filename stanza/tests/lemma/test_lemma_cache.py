@@ -0,0 +1,84 @@
+"""
+Test the LRU & sqlite behavior of the lemma cache
+"""
+
+import pytest
+
+from stanza.models.lemma.cache import LemmaCache, model_file_id
+from stanza.resources import common
+
+pytestmark = [pytest.mark.pipeline, pytest.mark.travis]
+
+def test_lru():
+    cache = LemmaCache("model", max_size=2)
+    cache.update([("dogs", "NOUN", "dog"), ("ran", "VERB", "run")])
+    assert cache.lookup([("dogs", "NOUN"), ("dogs", "VERB")]) == ["dog", None]
+    # ran is now the least recently used, so it gets evicted
+    cache.update([("cats", "NOUN", "cat")])
+    assert len(cache) == 2
+    assert cache.lookup([("ran", "VERB"), ("dogs", "NOUN"), ("cats", "NOUN")]) == [None, "dog", "cat"]
+
+    stats = cache.stats()
+    assert stats['hits'] == 3
+    assert stats['misses'] == 2
+    assert stats['hit_rate'] == pytest.approx(0.6)
+    assert stats['size'] == 2
+
+def test_sqlite(tmp_path):
+    filename = str(tmp_path / "lemmas.db")
+    cache = LemmaCache("model", max_size=10, filename=filename)
+    cache.update([("dogs", "NOUN", "dog"), ("ran", "VERB", "run"), ("wug", None, "wug")])
+    cache.close()
+
+    # a new cache for the same model starts warm
+    cache = LemmaCache("model", max_size=10, filename=filename)
+    assert len(cache) == 3
+    assert cache.lookup([("dogs", "NOUN"), ("ran", "VERB"), ("wug", None)]) == ["dog", "run", "wug"]
+    cache.close()
+
+    # entries evicted from memory are still found in the file
+    cache = LemmaCache("model", max_size=1, filename=filename)
+    assert len(cache) == 1
+    assert cache.lookup([("dogs", "NOUN"), ("ran", "VERB")]) == ["dog", "run"]
+    assert cache.stats()['hits'] == 2
+    cache.close()
+
+    # a different model does not see those results
+    cache = LemmaCache("other_model", max_size=10, filename=filename)
+    assert len(cache) == 0
+    assert cache.lookup([("dogs", "NOUN")]) == [None]
+    cache.close()
+
+def test_model_file_id(tmp_path):
+    filename = tmp_path / "model.pt"
+    filename.write_bytes(b"model one")
+    first = model_file_id(str(filename))
+    assert first == model_file_id(str(filename))
+    filename.write_bytes(b"model two")
+    assert first != model_file_id(str(filename))
+
+def test_model_file_id_md5_cache(tmp_path, monkeypatch):
+    """
+    A model under the model dir is hashed once, with the md5 kept in the md5 cache of that dir
+    """
+    hashed = []
+    get_md5 = common.get_md5
+    monkeypatch.setattr(common, "get_md5", lambda path: hashed.append(path) or get_md5(path))
+
+    model_dir = tmp_path / "models"
+    filename = model_dir / "en" / "lemma" / "model.pt"
+    filename.parent.mkdir(parents=True)
+    filename.write_bytes(b"model one")
+    first = model_file_id(str(filename), str(model_dir))
+    assert first == model_file_id(str(filename))
+    assert first == model_file_id(str(filename), str(model_dir))
+    # once for the uncached call, once for the first call with the model dir
+    assert len(hashed) == 2
+    assert (model_dir / common.MD5_CACHE_FILENAME).exists()
+
+    # a model outside the model dir does not get an md5 cache
+    other = tmp_path / "other.pt"
+    other.write_bytes(b"model one")
+    assert model_file_id(str(other), str(model_dir)) == first
+    assert len(hashed) == 3
+    assert not (tmp_path / common.MD5_CACHE_FILENAME).exists()
@@ -5,6 +5,9 @@ import warnings
 import pytest
 import torch
 
+import stanza
+from stanza.models.ner import trainer as ner_trainer
+
 pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
 
 from stanza.models import ner_tagger
@@ -99,6 +102,34 @@ def test_train_model_cpu(pretrain_file, tmp_path):
     assert str(device).startswith("cpu")
 
 
+def test_pipeline_batch_viterbi(pretrain_file, tmp_path, monkeypatch):
+    """
+    ner_batch_viterbi in the Pipeline picks the decoder, and is not saved with the model
+    """
+    run_training(pretrain_file, tmp_path, "--cpu", "--lr_decay", "0")
+    model_file = str(tmp_path / "models" / "en_test_nertagger.pt")
+    assert 'batch_viterbi' not in torch.load(model_file, lambda storage, loc: storage)['config']
+    with open(tmp_path / "resources.json", "w", encoding="utf-8") as fout:
+        fout.write('{"en": {"default_processors": {}}}')
+
+    calls = []
+    decode_batch = ner_trainer.viterbi_decode_batch
+    decode = ner_trainer.viterbi_decode
+    monkeypatch.setattr(ner_trainer, "viterbi_decode_batch", lambda *args: calls.append("batch") or decode_batch(*args))
+    monkeypatch.setattr(ner_trainer, "viterbi_decode", lambda *args: calls.append("sentence") or decode(*args))
+
+    results = []
+    for batch_viterbi in (True, False):
+        pipe = stanza.Pipeline("en", dir=str(tmp_path), processors="tokenize,ner", tokenize_pretokenized=True,
+                               ner_model_path=model_file, ner_pretrain_path=pretrain_file, ner_batch_viterbi=batch_viterbi,
+                               download_method=None, use_gpu=False)
+        assert pipe.processors['ner'].trainers[0].args['batch_viterbi'] == batch_viterbi
+        calls.clear()
+        doc = pipe([["Chris", "Manning", "is", "a", "good", "man", "."], ["He", "works", "in", "Stanford", "."]])
+        results.append([token.ner for sentence in doc.sentences for token in sentence.tokens])
+        assert set(calls) == ({"batch"} if batch_viterbi else {"sentence"})
+    assert results[0] == results[1]
+
 def test_with_bert(pretrain_file, tmp_path):
     run_training(pretrain_file, tmp_path, '--bert_model', 'hf-internal-testing/tiny-bert')
 
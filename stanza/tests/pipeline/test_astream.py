@@ -0,0 +1,103 @@
+"""
+Test Pipeline.astream with a stand-in for the models
+
+The stand-in splits the text on whitespace, so no models are needed
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from stanza.models.common.doc import Document
+from stanza.pipeline.core import Pipeline
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+class WhitespacePipeline(Pipeline):
+    """
+    Skips loading any models and tokenizes on whitespace
+    """
+    def __init__(self):
+        self.async_executor = None
+        self.batches = []
+
+    def bulk_process(self, docs, processors=None):
+        self.batches.append(list(docs))
+        return [Document([[{'id': idx + 1, 'text': word} for idx, word in enumerate(doc.split())]], text=doc)
+                for doc in docs]
+
+def test_astream():
+    pipeline = WhitespacePipeline()
+    texts = ["text number %d" % idx for idx in range(7)]
+
+    async def run_astream():
+        return [doc async for doc in pipeline.astream(texts, batch_size=3)]
+    docs = asyncio.run(run_astream())
+    assert [doc.text for doc in docs] == texts
+    assert [len(batch) for batch in pipeline.batches] == [3, 3, 1]
+    assert [doc.sentences[0].sent_id for doc in docs] == [str(idx) for idx in range(7)]
+
+def test_astream_slow_source():
+    """
+    Finished batches are yielded without waiting for the source to produce the next batch
+    """
+    pipeline = WhitespacePipeline()
+
+    async def source():
+        for idx in range(6):
+            yield "text number %d" % idx
+            if idx == 1:
+                # the source stalls after the first batch
+                await asyncio.sleep(1.0)
+
+    async def run_astream():
+        start = time.monotonic()
+        times = []
+        async for doc in pipeline.astream(source(), batch_size=2):
+            times.append(time.monotonic() - start)
+        return times
+    times = asyncio.run(run_astream())
+    assert len(times) == 6
+    assert times[0] < 0.5
+    assert times[2] >= 1.0
+
+def test_astream_source_error():
+    """
+    An error in the source is raised after the batches read before it
+    """
+    pipeline = WhitespacePipeline()
+
+    async def source():
+        yield "first text"
+        yield "second text"
+        raise RuntimeError("source failed")
+
+    async def run_astream():
+        docs = []
+        with pytest.raises(RuntimeError):
+            async for doc in pipeline.astream(source(), batch_size=1):
+                docs.append(doc.text)
+        return docs
+    assert asyncio.run(run_astream()) == ["first text", "second text"]
+
+def test_astream_stop_early():
+    """
+    A consumer which stops early does not leave the source being read
+    """
+    pipeline = WhitespacePipeline()
+    read = []
+
+    def source():
+        for idx in range(100):
+            read.append(idx)
+            yield "text number %d" % idx
+
+    async def run_astream():
+        stream = pipeline.astream(source(), batch_size=2, max_pending_batches=2)
+        async for doc in stream:
+            break
+        await stream.aclose()
+    asyncio.run(run_astream())
+    # the first batch, plus at most two read ahead
+    assert len(read) <= 6
@@ -0,0 +1,166 @@
+"""
+Test the micro-batching server with a stand-in for the Pipeline
+
+The stand-in splits the text on whitespace, so no models are needed
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from stanza.models.common.doc import Document
+from stanza.pipeline.batch_server import BatchServer, Histogram, MicroBatcher, RequestTimeoutError, ServerBusyError
+
+from stanza.tests import *
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+class WhitespacePipeline:
+    """
+    Tokenizes on whitespace and records the size of each batch
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def bulk_process(self, docs):
+        self.batches.append([doc.text for doc in docs])
+        time.sleep(self.delay)
+        return [Document([[{'id': idx + 1, 'text': word} for idx, word in enumerate(doc.text.split())]], text=doc.text)
+                for doc in docs]
+
+def test_histogram():
+    histogram = Histogram((1, 2, 4))
+    for value in (1, 1, 2, 3, 10):
+        histogram.record(value)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.mean == 3.4
+    assert histogram.percentile(50) == 2
+    assert histogram.percentile(100) == 10
+    result = histogram.to_dict()
+    assert result['count'] == 5
+    assert result['buckets'] == {"<=1": 2, "<=2": 1, "<=4": 1, ">4": 1}
+
+def test_merge_requests():
+    """
+    Requests submitted together go through one bulk_process call and come back to the right caller
+    """
+    pipeline = WhitespacePipeline()
+    texts = ["sentence number %d" % idx for idx in range(10)]
+    with MicroBatcher(pipeline, max_wait=0.5) as batcher:
+        futures = [batcher.submit(text) for text in texts]
+        results = [future.result(timeout=5) for future in futures]
+    assert len(pipeline.batches) == 1
+    for text, doc in zip(texts, results):
+        assert doc.text == text
+        assert [word.text for word in doc.sentences[0].words] == text.split()
+    stats = batcher.stats()
+    assert stats['requests'] == 10
+    assert stats['batch_size']['count'] == 1
+    assert stats['batch_size']['max'] == 10
+
+def test_token_budget():
+    """
+    Batches stop growing at the token budget, but an oversized request still gets processed
+    """
+    pipeline = WhitespacePipeline()
+    texts = ["a b c"] * 5 + [" ".join(["x"] * 20)]
+    with MicroBatcher(pipeline, token_budget=7, max_wait=0.5) as batcher:
+        futures = [batcher.submit(text) for text in texts]
+        for future in futures:
+            future.result(timeout=5)
+    assert [len(batch) for batch in pipeline.batches] == [2, 2, 1, 1]
+
+def test_timeout():
+    """
+    A request which times out while waiting in the queue is never processed
+    """
+    pipeline = WhitespacePipeline(delay=0.5)
+    with MicroBatcher(pipeline, max_wait=0.0) as batcher:
+        first = batcher.submit("slow request")
+        # give the worker time to start on the first request
+        time.sleep(0.1)
+        with pytest.raises(RequestTimeoutError):
+            batcher.annotate("late request", timeout=0.1)
+        assert first.result(timeout=5).text == "slow request"
+        time.sleep(0.1)
+    assert pipeline.batches == [["slow request"]]
+    assert batcher.stats()['timeouts'] == 1
+
+class FailingPipeline(WhitespacePipeline):
+    """
+    Fails any batch which contains the text "bad"
+    """
+    def bulk_process(self, docs):
+        if any(doc.text == "bad" for doc in docs):
+            self.batches.append([doc.text for doc in docs])
+            raise ValueError("Cannot process bad")
+        return super().bulk_process(docs)
+
+def test_failed_request():
+    """
+    A request which breaks bulk_process fails on its own, not along with the rest of its batch
+    """
+    pipeline = FailingPipeline()
+    texts = ["first request", "bad", "third request"]
+    with MicroBatcher(pipeline, max_wait=0.5) as batcher:
+        futures = [batcher.submit(text) for text in texts]
+        assert futures[0].result(timeout=5).text == "first request"
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=5)
+        assert futures[2].result(timeout=5).text == "third request"
+    assert pipeline.batches == [texts, ["first request"], ["bad"], ["third request"]]
+    assert batcher.stats()['errors'] == 1
+
+def test_queue_full():
+    pipeline = WhitespacePipeline()
+    batcher = MicroBatcher(pipeline, max_queue_size=1)
+    # the worker is not started, so nothing leaves the queue
+    batcher.submit("first")
+    with pytest.raises(ServerBusyError):
+        batcher.submit("second")
+    assert batcher.stats()['rejected'] == 1
+
+def test_http_server():
+    pipeline = WhitespacePipeline()
+    with MicroBatcher(pipeline, max_wait=0.2) as batcher:
+        server = BatchServer(("localhost", 0), batcher)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://localhost:%d" % server.server_address[1]
+
+            results = [None] * 4
+            def post(idx):
+                request = urllib.request.Request(url + "/annotate", data=("request %d" % idx).encode("utf-8"))
+                with urllib.request.urlopen(request) as response:
+                    results[idx] = json.loads(response.read().decode("utf-8"))
+            threads = [threading.Thread(target=post, args=(idx,)) for idx in range(4)]
+            for post_thread in threads:
+                post_thread.start()
+            for post_thread in threads:
+                post_thread.join()
+            for idx, result in enumerate(results):
+                assert [word['text'] for word in result[0]] == ["request", str(idx)]
+
+            request = urllib.request.Request(url + "/annotate", data=json.dumps({"text": "json request"}).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                result = json.loads(response.read().decode("utf-8"))
+            assert [word['text'] for word in result[0]] == ["json", "request"]
+
+            with urllib.request.urlopen(url + "/stats") as response:
+                stats = json.loads(response.read().decode("utf-8"))
+            assert stats['requests'] == 5
+            assert stats['queue_latency']['count'] == 5
+
+            with pytest.raises(urllib.error.HTTPError) as excinfo:
+                urllib.request.urlopen(url + "/unknown")
+            assert excinfo.value.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
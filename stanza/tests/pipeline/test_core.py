@@ -31,7 +31,7 @@ def test_download_missing_ner_model():
         stanza.download("en", model_dir=test_dir, processors="tokenize", package="combined", verbose=False)
         pipe = stanza.Pipeline("en", model_dir=test_dir, processors="tokenize,ner", package={"ner": ("ontonotes")})
 
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         en_dir = os.path.join(test_dir, 'en')
         en_dir_listing = sorted(os.listdir(en_dir))
         assert en_dir_listing == ['backward_charlm', 'forward_charlm', 'ner', 'pretrain', 'tokenize']
@@ -45,7 +45,7 @@ def test_download_missing_resources():
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
         pipe = stanza.Pipeline("en", model_dir=test_dir, processors="tokenize,ner", package={"tokenize": "combined", "ner": "ontonotes"})
 
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         en_dir = os.path.join(test_dir, 'en')
         en_dir_listing = sorted(os.listdir(en_dir))
         assert en_dir_listing == ['backward_charlm', 'forward_charlm', 'ner', 'pretrain', 'tokenize']
@@ -59,7 +59,7 @@ def test_download_resources_overwrites():
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
         pipe = stanza.Pipeline("en", model_dir=test_dir, processors="tokenize", package={"tokenize": "combined"})
 
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         resources_path = os.path.join(test_dir, 'resources.json')
         mod_time = os.path.getmtime(resources_path)
 
@@ -78,7 +78,7 @@ def test_reuse_resources_overwrites():
                                processors="tokenize",
                                package={"tokenize": "combined"})
 
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         resources_path = os.path.join(test_dir, 'resources.json')
         mod_time = os.path.getmtime(resources_path)
 
@@ -98,7 +98,7 @@ def test_download_not_repeated():
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
         stanza.download("en", model_dir=test_dir, processors="tokenize", package="combined")
 
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         en_dir = os.path.join(test_dir, 'en')
         en_dir_listing = sorted(os.listdir(en_dir))
         assert en_dir_listing == ['tokenize']
@@ -145,7 +145,7 @@ def check_download_method_updates(download_method):
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
         stanza.download("en", model_dir=test_dir, processors="tokenize", package="combined")
 
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         en_dir = os.path.join(test_dir, 'en')
         en_dir_listing = sorted(os.listdir(en_dir))
         assert en_dir_listing == ['tokenize']
@@ -172,6 +172,13 @@ def test_download_strings():
     for download_method in ("reuse_resources", "download_resources"):
         check_download_method_updates(download_method)
 
+def test_unknown_quantize():
+    """
+    An unknown quantize option fails before any models are loaded
+    """
+    with pytest.raises(ValueError):
+        stanza.Pipeline("en", dir=TEST_MODELS_DIR, processors="tokenize", quantize="int3", download_method=None)
+
 def test_limited_pipeline():
     """
     Test loading a pipeline, but then only using a couple processors
@@ -246,3 +253,31 @@ def test_unknown_language_mwt(unknown_language_name):
                          tokenize_model_path=tokenize_processor.config['model_path'],
                          mwt_model_path=mwt_processor.config['model_path'],
                          download_method=None)
+
+def test_find_edited_paragraphs():
+    old = "First paragraph.\n\nSecond paragraph.\n\nThird paragraph."
+    new = "First paragraph.\n\nSecond edited paragraph.\n\nThird paragraph."
+    start, old_end, new_end = core.find_edited_paragraphs(old, new)
+    assert old[start:old_end] == "Second paragraph."
+    assert new[start:new_end] == "Second edited paragraph."
+
+    # an edit at the very start touches only the first paragraph
+    start, old_end, new_end = core.find_edited_paragraphs(old, "The " + old)
+    assert start == 0
+    assert old[start:old_end] == "First paragraph."
+
+def test_reprocess():
+    """
+    Reprocessing an edited document should give the same result as processing the new text from scratch
+    """
+    nlp = stanza.Pipeline(lang='en', dir=TEST_MODELS_DIR, processors="tokenize,pos")
+    old = "Barack Obama was born in Hawaii.  He was elected president in 2008.\n\nObama attended Harvard.\n\nThe dog did not seem to notice."
+    new = "Barack Obama was born in Hawaii.  He was elected president in 2008.\n\nObama attended Harvard.  He later taught law.\n\nThe dog did not seem to notice."
+    doc = nlp.reprocess(nlp(old), new)
+    expected = nlp(new)
+    assert doc.text == new
+    assert len(doc.sentences) == len(expected.sentences)
+    for sentence, expected_sentence in zip(doc.sentences, expected.sentences):
+        assert sentence.index == expected_sentence.index
+        assert [(t.text, t.start_char, t.end_char) for t in sentence.tokens] == [(t.text, t.start_char, t.end_char) for t in expected_sentence.tokens]
+        assert [w.upos for w in sentence.words] == [w.upos for w in expected_sentence.words]
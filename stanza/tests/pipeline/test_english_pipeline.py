@@ -2,10 +2,13 @@
 Basic testing of the English pipeline
 """
 
+import asyncio
+
 import pytest
 import stanza
 from stanza.utils.conll import CoNLL
 from stanza.models.common.doc import Document
+from stanza.pipeline.registry import PIPELINE_NAMES
 
 from stanza.tests import *
 from stanza.tests.pipeline.pipeline_device_tests import check_on_gpu, check_on_cpu
@@ -223,6 +226,58 @@ class TestEnglishPipeline:
         processed = ["{:C}".format(doc) for doc in processed]
         assert "\n\n".join(processed) == EN_DOC_CONLLU_GOLD_MULTIDOC
 
+    def test_stream_workers(self, pipeline):
+        """ Test that forked workers give the same results, in the same order, as the single process stream """
+        if pipeline.device != 'cpu':
+            pytest.skip("stream workers are only supported on cpu")
+        processed = [doc for doc in pipeline.stream(EN_DOCS, batch_size=1, num_workers=2)]
+        processed = ["{:C}".format(doc) for doc in processed]
+        assert "\n\n".join(processed) == EN_DOC_CONLLU_GOLD_MULTIDOC
+
+        sentences = [sent for doc in pipeline.stream(EN_DOCS * 3, batch_size=2, num_workers=2) for sent in doc.sentences]
+        for sent_idx, sentence in enumerate(sentences):
+            assert sent_idx == sentence.index
+
+    def test_stream_pipelined(self, pipeline):
+        """ Test that running the processors as separate stages gives the same results """
+        processed = [doc for doc in pipeline.stream(EN_DOCS, batch_size=1, pipelined=True)]
+        processed = ["{:C}".format(doc) for doc in processed]
+        assert "\n\n".join(processed) == EN_DOC_CONLLU_GOLD_MULTIDOC
+
+        assert [stats.name for stats in pipeline.stage_stats] == [x for x in PIPELINE_NAMES if x in pipeline.processors]
+        for stats in pipeline.stage_stats:
+            assert stats.batches == len(EN_DOCS)
+
+    def test_async(self, pipeline):
+        """ Test aprocess and astream give the same results as the blocking methods """
+        async def run_aprocess():
+            return await pipeline.aprocess(EN_DOC)
+        doc = asyncio.run(run_aprocess())
+        assert "{:C}".format(doc) == EN_DOC_CONLLU_GOLD
+
+        read = []
+        async def source():
+            for doc in EN_DOCS * 4:
+                read.append(doc)
+                yield doc
+
+        async def run_astream():
+            processed = []
+            async for doc in pipeline.astream(source(), batch_size=1, max_pending_batches=2):
+                # the stream only reads a couple batches ahead of the consumer
+                assert len(read) <= len(processed) + 3
+                processed.append(doc)
+            return processed
+        processed = asyncio.run(run_astream())
+        processed = ["{:C}".format(doc) for doc in processed]
+        assert "\n\n".join(processed[:len(EN_DOCS)]) == EN_DOC_CONLLU_GOLD_MULTIDOC
+        assert len(processed) == len(EN_DOCS) * 4
+
+        async def run_astream_list():
+            return [doc async for doc in pipeline.astream(EN_DOCS)]
+        processed = asyncio.run(run_astream_list())
+        assert "\n\n".join(["{:C}".format(doc) for doc in processed]) == EN_DOC_CONLLU_GOLD_MULTIDOC
+
     @pytest.fixture(scope="class")
     def processed_multidoc(self, pipeline):
         """ Document created by running full English pipeline on a few sentences """
@@ -0,0 +1,160 @@
+"""
+Test that the transformer and charlm caches are shared between the stages of a pipelined stream
+
+The processors are stand-ins which only ask for transformer and
+charlm results, and the transformer and charlm themselves are
+replaced with counters, so no models are needed
+"""
+
+import collections
+
+import pytest
+import torch
+
+from stanza.models.common import bert_embedding
+from stanza.models.common.bert_embedding import extract_bert_embeddings
+from stanza.models.common.char_model import CharacterLanguageModel
+from stanza.models.common.doc import Document
+from stanza.pipeline.core import Pipeline
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+class CountingCharlm:
+    """
+    Uses the caching of a real charlm, but only counts the sentences it is run on
+    """
+    is_forward_lm = True
+    build_char_representation = CharacterLanguageModel.build_char_representation
+
+    def __init__(self):
+        self.sentences_run = 0
+
+    def uncached_char_representation(self, sentences):
+        self.sentences_run += len(sentences)
+        return [torch.zeros(len(words), 3) for words in sentences]
+
+class StandInProcessor:
+    """
+    Asks for the transformer features and charlm representations of each sentence, like the tagger or parser would
+    """
+    def __init__(self, transformer, charlm):
+        self.transformer = transformer
+        self.charlm = charlm
+
+    def bulk_process(self, docs):
+        sentences = [[word.text for word in sentence.words] for doc in docs for sentence in doc.sentences]
+        extract_bert_embeddings("stand-in", None, self.transformer, sentences, "cpu", keep_endpoints=False, num_layers=None)
+        self.charlm.build_char_representation(sentences)
+        return docs
+
+    def inference_cache_users(self):
+        return collections.Counter([id(self.transformer)]), collections.Counter([id(self.charlm)])
+
+class StandInPipeline(Pipeline):
+    """
+    Skips loading any models and runs the stand-in processors
+    """
+    def __init__(self, cache_bert_embeddings=True, cache_charlm=True, names=("pos", "depparse", "sentiment")):
+        self.transformer = object()
+        self.charlm = CountingCharlm()
+        self.processors = {name: StandInProcessor(self.transformer, self.charlm) for name in names}
+        self.cache_bert_embeddings = cache_bert_embeddings
+        self.cache_charlm = cache_charlm
+        self.stage_stats = []
+
+@pytest.fixture
+def transformer_sentences(monkeypatch):
+    """
+    Replaces the transformer with a counter of the sentences it is run on
+    """
+    sentences_run = []
+    def uncached_embeddings(model_name, tokenizer, model, data, device, keep_endpoints, num_layers=None, detach=True):
+        sentences_run.extend(data)
+        return [torch.zeros(len(words) + 2, 5, 4 if num_layers is None else num_layers) for words in data]
+    monkeypatch.setattr(bert_embedding, "extract_uncached_embeddings", uncached_embeddings)
+    return sentences_run
+
+def build_docs(num_docs):
+    return [Document([[{'id': 1, 'text': 'Document'}, {'id': 2, 'text': str(idx)}]], text='Document %d' % idx)
+            for idx in range(num_docs)]
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_stream_shares_caches(transformer_sentences, pipelined):
+    """
+    Each sentence goes through the transformer and charlm once, not once per processor
+    """
+    pipeline = StandInPipeline()
+    docs = list(pipeline.stream(build_docs(7), batch_size=3, pipelined=pipelined))
+    assert len(docs) == 7
+    assert len(transformer_sentences) == 7
+    assert pipeline.charlm.sentences_run == 7
+    if pipelined:
+        assert [stats.batches for stats in pipeline.stage_stats] == [3, 3, 3]
+
+def test_pipelined_stream_without_caches(transformer_sentences):
+    pipeline = StandInPipeline(cache_bert_embeddings=False, cache_charlm=False)
+    docs = list(pipeline.stream(build_docs(7), batch_size=3, pipelined=True))
+    assert len(docs) == 7
+    assert len(transformer_sentences) == 21
+    assert pipeline.charlm.sentences_run == 21
+
+def test_single_user_no_cache(transformer_sentences):
+    """
+    With only one processor using the transformer and charlm, nothing stored would be read back, so there are no caches
+    """
+    pipeline = StandInPipeline(names=("pos",))
+    assert pipeline._new_inference_caches(["pos"]) == (None, None)
+    docs = list(pipeline.stream(build_docs(7), batch_size=3, pipelined=True))
+    assert len(docs) == 7
+    assert len(transformer_sentences) == 7
+    assert pipeline.charlm.sentences_run == 7
+
+def test_cache_dropped_after_last_user(transformer_sentences):
+    """
+    The entries of a transformer or charlm are dropped once the last processor using it is done
+    """
+    pipeline = StandInPipeline()
+    names = ["pos", "depparse", "sentiment"]
+    caches = pipeline._new_inference_caches(names)
+    docs = build_docs(3)
+    sizes = []
+    for idx, name in enumerate(names):
+        with pipeline._inference_caches(caches, names, idx):
+            pipeline.processors[name].bulk_process(docs)
+        sizes.append((len(caches[0]), len(caches[1])))
+    assert sizes == [(3, 3), (3, 3), (0, 0)]
+    assert len(transformer_sentences) == 3
+    assert pipeline.charlm.sentences_run == 3
+
+def test_cache_token_limit(transformer_sentences):
+    """
+    Sentences past the token limit are not stored, so later processors run the transformer and charlm on them again
+    """
+    pipeline = StandInPipeline()
+    names = ["pos", "depparse", "sentiment"]
+    caches = pipeline._new_inference_caches(names)
+    # each sentence is two words long
+    caches[0].max_tokens = 4
+    caches[1].max_tokens = 4
+    docs = build_docs(3)
+    for idx, name in enumerate(names):
+        with pipeline._inference_caches(caches, names, idx):
+            pipeline.processors[name].bulk_process(docs)
+            assert caches[0].num_tokens <= 4
+            assert caches[1].num_tokens <= 4
+    assert len(transformer_sentences) == 5
+    assert pipeline.charlm.sentences_run == 5
+
+def test_pipelined_stream_extra_args(transformer_sentences):
+    """
+    Arguments other than processors are refused rather than silently dropped
+    """
+    pipeline = StandInPipeline()
+    docs = list(pipeline.stream(build_docs(2), 3, "pos,depparse", pipelined=True))
+    assert [stats.name for stats in pipeline.stage_stats] == ["pos", "depparse"]
+    docs = list(pipeline.stream(build_docs(2), 3, processors="pos", pipelined=True))
+    assert [stats.name for stats in pipeline.stage_stats] == ["pos"]
+    with pytest.raises(ValueError):
+        list(pipeline.stream(build_docs(2), 3, "pos", "extra", pipelined=True))
+    with pytest.raises(ValueError):
+        list(pipeline.stream(build_docs(2), 3, processors="pos", unknown=True, pipelined=True))
@@ -0,0 +1,53 @@
+"""
+Test that the processors are registered lazily
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+from stanza.pipeline._constants import *
+from stanza.pipeline.processor import ProcessorVariant
+from stanza.pipeline.registry import NAME_TO_PROCESSOR_CLASS, PIPELINE_NAMES, PROCESSOR_MODULES, PROCESSOR_VARIANTS, get_processor_class, get_processor_variant
+
+pytestmark = [pytest.mark.travis, pytest.mark.pipeline]
+
+def test_import_stanza_is_lazy():
+    """
+    Importing stanza does not import any of the processors, their models, or the external tokenizers
+    """
+    code = ("import sys; import stanza; "
+            "print(','.join(sorted(x for x in sys.modules if x.startswith('stanza.pipeline.') or x.startswith('stanza.server') or x.startswith('stanza.models.pos'))))")
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    modules = set(result.stdout.strip().split(","))
+    for module in PROCESSOR_MODULES.values():
+        assert module not in modules
+    assert not any(x.startswith('stanza.pipeline.external') for x in modules)
+    assert not any(x.startswith('stanza.server') for x in modules)
+    assert not any(x.startswith('stanza.models.pos') for x in modules)
+
+def test_pipeline_order():
+    """
+    The built in processors are in the right order even before they are imported
+    """
+    assert PIPELINE_NAMES[:9] == [LANGID, TOKENIZE, MWT, POS, LEMMA, CONSTITUENCY, DEPPARSE, SENTIMENT, NER]
+    assert len(set(PIPELINE_NAMES)) == len(PIPELINE_NAMES)
+
+def test_get_processor_class():
+    cls = get_processor_class(POS)
+    assert cls.__name__ == "POSProcessor"
+    assert NAME_TO_PROCESSOR_CLASS[POS] is cls
+    # importing the module does not add pos to the pipeline a second time
+    assert PIPELINE_NAMES.count(POS) == 1
+
+    with pytest.raises(KeyError):
+        get_processor_class("unknown_processor")
+
+def test_get_processor_variant():
+    assert 'spacy' in PROCESSOR_VARIANTS[TOKENIZE]
+    assert 'converter' in PROCESSOR_VARIANTS[DEPPARSE]
+    cls = get_processor_variant(TOKENIZE, 'spacy')
+    assert cls.__name__ == "SpacyTokenizer"
+    assert issubclass(cls, ProcessorVariant)
+    assert PROCESSOR_VARIANTS[TOKENIZE]['spacy'] is cls
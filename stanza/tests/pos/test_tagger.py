@@ -6,11 +6,20 @@ Uses a couple sentences of UD_English-EWT as training/dev data
 
 import os
 import pytest
+import torch
+
+import stanza
 
 from stanza.models import tagger
-from stanza.models.common import pretrain
+from stanza.models.common import convert_checkpoints, pretrain, tensor_archive
+from stanza.models.common.checkpoint import ASSIGN_SUPPORTED
+from stanza.models.common.char_model import DEFAULT_CHAR_CACHE_SIZE
+from stanza.models.common.quantize import quantize_model
+from stanza.models.pos.data import DataLoader
 from stanza.models.pos.trainer import Trainer
 from stanza.tests import TEST_WORKING_DIR, TEST_MODELS_DIR
+from stanza.tests.common.test_checkpoint import is_mapped, mapped_ranges
+from stanza.utils.conll import CoNLL
 from stanza.utils.training.common import choose_pos_charlm, build_charlm_args
 
 pytestmark = [pytest.mark.pipeline, pytest.mark.travis]
@@ -229,3 +238,71 @@ class TestTagger:
     def test_with_bert_nlayers(self, tmp_path, wordvec_pretrain_file):
         self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA, extra_args=['--bert_model', 'hf-internal-testing/tiny-bert', '--bert_hidden_layers', '2'])
 
+
+    def test_tensor_archive(self, tmp_path, wordvec_pretrain_file):
+        """
+        A tagger converted to a tensor archive loads the same model as the .pt
+        """
+        trainer = self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA)
+        save_file = str(tmp_path / "test_tagger.pt")
+        assert convert_checkpoints.convert_checkpoint(save_file, verify=True) == "converted"
+        assert os.path.exists(str(tmp_path / "test_tagger.tensors"))
+        assert convert_checkpoints.convert_checkpoint(save_file) == "up to date"
+
+        pt = pretrain.Pretrain(wordvec_pretrain_file)
+        archive_trainer = Trainer(pretrain=pt, model_file=save_file)
+        assert archive_trainer.args == trainer.args
+        assert archive_trainer.vocab.state_dict() == trainer.vocab.state_dict()
+        state = trainer.model.state_dict()
+        archive_state = archive_trainer.model.state_dict()
+        assert state.keys() == archive_state.keys()
+        for key in state:
+            assert torch.equal(state[key], archive_state[key])
+
+        if ASSIGN_SUPPORTED:
+            # the saved weights are used straight from the mapped archive.
+            # the pretrained embedding is not saved with the model
+            archive_file = str(tmp_path / "test_tagger.tensors")
+            saved = tensor_archive.load_tensor_archive(archive_file)['model']
+            ranges = mapped_ranges(archive_file)
+            params = dict(archive_trainer.model.named_parameters())
+            assert any(name in saved for name in params)
+            for name, param in params.items():
+                if name in saved:
+                    assert is_mapped(param, ranges), "%s was copied out of the archive" % name
+
+    def test_pipeline_char_cache_size(self, tmp_path, wordvec_pretrain_file):
+        """
+        char_cache_size comes from the Pipeline, not from the saved model
+        """
+        self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA, extra_args=['--char_cache_size', '7'])
+        save_file = str(tmp_path / "test_tagger.pt")
+        assert 'char_cache_size' not in torch.load(save_file, lambda storage, loc: storage)['config']
+        with open(tmp_path / "resources.json", "w", encoding="utf-8") as fout:
+            fout.write('{"en": {"default_processors": {}}}')
+
+        for cache_size, expected in ((None, DEFAULT_CHAR_CACHE_SIZE), (0, 0), (100, 100)):
+            kwargs = {} if cache_size is None else {'pos_char_cache_size': cache_size}
+            pipe = stanza.Pipeline("en", dir=str(tmp_path), processors="tokenize,pos", tokenize_pretokenized=True,
+                                   pos_model_path=save_file, pos_pretrain_path=wordvec_pretrain_file,
+                                   download_method=None, use_gpu=False, **kwargs)
+            charmodel = pipe.processors['pos'].trainer.model.charmodel
+            assert charmodel.word_cache_size == expected
+            pipe([["This", "is", "a", "test", "."]])
+            assert len(charmodel.word_cache) == min(expected, 5)
+
+    def test_quantize(self, tmp_path, wordvec_pretrain_file):
+        """
+        A quantized tagger tags the dev data the same way as the original
+        """
+        trainer = self.run_training(tmp_path, wordvec_pretrain_file, TRAIN_DATA, DEV_DATA)
+        pt = pretrain.Pretrain(wordvec_pretrain_file)
+        doc = CoNLL.conll2doc(input_str=DEV_DATA)
+        batch = DataLoader(doc, 100, trainer.args, pt, vocab=trainer.vocab, evaluation=True)
+
+        with torch.no_grad():
+            expected = [trainer.predict(b) for b in batch]
+            assert quantize_model(trainer.model, "int8") > 0
+            assert type(trainer.model.upos_clf) is not torch.nn.Linear
+            predictions = [trainer.predict(b) for b in batch]
+        assert predictions == expected
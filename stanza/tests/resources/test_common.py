@@ -8,7 +8,7 @@ import tempfile
 
 import stanza
 from stanza.resources import common
-from stanza.tests import TEST_MODELS_DIR, TEST_WORKING_DIR
+from stanza.tests import TEST_MODELS_DIR, TEST_WORKING_DIR, list_model_dir
 
 pytestmark = [pytest.mark.travis, pytest.mark.client]
 
@@ -33,6 +33,60 @@ def test_assert_file_exists():
 
         common.assert_file_exists(filename, md5="12345", alternate_md5=EXPECTED_MD5)
 
+def test_get_md5_chunks():
+    """
+    Hashing in small chunks gives the same md5 as hashing the whole file
+    """
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        filename = os.path.join(test_dir, "test.txt")
+        with open(filename, "w", encoding="utf-8") as fout:
+            fout.write("Unban mox opal!")
+        assert common.get_md5(filename) == "44dbf21b4e89cea5184615a72a825a36"
+        assert common.get_md5(filename, chunk_size=4) == "44dbf21b4e89cea5184615a72a825a36"
+
+def test_md5_cache(monkeypatch):
+    """
+    An unchanged file is not hashed again, but a file which changed is
+    """
+    with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
+        md5_cache = os.path.join(test_dir, common.MD5_CACHE_FILENAME)
+        os.makedirs(os.path.join(test_dir, "en", "tokenize"))
+        filename = os.path.join(test_dir, "en", "tokenize", "test.pt")
+        with open(filename, "w", encoding="utf-8") as fout:
+            fout.write("Unban mox opal!")
+
+        hashed = []
+        get_md5 = common.get_md5
+        def counting_md5(path):
+            hashed.append(path)
+            return get_md5(path)
+        monkeypatch.setattr(common, "get_md5", counting_md5)
+
+        assert common.file_exists(filename, "44dbf21b4e89cea5184615a72a825a36", md5_cache)
+        assert len(hashed) == 1
+        assert sorted(os.listdir(test_dir)) == sorted(["en", common.MD5_CACHE_FILENAME])
+        assert list(common.read_md5_cache(md5_cache).keys()) == [os.path.join("en", "tokenize", "test.pt")]
+
+        assert common.file_exists(filename, "44dbf21b4e89cea5184615a72a825a36", md5_cache)
+        common.assert_file_exists(filename, md5="44dbf21b4e89cea5184615a72a825a36", md5_cache=md5_cache)
+        assert len(hashed) == 1
+
+        # same length, different text
+        with open(filename, "w", encoding="utf-8") as fout:
+            fout.write("Unban mox opal?")
+        assert not common.file_exists(filename, "44dbf21b4e89cea5184615a72a825a36", md5_cache)
+        assert len(hashed) == 2
+        with pytest.raises(ValueError):
+            common.assert_file_exists(filename, md5="44dbf21b4e89cea5184615a72a825a36", md5_cache=md5_cache)
+        assert len(hashed) == 2
+
+        # a corrupted cache is rebuilt
+        with open(md5_cache, "w", encoding="utf-8") as fout:
+            fout.write("{")
+        assert not common.file_exists(filename, "44dbf21b4e89cea5184615a72a825a36", md5_cache)
+        assert len(hashed) == 3
+        assert common.file_exists(filename, common.read_md5_cache(md5_cache)[os.path.join("en", "tokenize", "test.pt")]["md5"], md5_cache)
+        assert len(hashed) == 3
 
 def test_download_tokenize_mwt():
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
@@ -51,7 +105,7 @@ def test_download_non_default():
     """
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
         stanza.download("en", model_dir=test_dir, processors="ner", package="ontonotes", verbose=False)
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         en_dir = os.path.join(test_dir, 'en')
         en_dir_listing = sorted(os.listdir(en_dir))
         assert en_dir_listing == ['backward_charlm', 'forward_charlm', 'ner', 'pretrain']
@@ -75,7 +129,7 @@ def test_download_two_models():
     """
     with tempfile.TemporaryDirectory(dir=TEST_WORKING_DIR) as test_dir:
         stanza.download("en", model_dir=test_dir, processors="ner", package={"ner": ["ontonotes", "anatem"]}, verbose=False)
-        assert sorted(os.listdir(test_dir)) == ['en', 'resources.json']
+        assert list_model_dir(test_dir) == ['en', 'resources.json']
         en_dir = os.path.join(test_dir, 'en')
         en_dir_listing = sorted(os.listdir(en_dir))
         assert en_dir_listing == ['backward_charlm', 'forward_charlm', 'ner', 'pretrain']
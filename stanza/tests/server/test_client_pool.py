@@ -0,0 +1,185 @@
+"""
+Test the connection pooling and annotate_many of CoreNLPClient
+
+Uses a small HTTP server standing in for CoreNLP, so Java is not needed.
+The stand-in splits the text on whitespace and returns it in the json
+output format.
+"""
+
+import ast
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from stanza.server import AnnotationException, CoreNLPClient, StartServer
+from stanza.server.client import RetryableAnnotationException
+
+pytestmark = [pytest.mark.travis, pytest.mark.client]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that the connections can be kept alive
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, status, body, content_type="application/json"):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_body(200, "pong", "text/plain")
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        text = self.rfile.read(length).decode("utf-8")
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.requests += 1
+            status = server.statuses.pop(0) if server.statuses else 200
+        if status != 200:
+            self.send_body(status, "Failed with %d" % status, "text/plain")
+            return
+
+        params = parse_qs(urlparse(self.path).query)
+        properties = ast.literal_eval(params['properties'][0])
+        assert properties['outputFormat'] == 'json'
+        result = {"sentences": [{"index": 0, "tokens": [{"index": idx + 1, "word": word} for idx, word in enumerate(text.split())]}]}
+        self.send_body(200, json.dumps(result))
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, statuses=None):
+        super().__init__(("localhost", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.requests = 0
+        # the responses to give to the first requests.  200 after these run out
+        self.statuses = list(statuses) if statuses else []
+
+@pytest.fixture
+def stand_in():
+    servers = []
+    def start(statuses=None):
+        server = StandInServer(statuses)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        client = CoreNLPClient(start_server=StartServer.DONT_START, endpoint="http://localhost:%d" % server.server_address[1],
+                               output_format="json", pool_size=4)
+        return server, client
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def words(result):
+    return [token['word'] for sentence in result['sentences'] for token in sentence['tokens']]
+
+def test_keep_alive(stand_in):
+    """
+    Sequential requests reuse the same connection
+    """
+    server, client = stand_in()
+    for idx in range(5):
+        assert words(client.annotate("text number %d" % idx)) == ["text", "number", str(idx)]
+    assert server.requests == 5
+    assert len(server.connections) == 1
+
+def test_annotate_many(stand_in):
+    """
+    annotate_many returns the results in the order of the input, using at most pool_size connections
+    """
+    server, client = stand_in()
+    texts = ["text number %d" % idx for idx in range(40)]
+    results = client.annotate_many(texts)
+    assert [words(result) for result in results] == [text.split() for text in texts]
+    assert server.requests == 40
+    assert 1 <= len(server.connections) <= 4
+
+    assert client.annotate_many([]) == []
+
+def test_annotate_many_retry(stand_in):
+    """
+    Requests which fail with a busy server are sent again
+    """
+    server, client = stand_in(statuses=[503, 503, 429])
+    texts = ["text number %d" % idx for idx in range(5)]
+    results = client.annotate_many(texts, max_concurrency=2, retry_delay=0.01)
+    assert [words(result) for result in results] == [text.split() for text in texts]
+    assert server.requests == 8
+
+def test_annotate_many_give_up(stand_in):
+    """
+    After max_retries, the retryable failure is raised.  Other failures are not retried
+    """
+    server, client = stand_in(statuses=[503] * 3)
+    with pytest.raises(RetryableAnnotationException):
+        client.annotate_many(["some text"], max_retries=2, retry_delay=0.01)
+    assert server.requests == 3
+
+    server, client = stand_in(statuses=[500])
+    with pytest.raises(AnnotationException) as excinfo:
+        client.annotate_many(["some text"], retry_delay=0.01)
+    assert not isinstance(excinfo.value, RetryableAnnotationException)
+    assert server.requests == 1
+
+def test_annotate_many_checks_once(stand_in, monkeypatch):
+    """
+    The worker threads of annotate_many do not each check on the server
+    """
+    server, client = stand_in()
+    client.start_server = StartServer.TRY_START
+    checks = []
+    monkeypatch.setattr(client, "_ensure_alive", lambda: checks.append(threading.get_ident()))
+    texts = ["text number %d" % idx for idx in range(10)]
+    results = client.annotate_many(texts)
+    assert [words(result) for result in results] == [text.split() for text in texts]
+    assert len(checks) == 1
+
+    client.annotate("one more text")
+    assert len(checks) == 2
+
+def test_ensure_alive_lock(stand_in, monkeypatch):
+    """
+    Threads calling ensure_alive at the same time take turns
+    """
+    server, client = stand_in()
+    lock = threading.Lock()
+    active = []
+    most_active = []
+    def slow_check():
+        with lock:
+            active.append(1)
+            most_active.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+    monkeypatch.setattr(client, "_ensure_alive", slow_check)
+    threads = [threading.Thread(target=client.ensure_alive) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert most_active == [1, 1, 1, 1]
+
+def test_connection_refused():
+    """
+    A server which is not there gives a retryable error, which is still an AnnotationException
+    """
+    with StandInServer() as server:
+        port = server.server_address[1]
+    client = CoreNLPClient(start_server=StartServer.DONT_START, endpoint="http://localhost:%d" % port, output_format="json")
+    with pytest.raises(AnnotationException):
+        client.annotate_many(["some text"], max_retries=1, retry_delay=0.01)
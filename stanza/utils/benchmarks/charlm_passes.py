@@ -0,0 +1,90 @@
+"""
+Count how many sentences the charlms are run on by a full pipeline, with and without the shared charlm cache
+
+Example:
+
+python3 stanza/utils/benchmarks/charlm_passes.py --lang en --processors tokenize,mwt,pos,lemma,depparse,ner,sentiment,constituency
+
+POS, depparse, NER, sentiment and constituency each run the forward
+and backward charlm on every sentence unless Pipeline(cache_charlm=True)
+lets them share the results.  depparse prepends a ROOT word to each
+sentence, so the forward charlm still needs a second pass for depparse.
+"""
+
+import argparse
+import time
+
+import stanza
+from stanza.models.common.char_model import CharacterLanguageModel
+from stanza.utils.benchmarks.stream_throughput import SAMPLE_PARAGRAPHS
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lang', type=str, default='en', help='Language of the pipeline')
+    parser.add_argument('--processors', type=str, default='tokenize,mwt,pos,lemma,depparse,ner,sentiment,constituency', help='Processors to run')
+    parser.add_argument('--model_dir', type=str, default=None, help='Where to find the models.  Default is the regular stanza resources dir')
+    parser.add_argument('--num_docs', type=int, default=200, help='How many copies of the sample paragraphs to process')
+    args = parser.parse_args(args=args)
+    return args
+
+class PassCounter:
+    """
+    Counts the batches and sentences the charlms are run on
+
+    Most models go through uncached_char_representation.  Without the
+    cache, NER builds its own character tensors and calls
+    get_representation instead
+    """
+    def __init__(self):
+        self.batches = 0
+        self.sentences = 0
+        self.originals = {}
+
+    def __enter__(self):
+        counter = self
+        original_build = CharacterLanguageModel.uncached_char_representation
+        original_get = CharacterLanguageModel.get_representation
+        self.originals = {'uncached_char_representation': original_build,
+                          'get_representation': original_get}
+
+        def counted_build(model, sentences):
+            counter.batches += 1
+            counter.sentences += len(sentences)
+            return original_build(model, sentences)
+
+        def counted_get(model, chars, charoffsets, charlens, char_orig_idx):
+            counter.batches += 1
+            counter.sentences += len(charlens)
+            return original_get(model, chars, charoffsets, charlens, char_orig_idx)
+
+        CharacterLanguageModel.uncached_char_representation = counted_build
+        CharacterLanguageModel.get_representation = counted_get
+        return self
+
+    def __exit__(self, *args):
+        for name, method in self.originals.items():
+            setattr(CharacterLanguageModel, name, method)
+
+def main(args=None):
+    args = parse_args(args)
+    kwargs = {}
+    if args.model_dir:
+        kwargs['model_dir'] = args.model_dir
+    text = "\n\n".join(SAMPLE_PARAGRAPHS[i % len(SAMPLE_PARAGRAPHS)] for i in range(args.num_docs))
+
+    results = []
+    for use_cache in (False, True):
+        pipe = stanza.Pipeline(args.lang, processors=args.processors, download_method=None, cache_charlm=use_cache, **kwargs)
+        with PassCounter() as counter:
+            start = time.time()
+            doc = pipe(text)
+            elapsed = time.time() - start
+        results.append(("cache" if use_cache else "no cache", counter.batches, counter.sentences, elapsed))
+
+    print("%d sentences in the document" % len(doc.sentences))
+    print("mode      charlm batches  charlm sentences  seconds")
+    for mode, batches, sentences, elapsed in results:
+        print("%-8s  %14d  %16d  %7.2f" % (mode, batches, sentences, elapsed))
+
+if __name__ == '__main__':
+    main()
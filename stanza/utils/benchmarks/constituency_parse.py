@@ -0,0 +1,108 @@
+"""
+Time parse_tagged_words, and the initial_word_queues step inside it, for a constituency model
+
+Example:
+
+python3 stanza/utils/benchmarks/constituency_parse.py --model_file saved_models/constituency/en_wsj_charlm.pt --num_sentences 10000
+python3 stanza/utils/benchmarks/constituency_parse.py --model_file en_wsj.pt --tree_file wsj_test.mrg
+python3 stanza/utils/benchmarks/constituency_parse.py --model_file en_wsj.pt --compare_state_arena
+
+--compare_state_arena parses the sentences twice, once with the
+namedtuple States and once with the StateArena, and checks that the
+trees are the same.
+
+The tagged words come from the preterminals of --tree_file if given.
+Otherwise, synthetic sentences are drawn from the model's own tags and
+delta vocab, with lengths similar to newswire.
+"""
+
+import argparse
+import random
+import time
+
+import torch
+
+from stanza.models.constituency import parse_tree
+from stanza.models.constituency import tree_reader
+from stanza.models.constituency.trainer import Trainer
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_file', type=str, required=True, help='Constituency model to time')
+    parser.add_argument('--wordvec_pretrain_file', type=str, default=None, help='Pretrain for the model, if not in the default location')
+    parser.add_argument('--charlm_forward_file', type=str, default=None, help='Forward charlm for the model')
+    parser.add_argument('--charlm_backward_file', type=str, default=None, help='Backward charlm for the model')
+    parser.add_argument('--tree_file', type=str, default=None, help='Take the tagged words from the trees in this file')
+    parser.add_argument('--num_sentences', type=int, default=10000, help='Number of sentences to parse')
+    parser.add_argument('--batch_size', type=int, default=50, help='Parser batch size')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed for the synthetic sentences')
+    parser.add_argument('--device', type=str, default=None, help='Device to use.  Default is cuda if available')
+    parser.add_argument('--compare_state_arena', default=False, action='store_true', help='Time parsing with both the namedtuple States and the StateArena')
+    args = parser.parse_args(args=args)
+    return args
+
+def synthetic_sentences(model, args):
+    random.seed(args.seed)
+    words = sorted(model.delta_words) if model.delta_words else ["word"]
+    tags = sorted(model.tags)
+    sentences = []
+    for _ in range(args.num_sentences):
+        length = max(1, min(80, int(random.gauss(25, 12))))
+        sentences.append([(random.choice(words), random.choice(tags)) for _ in range(length)])
+    return sentences
+
+def tree_sentences(args):
+    trees = tree_reader.read_treebank(args.tree_file)
+    sentences = [[(pt.children[0].label, pt.label) for pt in tree.yield_preterminals()] for tree in trees]
+    return [sentences[i % len(sentences)] for i in range(args.num_sentences)]
+
+def main(args=None):
+    args = parse_args(args)
+    if args.device:
+        device = args.device
+    else:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    load_args = {
+        'wordvec_pretrain_file': args.wordvec_pretrain_file,
+        'charlm_forward_file': args.charlm_forward_file,
+        'charlm_backward_file': args.charlm_backward_file,
+        'device': device,
+    }
+    model = Trainer.load(args.model_file, args=load_args).model
+    model.eval()
+
+    if args.tree_file:
+        sentences = tree_sentences(args)
+    else:
+        sentences = synthetic_sentences(model, args)
+    num_words = sum(len(x) for x in sentences)
+
+    tagged_words = [[parse_tree.Tree(tag, parse_tree.Tree(word)) for word, tag in sentence] for sentence in sentences]
+    start = time.time()
+    with torch.no_grad():
+        for batch_start in range(0, len(tagged_words), args.batch_size):
+            model.initial_word_queues(tagged_words[batch_start:batch_start+args.batch_size])
+    queue_time = time.time() - start
+
+    if args.compare_state_arena:
+        settings = [("namedtuple States", False), ("StateArena", True)]
+    else:
+        settings = [("", model.args.get('state_arena', True))]
+    parse_times = []
+    results = []
+    for _, use_arena in settings:
+        model.args['state_arena'] = use_arena
+        start = time.time()
+        results.append(model.parse_tagged_words(sentences, args.batch_size))
+        parse_times.append(time.time() - start)
+
+    print("%d sentences, %d words" % (len(sentences), num_words))
+    print("initial_word_queues: %.2fs  (%.0f sentences/sec)" % (queue_time, len(sentences) / queue_time))
+    for (name, _), parse_time in zip(settings, parse_times):
+        print("parse_tagged_words:  %.2fs  (%.0f sentences/sec)  %s" % (parse_time, len(sentences) / parse_time, name))
+    if args.compare_state_arena:
+        mismatches = sum(x != y for x, y in zip(*results))
+        print("Trees which differ between the two: %d" % mismatches)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare scoring every (dependent, head) deprel pair with scoring only the chosen heads
+
+Example:
+
+python3 stanza/utils/benchmarks/deprel_scoring.py --lengths 20 50 100 150 250 --batch_size 32
+
+The depparse model used to build a batch x n x n x num_deprels tensor
+at prediction time and take its max.  In two phase mode the heads are
+decoded first and the deprels are scored for only those heads, which
+is O(n) instead of O(n^2) per sentence.  This times the deprel scorer
+alone, with the default parser dimensions and random weights, since
+the result does not depend on the weights.
+
+Memory is the size of the largest tensors each method builds, or the
+peak allocation reported by torch.cuda when run on a GPU.
+"""
+
+import argparse
+import time
+
+import torch
+
+from stanza.models.common.biaffine import DeepBiaffineScorer
+
+# the default chunk size of PairwiseBilinear.forward_pairs
+PAIR_CHUNK_SIZE = 256
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lengths', type=int, nargs='+', default=[20, 50, 100, 150, 250], help='Sentence lengths to time')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per batch')
+    parser.add_argument('--hidden_dim', type=int, default=400, help='Parser LSTM hidden dim.  The scorer sees twice this')
+    parser.add_argument('--deep_biaff_hidden_dim', type=int, default=400, help='Hidden dim of the deprel scorer')
+    parser.add_argument('--num_deprels', type=int, default=50, help='Number of deprel labels')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of times to run each method')
+    parser.add_argument('--device', type=str, default=None, help='Device to use.  Default is cuda if available')
+    args = parser.parse_args(args=args)
+    return args
+
+def full_scores(scorer, lstm_outputs, heads):
+    scores = scorer(lstm_outputs, lstm_outputs)
+    return torch.gather(scores.max(3)[1], 2, heads.unsqueeze(2)).squeeze(2)
+
+def pair_scores(scorer, lstm_outputs, heads):
+    return scorer.score_pairs(lstm_outputs, lstm_outputs, heads).max(2)[1]
+
+def time_method(method, scorer, lstm_outputs, heads, repeats, device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    start = time.time()
+    with torch.no_grad():
+        for _ in range(repeats):
+            result = method(scorer, lstm_outputs, heads)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+        peak = torch.cuda.max_memory_allocated()
+    else:
+        peak = None
+    return (time.time() - start) / repeats, peak, result
+
+def main(args=None):
+    args = parse_args(args)
+    if args.device:
+        device = torch.device(args.device)
+    else:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+    torch.manual_seed(1234)
+    scorer = DeepBiaffineScorer(2 * args.hidden_dim, 2 * args.hidden_dim, args.deep_biaff_hidden_dim, args.num_deprels, pairwise=True)
+    torch.nn.init.normal_(scorer.scorer.W_bilin.weight)
+    scorer.to(device)
+    scorer.eval()
+
+    hidden = args.deep_biaff_hidden_dim + 1
+    print("length  method     ms/batch  sents/sec  memory MB")
+    for length in args.lengths:
+        # +1 for the root
+        lstm_outputs = torch.randn(args.batch_size, length + 1, 2 * args.hidden_dim, device=device)
+        heads = torch.randint(0, length + 1, (args.batch_size, length + 1), device=device)
+        # the full scorer builds an N x L x O x D2 intermediate and the N x L x L x O scores
+        # the pair scorer builds the N x L x O scores and a chunk of the intermediate at a time
+        rows = args.batch_size * (length + 1)
+        estimates = {'full': 4 * (rows * args.num_deprels * hidden + rows * (length + 1) * args.num_deprels),
+                     'two phase': 4 * (min(rows, PAIR_CHUNK_SIZE) * args.num_deprels * hidden + rows * args.num_deprels)}
+        results = []
+        for name, method in (('full', full_scores), ('two phase', pair_scores)):
+            elapsed, peak, result = time_method(method, scorer, lstm_outputs, heads, args.repeats, device)
+            results.append(result)
+            memory = peak if peak is not None else estimates[name]
+            print("%6d  %-9s  %8.1f  %9.1f  %9.1f" % (length, name, elapsed * 1000, args.batch_size / elapsed, memory / 1024 / 1024))
+        mismatches = (results[0] != results[1]).sum().item()
+        if mismatches > 0:
+            print("  %d of %d deprels differ" % (mismatches, results[0].numel()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Time each layer of a HighwayLSTM with and without the fused inference path
+
+Example:
+
+python3 stanza/utils/benchmarks/highway_lstm.py
+python3 stanza/utils/benchmarks/highway_lstm.py --input_size 475 --hidden_dim 200 --num_layers 2 --batch_size 5000
+python3 stanza/utils/benchmarks/highway_lstm.py --cpu --num_threads 1 2 4
+
+The defaults are roughly the sizes of the default depparse model.
+The tagger is --hidden_dim 200 --num_layers 2.  Random weights and a
+batch of random sentences are used, so no models are needed.
+--batch_size is in words, as it is for the tagger and parser.
+
+For each layer, "lstm" is the PackedLSTM and "highway" is the gate &
+highway connection, which is the part the fused path changes.  The
+max difference between the fused and unfused outputs is also shown.
+"""
+
+import argparse
+import logging
+import random
+import time
+
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, PackedSequence
+
+from stanza.models.common.hlstm import HighwayLSTM
+from stanza.models.common.utils import default_device
+from stanza.utils.helper_func import make_table
+
+logger = logging.getLogger('stanza')
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input_size', type=int, default=775, help='Size of the input to the LSTM')
+    parser.add_argument('--hidden_dim', type=int, default=400, help='Hidden size of each direction')
+    parser.add_argument('--num_layers', type=int, default=3, help='Number of layers')
+    parser.add_argument('--rec_dropout', type=float, default=0.0, help='Recurrent dropout, which uses the slower LSTM implementation')
+    parser.add_argument('--batch_size', type=int, default=5000, help='Number of words in the batch')
+    parser.add_argument('--min_len', type=int, default=5, help='Shortest sentence length')
+    parser.add_argument('--max_len', type=int, default=50, help='Longest sentence length')
+    parser.add_argument('--repeats', type=int, default=20, help='How many times to time each layer')
+    parser.add_argument('--num_threads', type=int, nargs='+', default=None, help='Numbers of torch threads to compare')
+    parser.add_argument('--cpu', default=False, action='store_true', help='Run on the CPU even if a GPU is available')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed for the weights and sentences')
+    args = parser.parse_args(args=args)
+    return args
+
+def build_batch(args, device):
+    lengths = []
+    while sum(lengths) < args.batch_size:
+        lengths.append(random.randint(args.min_len, args.max_len))
+    lengths = sorted(lengths, reverse=True)
+    inputs = torch.randn(len(lengths), lengths[0], args.input_size, device=device)
+    return inputs, lengths
+
+def synchronize(device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+
+def time_layers(model, inputs, lengths, repeats, device):
+    """
+    Returns the best time of the lstm & highway parts of each layer, along with the final output
+    """
+    lstm_times = [[] for _ in range(model.num_layers)]
+    highway_times = [[] for _ in range(model.num_layers)]
+    for _ in range(repeats):
+        layer_input = pack_padded_sequence(inputs, lengths, batch_first=True)
+        for layer in range(model.num_layers):
+            synchronize(device)
+            start = time.time()
+            h, _ = model.lstm[layer](layer_input, lengths)
+            synchronize(device)
+            lstm_times[layer].append(time.time() - start)
+
+            start = time.time()
+            data = model.highway_step(layer, h, layer_input)
+            synchronize(device)
+            highway_times[layer].append(time.time() - start)
+            layer_input = PackedSequence(data, layer_input.batch_sizes, layer_input.sorted_indices, layer_input.unsorted_indices)
+    return [min(x) for x in lstm_times], [min(x) for x in highway_times], layer_input.data
+
+def time_forward(model, inputs, lengths, repeats, device):
+    times = []
+    for _ in range(repeats):
+        synchronize(device)
+        start = time.time()
+        model(inputs, lengths)
+        synchronize(device)
+        times.append(time.time() - start)
+    return min(times)
+
+def compare(args, model, inputs, lengths, device, setting):
+    results = {}
+    for fused in (False, True):
+        model.fused_inference = fused
+        # the first pass builds the concatenated weights and scripts the highway, so it is not timed
+        time_layers(model, inputs, lengths, 1, device)
+        lstm, highway, output = time_layers(model, inputs, lengths, args.repeats, device)
+        results[fused] = (lstm, highway, output, time_forward(model, inputs, lengths, args.repeats, device))
+
+    rows = []
+    for layer in range(model.num_layers):
+        for part, idx in (("lstm", 0), ("highway", 1)):
+            unfused = results[False][idx][layer]
+            fused = results[True][idx][layer]
+            rows.append((setting, "layer %d %s" % (layer, part), "%.2f" % (unfused * 1000), "%.2f" % (fused * 1000), "%.2fx" % (unfused / fused)))
+    unfused = results[False][3]
+    fused = results[True][3]
+    rows.append((setting, "forward", "%.2f" % (unfused * 1000), "%.2f" % (fused * 1000), "%.2fx" % (unfused / fused)))
+    difference = (results[False][2] - results[True][2]).abs().max().item()
+    return rows, difference
+
+def main(args=None):
+    args = parse_args(args)
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device('cpu' if args.cpu else default_device())
+
+    model = HighwayLSTM(args.input_size, args.hidden_dim, args.num_layers, batch_first=True, bidirectional=True,
+                        dropout=0.5, rec_dropout=args.rec_dropout, highway_func=torch.tanh)
+    model.to(device)
+    model.eval()
+    inputs, lengths = build_batch(args, device)
+    logger.info("Timing %d sentences, %d words on %s", len(lengths), sum(lengths), device)
+
+    rows = []
+    differences = []
+    thread_settings = args.num_threads if args.num_threads else [torch.get_num_threads()]
+    with torch.no_grad():
+        for num_threads in thread_settings:
+            torch.set_num_threads(num_threads)
+            setting_rows, difference = compare(args, model, inputs, lengths, device, "%d threads" % num_threads)
+            rows.extend(setting_rows)
+            differences.append(difference)
+
+    print(make_table(['Setting', 'Step', 'Unfused (ms)', 'Fused (ms)', 'Speedup'], rows))
+    print("Max difference between the fused and unfused outputs: %g" % max(differences))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare per-sentence Chu-Liu/Edmonds with the greedy-first tree decoder used by the depparse trainer
+
+Example:
+
+python3 stanza/utils/benchmarks/mst_decode.py --threads 4
+python3 stanza/utils/benchmarks/mst_decode.py --noise 3.0 --buckets 10 50 200
+
+The scores are synthetic: a random gold tree gets a bonus on top of
+gaussian noise, and each row is log softmaxed, as in the parser's
+output.  More noise means more sentences where the greedy heads have
+cycles or multiple roots and the decoder falls back to the full search.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import numpy as np
+
+from stanza.models.common.chuliu_edmonds import chuliu_edmonds_one_root, decode_trees, greedy_trees
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buckets', type=int, nargs='+', default=[10, 25, 50, 100, 200], help='Upper bounds of the sentence length buckets')
+    parser.add_argument('--num_sentences', type=int, default=500, help='Sentences per bucket')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per decode_trees call')
+    parser.add_argument('--noise', type=float, default=1.0, help='Stddev of the noise added to the scores, relative to a gold arc bonus of 5')
+    parser.add_argument('--threads', type=int, default=4, help='Thread pool size for the fallback.  0 to skip the thread pool timing')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed')
+    args = parser.parse_args(args=args)
+    return args
+
+def random_scores(rng, length, max_len, noise):
+    """
+    Log softmax scores for one sentence of length words plus the root, padded to max_len
+    """
+    scores = rng.normal(scale=noise, size=(max_len, max_len))
+    # a random single rooted tree: the words are visited in a random
+    # order, the first one attaches to the root and every other word
+    # attaches to a word visited before it
+    order = rng.permutation(np.arange(1, length))
+    scores[order[0], 0] += 5.0
+    for idx in range(1, len(order)):
+        scores[order[idx], order[rng.integers(0, idx)]] += 5.0
+    scores = scores - np.log(np.sum(np.exp(scores), axis=1, keepdims=True))
+    return scores.astype(np.float32)
+
+def build_batches(rng, lower, upper, args):
+    batches = []
+    for start in range(0, args.num_sentences, args.batch_size):
+        num = min(args.batch_size, args.num_sentences - start)
+        # +1 for the root
+        sentlens = sorted((rng.integers(lower, upper + 1, size=num) + 1).tolist(), reverse=True)
+        max_len = sentlens[0]
+        scores = np.stack([random_scores(rng, length, max_len, args.noise) for length in sentlens])
+        batches.append((scores, sentlens))
+    return batches
+
+def time_full(batches):
+    start = time.time()
+    for scores, sentlens in batches:
+        for adj, length in zip(scores, sentlens):
+            chuliu_edmonds_one_root(adj[:length, :length])
+    return time.time() - start
+
+def time_greedy(batches, executor=None):
+    start = time.time()
+    for scores, sentlens in batches:
+        decode_trees(scores, sentlens, executor)
+    return time.time() - start
+
+def main(args=None):
+    args = parse_args(args)
+    rng = np.random.default_rng(args.seed)
+    executor = ThreadPoolExecutor(max_workers=args.threads) if args.threads > 0 else None
+
+    print("%-10s  %8s  %8s  %8s  %8s  %8s" % ("length", "fallback", "CLE", "greedy", "threads", "speedup"))
+    lower = 1
+    for upper in args.buckets:
+        batches = build_batches(rng, lower, upper, args)
+        num_fallback = 0
+        for scores, sentlens in batches:
+            trees = decode_trees(scores, sentlens)
+            expected = [chuliu_edmonds_one_root(adj[:length, :length]) for adj, length in zip(scores, sentlens)]
+            for tree, expected_tree in zip(trees, expected):
+                if not np.array_equal(tree, expected_tree):
+                    raise AssertionError("Greedy decoder produced a different tree than CLE")
+            num_fallback += int(np.sum(~greedy_trees(scores, sentlens)[1]))
+
+        full_time = time_full(batches)
+        greedy_time = time_greedy(batches)
+        thread_time = time_greedy(batches, executor) if executor is not None else float('nan')
+        best_time = min(greedy_time, thread_time) if executor is not None else greedy_time
+        print("%4d-%-5d  %7.1f%%  %7.3fs  %7.3fs  %7.3fs  %7.2fx" % (lower, upper, 100.0 * num_fallback / args.num_sentences,
+                                                                 full_time, greedy_time, thread_time, full_time / best_time))
+        lower = upper + 1
+
+    if executor is not None:
+        executor.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure how much padding each batching strategy produces on a long-tailed corpus
+
+Compares:
+  - fixed sentence count batches (NER, lemma, constituency)
+  - word count batches, as in the POS / depparse DataLoaders, sorted and unsorted
+  - padded cost batches with a token budget (common.data.padded_cost_batches)
+
+The padded cost of a batch is (longest sentence) * (number of sentences),
+which is the number of positions in the padded tensors.
+
+Example:
+
+python3 stanza/utils/benchmarks/padding_waste.py --token_budget 5000
+python3 stanza/utils/benchmarks/padding_waste.py --conllu_file en_ewt-ud-test.conllu
+
+Without a conllu file, sentence lengths are drawn from a Pareto
+distribution, which gives many short sentences and a few very long ones,
+similar to legal or web text.
+"""
+
+import argparse
+import random
+
+from stanza.models.common.data import padded_cost_batches
+from stanza.models.depparse.data import data_to_batches
+from stanza.utils.conll import CoNLL
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conllu_file', type=str, default=None, help='Read sentence lengths from this file instead of generating them')
+    parser.add_argument('--num_sentences', type=int, default=10000, help='Number of synthetic sentences')
+    parser.add_argument('--pareto_alpha', type=float, default=1.5, help='Shape of the synthetic length distribution.  Smaller means a longer tail')
+    parser.add_argument('--min_length', type=int, default=5, help='Minimum synthetic sentence length')
+    parser.add_argument('--max_length', type=int, default=500, help='Maximum synthetic sentence length')
+    parser.add_argument('--sentence_batch_size', type=int, default=32, help='Batch size for the sentence count strategy')
+    parser.add_argument('--word_batch_size', type=int, default=5000, help='Batch size for the word count strategies')
+    parser.add_argument('--token_budget', type=int, default=5000, help='Budget for the padded cost strategy')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed for the synthetic corpus')
+    args = parser.parse_args(args=args)
+    return args
+
+def sentence_lengths(args):
+    if args.conllu_file:
+        doc = CoNLL.conll2doc(input_file=args.conllu_file)
+        return [len(sentence.words) for sentence in doc.sentences]
+    random.seed(args.seed)
+    return [min(args.max_length, int(args.min_length * random.paretovariate(args.pareto_alpha))) for _ in range(args.num_sentences)]
+
+def padding_stats(batches):
+    """
+    Returns number of batches, number of real words, number of padded positions, and the largest padded batch
+    """
+    real = 0
+    padded = 0
+    largest = 0
+    for batch in batches:
+        lens = [len(x[0]) for x in batch]
+        real += sum(lens)
+        cost = max(lens) * len(lens)
+        padded += cost
+        largest = max(largest, cost)
+    return len(batches), real, padded, largest
+
+def main(args=None):
+    args = parse_args(args)
+    lens = sentence_lengths(args)
+    data = [[[None] * length] for length in lens]
+
+    strategies = [
+        ("sentence count %d" % args.sentence_batch_size, [data[i:i+args.sentence_batch_size] for i in range(0, len(data), args.sentence_batch_size)]),
+        ("word count %d, unsorted" % args.word_batch_size, data_to_batches(data, args.word_batch_size, eval_mode=True, sort_during_eval=False, min_length_to_batch_separately=None)[0]),
+        ("word count %d, sorted" % args.word_batch_size, data_to_batches(data, args.word_batch_size, eval_mode=True, sort_during_eval=True, min_length_to_batch_separately=None)[0]),
+        ("token budget %d" % args.token_budget, padded_cost_batches(data, args.token_budget)[0]),
+    ]
+
+    print("%d sentences, %d words, longest sentence %d" % (len(lens), sum(lens), max(lens)))
+    print("%-28s  %8s  %10s  %7s  %13s" % ("strategy", "batches", "padded", "waste", "largest batch"))
+    for name, batches in strategies:
+        num_batches, real, padded, largest = padding_stats(batches)
+        print("%-28s  %8d  %10d  %6.1f%%  %13d" % (name, num_batches, padded, 100.0 * (padded - real) / padded, largest))
+
+if __name__ == '__main__':
+    main()
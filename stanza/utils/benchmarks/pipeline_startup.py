@@ -0,0 +1,139 @@
+"""
+Time the startup of stanza: importing it and building a Pipeline
+
+Example:
+
+python3 stanza/utils/benchmarks/pipeline_startup.py --lang en --processors tokenize,pos,lemma,depparse,ner
+python3 stanza/utils/benchmarks/pipeline_startup.py --lang en --model_dir ~/stanza_resources --repeats 5
+python3 stanza/utils/benchmarks/pipeline_startup.py --lang en --load_threads 1 2 4 8
+
+The models must already be downloaded.  resources.json is reused
+rather than downloaded again, so no network access is needed.
+
+"import" rows time `import stanza` in a new interpreter, both on its
+own and after torch has already been imported, which separates the
+cost of torch from the cost of stanza itself.
+
+"cold" runs delete the md5 cache first, so every model file is hashed
+again, as was always the case before the cache existed.  "warm" runs
+use the cache left by the previous run.  The "verify" rows time only
+the md5 check of the model files, without loading the models.  Note
+that the cold hashing is done with the files already in the OS page
+cache, so on a fresh boot it would be slower still.
+
+Each of --load_threads then builds the Pipeline with that many threads
+prefetching the model files.  1 loads the models one at a time.
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import stanza
+from stanza.pipeline.core import DownloadMethod
+from stanza.resources.common import DEFAULT_MODEL_DIR, MD5_CACHE_FILENAME, file_exists, load_resources_json
+from stanza.utils.helper_func import make_table
+
+logger = logging.getLogger('stanza')
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lang', type=str, default='en', help='Language of the pipeline')
+    parser.add_argument('--processors', type=str, default='tokenize,pos,lemma,depparse', help='Processors to load')
+    parser.add_argument('--model_dir', type=str, default=DEFAULT_MODEL_DIR, help='Where to find the models')
+    parser.add_argument('--cpu', default=False, action='store_true', help='Load the models on the CPU')
+    parser.add_argument('--repeats', type=int, default=3, help='How many times to build the pipeline in each setting')
+    parser.add_argument('--load_threads', type=int, nargs='+', default=[1, 4], help='Numbers of model loading threads to compare')
+    parser.add_argument('--skip_import', default=False, action='store_true', help='Don\'t time importing stanza')
+    args = parser.parse_args(args=args)
+    return args
+
+def remove_md5_cache(model_dir):
+    md5_cache = os.path.join(model_dir, MD5_CACHE_FILENAME)
+    if os.path.exists(md5_cache):
+        os.unlink(md5_cache)
+
+def model_files(model_dir, lang):
+    """
+    Returns (path, md5) of each downloaded model file listed in resources.json for lang
+    """
+    resources = load_resources_json(model_dir)
+    lang = resources[lang].get('alias', lang)
+    files = []
+    for processor, packages in resources[lang].items():
+        if not isinstance(packages, dict):
+            continue
+        for package, description in packages.items():
+            if not isinstance(description, dict) or 'md5' not in description:
+                continue
+            path = os.path.join(model_dir, lang, processor, package + '.pt')
+            if os.path.exists(path):
+                files.append((path, description['md5']))
+    return files
+
+def time_verify(args, cold):
+    md5_cache = os.path.join(args.model_dir, MD5_CACHE_FILENAME)
+    files = model_files(args.model_dir, args.lang)
+    if cold:
+        remove_md5_cache(args.model_dir)
+    start = time.time()
+    for path, md5 in files:
+        file_exists(path, md5, md5_cache)
+    return time.time() - start, len(files)
+
+def time_import(preload_torch):
+    """
+    Time import stanza in a new interpreter, optionally importing torch first
+    """
+    code = "import time; "
+    if preload_torch:
+        code += "import torch; "
+    code += "start = time.time(); import stanza; print(time.time() - start)"
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return float(result.stdout.strip().split()[-1])
+
+def time_pipeline(args, cold, load_threads=4):
+    if cold:
+        remove_md5_cache(args.model_dir)
+    start = time.time()
+    stanza.Pipeline(args.lang, dir=args.model_dir, processors=args.processors, use_gpu=not args.cpu,
+                    download_method=DownloadMethod.REUSE_RESOURCES, logging_level='WARNING', load_threads=load_threads)
+    return time.time() - start
+
+def summarize(times):
+    return "%.3f" % min(times), "%.3f" % (sum(times) / len(times))
+
+def main(args=None):
+    args = parse_args(args)
+
+    rows = []
+    if not args.skip_import:
+        for preload_torch in (False, True):
+            import_times = [time_import(preload_torch) for _ in range(args.repeats)]
+            rows.append(("import stanza", "torch already imported" if preload_torch else "", *summarize(import_times)))
+
+    # the first build may load libraries or download missing models, so it is not timed
+    time_pipeline(args, cold=False)
+
+    for cold in (True, False):
+        name = "cold md5 cache" if cold else "warm md5 cache"
+        verify_times = []
+        for _ in range(args.repeats):
+            elapsed, num_files = time_verify(args, cold)
+            verify_times.append(elapsed)
+        rows.append(("verify %d files" % num_files, name, *summarize(verify_times)))
+
+        build_times = [time_pipeline(args, cold) for _ in range(args.repeats)]
+        rows.append(("Pipeline(%s)" % args.processors, name, *summarize(build_times)))
+
+    for load_threads in args.load_threads:
+        build_times = [time_pipeline(args, False, load_threads) for _ in range(args.repeats)]
+        rows.append(("Pipeline(%s)" % args.processors, "%d load threads" % load_threads, *summarize(build_times)))
+
+    print(make_table(['Step', 'Setting', 'Best (s)', 'Mean (s)'], rows))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Compare the accuracy and speed of a Pipeline with and without quantize
+
+Example:
+
+python3 stanza/utils/benchmarks/quantize_accuracy.py --lang en --eval_file extern_data/ud2/ud-treebanks-v2.12/UD_English-EWT/en_ewt-ud-dev.conllu
+python3 stanza/utils/benchmarks/quantize_accuracy.py --lang en --processors tokenize,pos,lemma,depparse --eval_file en_ewt-ud-dev.conllu --raw_text
+
+The models must already be downloaded.  Quantization only works on
+the CPU, so both versions of the pipeline are run there.
+
+By default the gold tokenization of the eval file is used, so that
+the scores of the later processors are not affected by tokenization
+errors.  With --raw_text, the text of each sentence is tokenized by
+the pipeline instead.  The predictions are scored with the official
+CoNLL 2018 evaluation script against the eval file.
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import torch
+
+import stanza
+from stanza.models.common.quantize import QUANTIZE_MODES
+from stanza.pipeline.core import DownloadMethod
+from stanza.utils.conll import CoNLL
+import stanza.utils.conll18_ud_eval as ud_eval
+from stanza.utils.helper_func import make_table
+
+logger = logging.getLogger('stanza')
+
+METRICS = ["Tokens", "Words", "UPOS", "XPOS", "UFeats", "Lemmas", "UAS", "LAS"]
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lang', type=str, default='en', help='Language of the pipeline')
+    parser.add_argument('--processors', type=str, default='tokenize,mwt,pos,lemma,depparse', help='Processors to run')
+    parser.add_argument('--package', type=str, default='default', help='Package of the pipeline')
+    parser.add_argument('--model_dir', type=str, default=None, help='Where to find the models.  Default is the regular stanza resources dir')
+    parser.add_argument('--eval_file', type=str, required=True, help='UD dev set to tag and score against')
+    parser.add_argument('--raw_text', default=False, action='store_true', help='Tokenize the text of each sentence instead of using the gold tokens')
+    parser.add_argument('--quantize', type=str, nargs='+', default=['int8'], choices=QUANTIZE_MODES, help='Quantize settings to compare against the unquantized pipeline')
+    parser.add_argument('--repeats', type=int, default=3, help='How many times to time each pipeline')
+    parser.add_argument('--num_threads', type=int, default=None, help='Number of torch threads to use')
+    parser.add_argument('--output_dir', type=str, default=None, help='Where to write the predictions.  Default is a temp dir')
+    args = parser.parse_args(args=args)
+    return args
+
+def read_input(eval_file, raw_text):
+    """
+    Returns the input for the pipeline and the number of gold tokens
+    """
+    doc = CoNLL.conll2doc(input_file=eval_file)
+    num_tokens = sum(len(sentence.tokens) for sentence in doc.sentences)
+    if raw_text:
+        text = "\n\n".join(sentence.text if sentence.text else " ".join(token.text for token in sentence.tokens)
+                           for sentence in doc.sentences)
+        return text, num_tokens
+    return [[token.text for token in sentence.tokens] for sentence in doc.sentences], num_tokens
+
+def build_pipeline(args, quantize):
+    kwargs = {}
+    if args.model_dir:
+        kwargs['model_dir'] = args.model_dir
+    if not args.raw_text:
+        kwargs['tokenize_pretokenized'] = True
+    return stanza.Pipeline(args.lang, processors=args.processors, package=args.package, use_gpu=False, quantize=quantize,
+                           download_method=DownloadMethod.REUSE_RESOURCES, logging_level='WARNING', **kwargs)
+
+def run_pipeline(pipe, text, repeats):
+    """
+    Returns the best time of repeats runs and the output of the last run
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        doc = pipe(text)
+        times.append(time.time() - start)
+    return min(times), doc
+
+def score(eval_file, pred_file):
+    gold_ud = ud_eval.load_conllu_file(eval_file)
+    system_ud = ud_eval.load_conllu_file(pred_file)
+    evaluation = ud_eval.evaluate(gold_ud, system_ud)
+    return ["%.2f" % (evaluation[metric].f1 * 100) for metric in METRICS]
+
+def compare(args, output_dir):
+    text, num_tokens = read_input(args.eval_file, args.raw_text)
+    rows = []
+    baseline = None
+    for quantize in [None] + args.quantize:
+        name = quantize if quantize else "float32"
+        pipe = build_pipeline(args, quantize)
+        # the first run may allocate buffers or warm up caches, so it is not timed
+        pipe(text[:10] if isinstance(text, list) else text[:1000])
+        elapsed, doc = run_pipeline(pipe, text, args.repeats)
+        if baseline is None:
+            baseline = elapsed
+
+        pred_file = os.path.join(output_dir, "%s.conllu" % name)
+        CoNLL.write_doc2conll(doc, pred_file)
+        rows.append([name, "%.3f" % elapsed, "%.0f" % (num_tokens / elapsed), "%.2fx" % (baseline / elapsed)] + score(args.eval_file, pred_file))
+    return rows
+
+def main(args=None):
+    args = parse_args(args)
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        rows = compare(args, args.output_dir)
+    else:
+        with tempfile.TemporaryDirectory() as output_dir:
+            rows = compare(args, output_dir)
+    print(make_table(['Setting', 'Time (s)', 'Tokens/s', 'Speedup'] + METRICS, rows))
+
+if __name__ == '__main__':
+    main()
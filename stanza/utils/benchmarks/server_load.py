@@ -0,0 +1,159 @@
+"""
+Load test the micro-batching server: throughput and latency at increasing concurrency
+
+Example:
+
+python3 stanza/utils/benchmarks/server_load.py --lang en --processors tokenize,pos,lemma,depparse --concurrency 1 4 16 64
+python3 stanza/utils/benchmarks/server_load.py --url http://localhost:5000 --concurrency 1 8 32
+
+Without --url, a Pipeline is built and served from this process on a
+free port.  --compare_unbatched then repeats each level with a server
+which runs every request through the Pipeline on its own.
+
+Each of --concurrency client threads sends requests back to back
+until --num_requests requests have been answered at that level.
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.request
+
+from stanza.pipeline.batch_server import BatchServer, MicroBatcher, DEFAULT_MAX_WAIT, DEFAULT_TOKEN_BUDGET
+from stanza.utils.helper_func import make_table
+
+logger = logging.getLogger('stanza')
+
+SAMPLE_PARAGRAPHS = [
+    "Barack Obama was born in Hawaii.  He was elected president in 2008.  Obama attended Harvard.",
+    "The quick brown fox jumped over the lazy dog.  The dog did not seem to notice.",
+    "Stanford University is located in California.  It is a great university, founded in 1891.",
+    "Under the terms of the agreement, the lessee shall maintain the premises in good repair and shall not assign this lease without the prior written consent of the lessor.",
+]
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', type=str, default=None, help='Server to test.  If not set, one is started in this process')
+    parser.add_argument('--lang', type=str, default='en', help='Language of the pipeline')
+    parser.add_argument('--processors', type=str, default='tokenize,pos,lemma,depparse', help='Processors to run')
+    parser.add_argument('--model_dir', type=str, default=None, help='Where to find the models.  Default is the regular stanza resources dir')
+    parser.add_argument('--cpu', default=False, action='store_true', help='Run the pipeline on the CPU')
+    parser.add_argument('--input_file', type=str, default=None, help='Text file of blank-line separated requests.  If not set, a few sample paragraphs are used')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help='Numbers of concurrent clients to test')
+    parser.add_argument('--num_requests', type=int, default=500, help='Requests to send at each concurrency level')
+    parser.add_argument('--token_budget', type=int, default=DEFAULT_TOKEN_BUDGET, help='Token budget of the in-process server')
+    parser.add_argument('--max_wait', type=float, default=DEFAULT_MAX_WAIT, help='Max wait of the in-process server')
+    parser.add_argument('--compare_unbatched', default=False, action='store_true', help='Also test an in-process server which does not merge requests')
+    args = parser.parse_args(args=args)
+    return args
+
+def read_requests(args):
+    if args.input_file:
+        with open(args.input_file, encoding="utf-8") as fin:
+            return [x.strip() for x in fin.read().split("\n\n") if x.strip()]
+    return SAMPLE_PARAGRAPHS
+
+def run_level(url, texts, concurrency, num_requests):
+    """
+    Send num_requests requests from concurrency threads
+
+    Returns the elapsed time, the latency of each request, and the number of failures
+    """
+    lock = threading.Lock()
+    latencies = []
+    failures = [0]
+    next_request = [0]
+
+    def client():
+        while True:
+            with lock:
+                request_idx = next_request[0]
+                if request_idx >= num_requests:
+                    return
+                next_request[0] += 1
+            data = texts[request_idx % len(texts)].encode("utf-8")
+            start = time.time()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url + "/annotate", data=data)) as response:
+                    response.read()
+            except Exception as e:
+                logger.debug("Request failed: %s", e)
+                with lock:
+                    failures[0] += 1
+                continue
+            with lock:
+                latencies.append(time.time() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start, sorted(latencies), failures[0]
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def get_stats(url):
+    with urllib.request.urlopen(url + "/stats") as response:
+        return json.loads(response.read().decode("utf-8"))
+
+def load_test(url, texts, args, name):
+    rows = []
+    for concurrency in args.concurrency:
+        before = get_stats(url)
+        elapsed, latencies, failures = run_level(url, texts, concurrency, args.num_requests)
+        after = get_stats(url)
+        batches = after['batch_size']['count'] - before['batch_size']['count']
+        mean_batch = (after['requests'] - before['requests']) / batches if batches else 0.0
+        rows.append((name, concurrency, "%.1f" % (len(latencies) / elapsed),
+                     "%.3f" % percentile(latencies, 50), "%.3f" % percentile(latencies, 99),
+                     "%.1f" % mean_batch, failures))
+    return rows
+
+def serve(pipeline, token_budget, max_wait):
+    batcher = MicroBatcher(pipeline, token_budget=token_budget, max_wait=max_wait)
+    batcher.start()
+    server = BatchServer(("localhost", 0), batcher)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return batcher, server, "http://localhost:%d" % server.server_address[1]
+
+def main(args=None):
+    args = parse_args(args)
+    texts = read_requests(args)
+
+    rows = []
+    if args.url:
+        rows.extend(load_test(args.url.rstrip("/"), texts, args, "server"))
+    else:
+        import stanza
+
+        kwargs = {}
+        if args.model_dir:
+            kwargs['model_dir'] = args.model_dir
+        pipeline = stanza.Pipeline(args.lang, processors=args.processors, use_gpu=not args.cpu, **kwargs)
+        settings = [("batched", args.token_budget, args.max_wait)]
+        if args.compare_unbatched:
+            # a budget of one token means every request is a batch of its own
+            settings.append(("unbatched", 1, 0.0))
+        for name, token_budget, max_wait in settings:
+            batcher, server, url = serve(pipeline, token_budget, max_wait)
+            try:
+                # warm up the models before timing anything
+                run_level(url, texts, 1, len(texts))
+                rows.extend(load_test(url, texts, args, name))
+            finally:
+                server.shutdown()
+                server.server_close()
+                batcher.stop()
+
+    print(make_table(['Server', 'Clients', 'Requests/s', 'p50 (s)', 'p99 (s)', 'Mean batch', 'Failures'], rows))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare the throughput of Pipeline.stream in one process with the forked worker and pipelined stage modes
+
+Example:
+
+python3 stanza/utils/benchmarks/stream_throughput.py --lang en --processors tokenize,pos,lemma,depparse --num_workers 2 4 8
+
+If --input_file is not given, a synthetic corpus is built by repeating
+a few English paragraphs.  Otherwise, each blank-line separated
+paragraph of the input file is treated as a document.
+"""
+
+import argparse
+import logging
+import time
+
+import stanza
+
+logger = logging.getLogger('stanza')
+
+SAMPLE_PARAGRAPHS = [
+    "Barack Obama was born in Hawaii.  He was elected president in 2008.  Obama attended Harvard.",
+    "The quick brown fox jumped over the lazy dog.  The dog did not seem to notice.",
+    "Stanford University is located in California.  It is a great university, founded in 1891.",
+    "Under the terms of the agreement, the lessee shall maintain the premises in good repair and shall not assign this lease without the prior written consent of the lessor.",
+]
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lang', type=str, default='en', help='Language of the pipeline')
+    parser.add_argument('--processors', type=str, default='tokenize,pos,lemma,depparse', help='Processors to run')
+    parser.add_argument('--model_dir', type=str, default=None, help='Where to find the models.  Default is the regular stanza resources dir')
+    parser.add_argument('--input_file', type=str, default=None, help='Text file of blank-line separated documents.  If not set, a synthetic corpus is used')
+    parser.add_argument('--num_docs', type=int, default=2000, help='How many documents to process')
+    parser.add_argument('--batch_size', type=int, default=50, help='Batch size for Pipeline.stream')
+    parser.add_argument('--num_workers', type=int, nargs='+', default=[2, 4], help='Worker counts to compare against the single process path')
+    parser.add_argument('--no_pipelined', dest='pipelined', default=True, action='store_false', help="Don't time the pipelined stage mode")
+    args = parser.parse_args(args=args)
+    return args
+
+def read_documents(args):
+    if args.input_file:
+        with open(args.input_file, encoding="utf-8") as fin:
+            docs = [x.strip() for x in fin.read().split("\n\n") if x.strip()]
+    else:
+        docs = SAMPLE_PARAGRAPHS
+    return [docs[i % len(docs)] for i in range(args.num_docs)]
+
+def time_stream(pipe, docs, batch_size, num_workers, pipelined=False):
+    start = time.time()
+    num_sentences = 0
+    for doc in pipe.stream(docs, batch_size=batch_size, num_workers=num_workers, pipelined=pipelined):
+        num_sentences += len(doc.sentences)
+    return time.time() - start, num_sentences
+
+def main(args=None):
+    args = parse_args(args)
+    kwargs = {}
+    if args.model_dir:
+        kwargs['model_dir'] = args.model_dir
+    pipe = stanza.Pipeline(args.lang, processors=args.processors, use_gpu=False, download_method=None, **kwargs)
+    docs = read_documents(args)
+
+    results = []
+    for num_workers in [1] + args.num_workers:
+        elapsed, num_sentences = time_stream(pipe, docs, args.batch_size, num_workers)
+        results.append(("%d worker(s)" % num_workers, elapsed))
+        logger.info("%d worker(s): %d docs, %d sentences in %.2fs", num_workers, len(docs), num_sentences, elapsed)
+
+    if args.pipelined:
+        elapsed, num_sentences = time_stream(pipe, docs, args.batch_size, None, pipelined=True)
+        results.append(("pipelined", elapsed))
+        logger.info("pipelined: %d docs, %d sentences in %.2fs", len(docs), num_sentences, elapsed)
+        for stats in pipe.stage_stats:
+            print(stats)
+
+    base_time = results[0][1]
+    print("mode          seconds  docs/sec  speedup")
+    for mode, elapsed in results:
+        print("%-12s  %7.2f  %8.1f  %6.2fx" % (mode, elapsed, len(docs) / elapsed, base_time / elapsed))
+
+if __name__ == '__main__':
+    main()
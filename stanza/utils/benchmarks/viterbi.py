@@ -0,0 +1,81 @@
+"""
+Compare the per-sentence numpy viterbi decode with the batched torch version used by the NER trainer
+
+Example:
+
+python3 stanza/utils/benchmarks/viterbi.py --num_tags 17 --batch_size 32 --num_batches 200
+
+Sentence lengths are drawn uniformly from [min_length, max_length].
+The decoded sequences are checked against each other as well.
+"""
+
+import argparse
+import random
+import time
+
+import torch
+
+from stanza.models.common.crf import viterbi_decode, viterbi_decode_batch
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_tags', type=int, default=17, help='Number of tags.  17 is the bioes version of the 4 class conll03 tagset, plus the vocab prefix')
+    parser.add_argument('--batch_size', type=int, default=32, help='Sentences per batch')
+    parser.add_argument('--num_batches', type=int, default=200, help='Number of batches to decode')
+    parser.add_argument('--min_length', type=int, default=5, help='Minimum sentence length')
+    parser.add_argument('--max_length', type=int, default=60, help='Maximum sentence length')
+    parser.add_argument('--device', type=str, default='cpu', help='Device for the batched decode')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed')
+    args = parser.parse_args(args=args)
+    return args
+
+def build_batches(args):
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    batches = []
+    for _ in range(args.num_batches):
+        sentlens = sorted([random.randint(args.min_length, args.max_length) for _ in range(args.batch_size)], reverse=True)
+        scores = torch.randn(args.batch_size, sentlens[0], args.num_tags)
+        batches.append((scores, sentlens))
+    trans = torch.randn(args.num_tags, args.num_tags)
+    return batches, trans
+
+def decode_numpy(batches, trans):
+    trans = trans.numpy()
+    results = []
+    for scores, sentlens in batches:
+        scores = scores.numpy()
+        results.extend([viterbi_decode(scores[i, :length], trans)[0] for i, length in enumerate(sentlens)])
+    return results
+
+def decode_batch(batches, trans, device):
+    trans = trans.to(device)
+    results = []
+    for scores, sentlens in batches:
+        results.extend(viterbi_decode_batch(scores.to(device), trans, sentlens)[0])
+    return results
+
+def main(args=None):
+    args = parse_args(args)
+    batches, trans = build_batches(args)
+    num_sentences = args.batch_size * args.num_batches
+
+    start = time.time()
+    numpy_results = decode_numpy(batches, trans)
+    numpy_time = time.time() - start
+
+    start = time.time()
+    batch_results = decode_batch(batches, trans, args.device)
+    batch_time = time.time() - start
+
+    mismatches = sum(1 for x, y in zip(numpy_results, batch_results) if [int(t) for t in x] != y)
+
+    print("%d sentences, %d tags" % (num_sentences, args.num_tags))
+    print("%-16s  %8s  %10s" % ("decode", "seconds", "sents/sec"))
+    print("%-16s  %8.3f  %10.1f" % ("numpy per sent", numpy_time, num_sentences / numpy_time))
+    print("%-16s  %8.3f  %10.1f" % ("torch batched", batch_time, num_sentences / batch_time))
+    print("speedup: %.2fx" % (numpy_time / batch_time))
+    print("sentences with different tags: %d" % mismatches)
+
+if __name__ == '__main__':
+    main()
@@ -18,11 +18,11 @@ def get_tqdm():
     unless disable=False is specifically set.
     """
     ipy_str = ""
-    try:
-        from IPython import get_ipython
-        ipy_str = str(type(get_ipython()))
-    except ImportError:
-        pass
+    # inside a notebook or an IPython shell, IPython is already loaded.
+    # checking sys.modules avoids importing all of IPython otherwise
+    ipython = sys.modules.get('IPython')
+    if ipython is not None and hasattr(ipython, 'get_ipython'):
+        ipy_str = str(type(ipython.get_ipython()))
 
     if 'zmqshell' in ipy_str:
         from tqdm import tqdm_notebook as tqdm
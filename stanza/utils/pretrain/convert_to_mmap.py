@@ -0,0 +1,73 @@
+"""
+Convert stanza .pt pretrain files to the memory mapped format
+
+The vocab is written to {name}.vocab.json and the vectors to
+{name}.emb.npy next to each .pt file.  Pretrain will then load the
+vectors with np.load(mmap_mode='r') instead of reading the whole
+matrix, so several processes using the same pretrain share one copy
+of it in the page cache.
+
+Example:
+
+python3 stanza/utils/pretrain/convert_to_mmap.py ~/stanza_resources/en/pretrain/conll17.pt
+python3 stanza/utils/pretrain/convert_to_mmap.py ~/stanza_resources --dtype float16
+
+A directory argument converts every .pt file in a pretrain directory under it.
+"""
+
+import argparse
+import glob
+import logging
+import os
+
+import numpy as np
+
+from stanza.models.common.pretrain import Pretrain, mmap_filenames
+
+logger = logging.getLogger('stanza')
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=str, nargs='+', help='.pt pretrain files, or directories to search for pretrain/*.pt')
+    parser.add_argument('--dtype', type=str, default='float32', choices=['float32', 'float16'], help='Type to store the vectors as.  float16 halves the file size')
+    parser.add_argument('--overwrite', default=False, action='store_true', help='Convert files even if an up to date memory mapped version already exists')
+    args = parser.parse_args(args=args)
+    return args
+
+def find_pretrain_files(paths):
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(glob.glob(os.path.join(path, "**", "pretrain", "*.pt"), recursive=True)))
+        else:
+            filenames.append(path)
+    return filenames
+
+def is_converted(filename):
+    vocab_filename, emb_filename = mmap_filenames(filename)
+    if not os.path.exists(vocab_filename) or not os.path.exists(emb_filename):
+        return False
+    return os.path.getmtime(emb_filename) >= os.path.getmtime(filename)
+
+def convert_pretrain(filename, dtype, overwrite=False):
+    if not overwrite and is_converted(filename):
+        logger.info("%s is already converted", filename)
+        return False
+    pt = Pretrain(filename, save_to_file=False, use_mmap=False)
+    pt.save_mmap(filename, dtype=dtype)
+    return True
+
+def main(args=None):
+    args = parse_args(args)
+    dtype = np.dtype(args.dtype)
+    filenames = find_pretrain_files(args.paths)
+    if not filenames:
+        raise FileNotFoundError("No .pt pretrain files found in %s" % args.paths)
+    converted = 0
+    for filename in filenames:
+        if convert_pretrain(filename, dtype, args.overwrite):
+            converted += 1
+    logger.info("Converted %d of %d pretrain files", converted, len(filenames))
+
+if __name__ == '__main__':
+    main()